@@ -14,14 +14,22 @@ if _PROJECT_ROOT not in sys.path:
 # >>> Se a classe estiver em outro lugar, troque a importação abaixo:
 # from demos.demo_final import FleetZoneSystem
 from fleetzone import FleetZoneSystem   # raiz/fleetzone.py
+from src.detection.multi_camera import MultiCameraRunner
 
 def parse_args():
     p = argparse.ArgumentParser("FleetZone - runner")
     p.add_argument(
         "--source",
         type=str,
-        default=os.path.join("assets", "sample_video.mp4"),
-        help="Caminho do vídeo (mp4, avi, etc.)",
+        nargs="+",
+        default=[os.path.join("assets", "sample_video.mp4")],
+        help="Caminho do vídeo (mp4, avi, etc.); várias fontes ativam o modo multi-câmera",
+    )
+    p.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Processos de detecção no modo multi-câmera (padrão: um por núcleo, até o nº de câmeras)",
     )
     p.add_argument(
         "--frames",
@@ -29,20 +37,94 @@ def parse_args():
         default=200,
         help="Máximo de frames para processar (0 = sem limite)",
     )
+    p.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="Frames enviados ao modelo por chamada (inferência em batch)",
+    )
+    p.add_argument(
+        "--frame-policy",
+        choices=("block", "drop_oldest"),
+        default="block",
+        help="Fila de decodificação cheia: esperar (vídeo) ou descartar o frame mais antigo (câmera ao vivo)",
+    )
+    p.add_argument(
+        "--motion-threshold",
+        type=float,
+        default=None,
+        help="Fração mínima de pixels alterados para rodar o modelo (desligado por padrão)",
+    )
+    p.add_argument(
+        "--roi-config",
+        type=str,
+        default=None,
+        help="JSON com os polígonos das zonas do pátio por fonte (ver src/detection/roi.py)",
+    )
+    p.add_argument(
+        "--backend",
+        choices=("torch", "onnx", "openvino"),
+        default="torch",
+        help="Runtime de inferência em CPU (onnx/openvino exportam o modelo na primeira execução)",
+    )
+    p.add_argument(
+        "--precision",
+        choices=("fp32", "fp16", "int8"),
+        default="fp32",
+        help="Precisão do modelo (int8 requer scripts/quantize_model.py)",
+    )
+    p.add_argument(
+        "--record-policy",
+        choices=("all", "track"),
+        default="all",
+        help="Detecções gravadas/enviadas: todas ou uma por moto rastreada (a que confirma o rastro)",
+    )
     return p.parse_args()
 
+def run_multi_camera(args):
+    sources = [
+        s if os.path.isabs(s) or s.isdigit() else os.path.join(_PROJECT_ROOT, s)
+        for s in args.source
+    ]
+    runner = MultiCameraRunner(
+        sources,
+        workers=args.workers,
+        frame_policy=args.frame_policy,
+        max_frames=(args.frames if args.frames > 0 else None),
+        backend=args.backend,
+        precision=args.precision,
+        record_policy=args.record_policy,
+        batch_size=args.batch_size,
+        motion_threshold=args.motion_threshold,
+        roi_config=args.roi_config,
+    )
+    runner.run()
+    print("\n✅ Sistema multi-câmera executado com sucesso!")
+
 def main():
     args = parse_args()
 
     print("🎯 FleetZone - Sistema de Detecção de Motos")
     print("=" * 50)
 
-    system = FleetZoneSystem()
+    if len(args.source) > 1:
+        run_multi_camera(args)
+        return
+
+    system = FleetZoneSystem(
+        motion_threshold=args.motion_threshold,
+        roi_config=args.roi_config,
+        backend=args.backend,
+        precision=args.precision,
+        record_policy=args.record_policy,
+    )
     try:
         system.initialize()
         ok = system.run_detection(
-            video_path=args.source,
+            video_path=args.source[0],
             max_frames=(args.frames if args.frames > 0 else 10_000_000),
+            batch_size=args.batch_size,
+            frame_policy=args.frame_policy,
         )
         if ok:
             print("\n✅ Sistema executado com sucesso!")
@@ -4,13 +4,12 @@
 FleetZone - Orquestrador do sistema (runner-friendly)
 - Inicializa DB
 - Checa backend (opcional)
-- Roda detecção (apenas motos)
+- Roda detecção (apenas motos) e rastreamento (SORT, track_id por moto)
 """
 
 import os
 import sys
 import time
-import threading
 from datetime import datetime
 
 import cv2
@@ -25,25 +24,57 @@ if _SRC_DIR not in sys.path:
 # Imports do projeto
 from src.utils.database import DatabaseManager
 from src.detection.moto_detector import MotoDetector
+from src.detection.detection_array import bboxes, build_detection_payloads
+from src.detection.frame_source import FrameSource
+from src.detection.motion_gate import MotionGate
+from src.detection.roi import RoiConfig
+from src.detection.model_registry import get_timings
+from src.detection.publisher import DetectionPublisher
+from src.detection.tracking import RECORD_POLICIES
 
 
 class FleetZoneSystem:
     """Sistema principal do FleetZone (apenas motos)"""
 
-    def __init__(self):
-        self.detector = MotoDetector()
+    def __init__(
+        self,
+        motion_threshold: float | None = None,
+        roi_config: str | None = None,
+        backend: str = "torch",
+        precision: str = "fp32",
+        record_policy: str = "all",
+    ):
+        # motion_threshold: fração de pixels alterados abaixo da qual o frame
+        # não passa pelo modelo (None = todo frame é inferido)
+        # roi_config: JSON com os polígonos das zonas do pátio por fonte
+        # backend: runtime de inferência ('torch', 'onnx' ou 'openvino')
+        # precision: 'fp32', 'fp16' ou 'int8' (modelo quantizado, ver scripts/quantize_model.py)
+        # record_policy: 'all' grava/envia toda detecção; 'track' só uma por moto
+        # (a detecção que confirma o rastro)
+        if record_policy not in RECORD_POLICIES:
+            raise ValueError(f"record_policy deve ser um de {RECORD_POLICIES}")
+        self.record_policy = record_policy
+        self.roi_config = roi_config
+        gate = MotionGate(threshold=motion_threshold) if motion_threshold is not None else None
+        self.detector = MotoDetector(motion_gate=gate, backend=backend, precision=precision)
         self.db = DatabaseManager(db_path=os.path.join(_PROJECT_ROOT, "fleetzone.db"))
         self.running = False
         self.api_url = "http://localhost:5000"
         self.backend_running = False
+        # Envio em lote por uma única thread (não bloqueia o laço de detecção)
+        self.publisher = DetectionPublisher(
+            url=f"{self.api_url}/detections", batch_url=f"{self.api_url}/detections/batch"
+        )
         self.total_detections = 0
-        self.unique_motos = set()
 
     def initialize(self):
         """Inicializa banco e verifica backend"""
         print("🚀 Inicializando FleetZone...")
         self.db.initialize()
         print("✅ Banco de dados inicializado")
+        for timing in get_timings():
+            print(f"✅ Modelo {timing['model_path']} ({timing['precision']}, {timing['imgsz']}px): "
+                  f"carga {timing['load_time']:.2f}s, aquecimento {timing['warmup_time']:.2f}s")
         self._check_backend()
         print("✅ Sistema inicializado com sucesso!")
 
@@ -53,122 +84,160 @@ class FleetZoneSystem:
             r = requests.get(f"{self.api_url}/metrics", timeout=1.5)
             if r.status_code == 200:
                 self.backend_running = True
+                self.publisher.start()
                 print("✅ Backend API conectado")
             else:
                 print("⚠️ Backend API não disponível - modo offline")
         except requests.exceptions.RequestException:
             print("⚠️ Backend API não disponível - modo offline")
 
-    def _send_to_api(self, payload: dict):
-        if not self.backend_running:
-            return
-        try:
-            requests.post(f"{self.api_url}/detections", json=payload, timeout=1.0)
-        except requests.exceptions.RequestException:
-            pass  # ignora se offline
+    def run_detection(
+        self,
+        video_path: str,
+        max_frames: int = 200,
+        batch_size: int = 1,
+        frame_policy: str = "block",
+    ) -> bool:
+        """
+        Executa detecção SOMENTE de motos no vídeo informado.
+        `batch_size` frames decodificados são enviados ao modelo numa única
+        chamada (batch_size=1 mantém o comportamento frame a frame).
+        A decodificação roda em thread própria (FrameSource); para fontes
+        ao vivo use frame_policy="drop_oldest" para descartar frames atrasados.
+        As detecções de cada frame passam pelo rastreador (track_id estável);
+        motos únicas são os rastros confirmados.
+        """
+        batch_size = max(1, int(batch_size))
 
-    def run_detection(self, video_path: str, max_frames: int = 200) -> bool:
-        """Executa detecção SOMENTE de motos no vídeo informado"""
         # Normaliza caminho relativo
         if not os.path.isabs(video_path):
             video_path = os.path.join(_PROJECT_ROOT, video_path)
 
         print(f"🔍 Iniciando detecção em: {os.path.relpath(video_path, _PROJECT_ROOT)}")
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
+
+        # ROIs da fonte: só os recortes das zonas do pátio vão ao modelo
+        self.detector.roi = RoiConfig.load(self.roi_config, video_path) if self.roi_config else None
+        if self.detector.roi is not None:
+            print(f"🗺️ ROIs ativas: {len(self.detector.roi.regions)} região(ões)")
+        # Rastros e detecções reaproveitadas pelo motion gate não atravessam vídeos
+        self.detector.reset()
+        source = FrameSource(
+            video_path,
+            queue_size=max(8, 2 * batch_size),
+            policy=frame_policy,
+            max_frames=max_frames,
+        )
+        if not source.isOpened():
             print("❌ Erro ao abrir vídeo")
             return False
+        source.start()
+        # O publisher é parado (com flush) ao fim de cada execução
+        if self.backend_running:
+            self.publisher.start()
 
         self.running = True
         frame_count = 0
         start = time.time()
-        print("📹 Processando vídeo...")
+        print(f"📹 Processando vídeo (batch de {batch_size} frame(s))...")
         print("Controles: 'q' = sair, 's' = salvar frame")
 
         while self.running:
-            ok, frame = cap.read()
-            if not ok:
+            # Lê até `batch_size` frames já decodificados (limite aplicado na fonte)
+            packets = source.read_batch(batch_size)
+            if not packets:
                 break
-
-            frame_count += 1
+            frames = [packet.frame for packet in packets]
 
             # ======== DETECÇÃO ========
-            # detect_motos + filter_motos já restringem a motos no seu projeto
-            detections = self.detector.detect_motos(frame)
-            moto_dets = self.detector.filter_motos(detections)
-
-            elapsed = time.time() - start
-            fps_now = (frame_count / elapsed) if elapsed > 0 else 0.0
-
-            # Desenha caixas e labels
-            self._draw_detections(frame, moto_dets)
-            self._draw_info(frame, frame_count, fps_now, len(moto_dets))
-
-            # Atualiza métricas locais + persiste no DB
-            if moto_dets:
-                self.total_detections += len(moto_dets)
-                for det in moto_dets:
-                    self.unique_motos.add(f"{det['class']}_{tuple(det['bbox'])}")
-
-                detection_rate = (len(moto_dets) / elapsed) if elapsed > 0 else 0.0
-
-                # Salva no banco (usa created_at; NADA de 'timestamp'!)
-                self.db.save_detections(
-                    frame_num=frame_count,
-                    detections=moto_dets,
-                    fps=fps_now,
-                    total_detections=self.total_detections,
-                    unique_motos=len(self.unique_motos),
-                    detection_rate=detection_rate,
-                )
-
-                # Envia para API (se disponível)
-                for det in moto_dets:
-                    payload = {
-                        "frame": frame_count,
-                        "class": det["class"],
-                        "class_name": det["class_name"],
-                        "confidence": det["confidence"],
-                        "bbox": det["bbox"],
-                        "area": det["area"],
-                        "metrics": {
-                            "avg_fps": fps_now,
-                            "total_detections": self.total_detections,
-                            "unique_motos": len(self.unique_motos),
-                            "detection_rate": detection_rate,
-                            "elapsed_time": elapsed,
-                        },
-                        "created_at": datetime.now().isoformat(),
-                    }
-                    threading.Thread(
-                        target=self._send_to_api, args=(payload,), daemon=True
-                    ).start()
-
-            # Mostra janela
-            cv2.imshow("FleetZone - Detecção de Motos", frame)
-            key = cv2.waitKey(1) & 0xFF
-            if key == ord("q"):
+            # detect_motos_batch_array + filter_motos_array já restringem a motos
+            batch_detections = self.detector.detect_motos_batch_array(frames)
+
+            keep_going = True
+            for frame, detections in zip(frames, batch_detections):
+                frame_count += 1
+                moto_dets = self.detector.filter_motos_array(detections)
+                if not self._process_frame(frame, frame_count, moto_dets, start):
+                    keep_going = False
+                    break
+            if not keep_going:
                 break
-            elif key == ord("s"):
-                out = os.path.join(_PROJECT_ROOT, f"frame_{frame_count}.jpg")
-                cv2.imwrite(out, frame)
-                print(f"📸 Frame {frame_count} salvo em {os.path.basename(out)}")
 
             if frame_count >= max_frames:
                 print(f"📊 Limite de frames atingido ({max_frames})")
                 break
 
-        cap.release()
+        source.release()
         cv2.destroyAllWindows()
+        self.publisher.stop()
 
+        if source.frames_dropped:
+            print(f"⚠️ Frames descartados pela fonte: {source.frames_dropped}")
         self._show_report(frame_count, time.time() - start)
         return True
 
+    def _process_frame(self, frame, frame_count, moto_dets, start) -> bool:
+        """Desenha, persiste e publica as detecções de um frame.
+        Retorna False se o usuário pediu para sair."""
+        elapsed = time.time() - start
+        fps_now = (frame_count / elapsed) if elapsed > 0 else 0.0
+
+        # Rastreamento (todo frame, para envelhecer os rastros): motos únicas = rastros confirmados
+        moto_dets, confirmed = self.detector.track(moto_dets)
+        unique_motos = self.detector.tracker.unique_count
+        records = moto_dets[confirmed] if self.record_policy == "track" else moto_dets
+
+        # Desenha caixas e labels
+        self._draw_detections(frame, moto_dets)
+        self._draw_info(frame, frame_count, fps_now, len(moto_dets))
+
+        # Atualiza métricas locais + persiste no DB
+        self.total_detections += len(moto_dets)
+        if len(records):
+            detection_rate = (len(moto_dets) / elapsed) if elapsed > 0 else 0.0
+
+            # Salva no banco (usa created_at; NADA de 'timestamp'!)
+            self.db.save_detections(
+                frame_num=frame_count,
+                detections=records,
+                fps=fps_now,
+                total_detections=self.total_detections,
+                unique_motos=unique_motos,
+                detection_rate=detection_rate,
+            )
+
+            # Envia para API (se disponível): só enfileira, a thread do publisher envia
+            metrics = {
+                "avg_fps": fps_now,
+                "total_detections": self.total_detections,
+                "unique_motos": unique_motos,
+                "detection_rate": detection_rate,
+                "elapsed_time": elapsed,
+            }
+            if self.backend_running:
+                self.publisher.publish_many(build_detection_payloads(
+                    records, frame_count, metrics, created_at=datetime.now().isoformat()
+                ))
+
+        # Mostra janela
+        cv2.imshow("FleetZone - Detecção de Motos", frame)
+        key = cv2.waitKey(1) & 0xFF
+        if key == ord("q"):
+            return False
+        elif key == ord("s"):
+            out = os.path.join(_PROJECT_ROOT, f"frame_{frame_count}.jpg")
+            cv2.imwrite(out, frame)
+            print(f"📸 Frame {frame_count} salvo em {os.path.basename(out)}")
+
+        return True
+
     def _draw_detections(self, frame, detections):
-        for det in detections:
-            x1, y1, x2, y2 = det["bbox"]
-            conf = det["confidence"]
-            label = f"{det['class_name']}: {conf:.2f}"
+        for (x1, y1, x2, y2), name, conf, track_id in zip(
+            bboxes(detections).tolist(),
+            detections["class_name"].tolist(),
+            detections["conf"].tolist(),
+            detections["track_id"].tolist(),
+        ):
+            label = f"#{track_id} {name}: {conf:.2f}"
             color = (0, 255, 0)  # verde para motos
             cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
             cv2.putText(
@@ -187,6 +256,7 @@ class FleetZoneSystem:
             f"FPS: {fps:.1f}",
             f"Motos detectadas (frame): {dets}",
             f"Total detect.: {self.total_detections}",
+            f"Motos únicas: {self.detector.tracker.unique_count}",
         ]
         for i, t in enumerate(lines):
             cv2.putText(
@@ -206,8 +276,19 @@ class FleetZoneSystem:
         print(f"Frames processados: {frames}")
         print(f"Tempo total: {elapsed:.2f}s")
         print(f"FPS médio: {frames / elapsed:.2f}")
+        if self.detector.motion_gate is not None:
+            gate = self.detector.motion_gate.stats()
+            print(f"Frames inferidos: {gate['frames_inferred']}")
+            print(f"Frames sem movimento (reaproveitados): {gate['frames_gated']} "
+                  f"({gate['gated_ratio'] * 100:.1f}%)")
         print(f"Total de detecções (todas): {stats['total_detections']}")
         print(f"Classes detectadas: {stats['unique_classes']}")
+        print(f"Motos únicas (rastros confirmados): {self.detector.tracker.unique_count}")
+        if self.backend_running:
+            sent = self.publisher.stats()
+            print(f"Envios à API: {sent['published']} em {sent['batches']} lote(s) | "
+                  f"falhas {sent['failed']} | descartados {sent['dropped']} | "
+                  f"backlog máx. {sent['max_backlog']}")
 
         print("\n📋 ÚLTIMAS DETECÇÕES:")
         print("=" * 30)
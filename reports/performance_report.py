@@ -16,7 +16,10 @@ import requests
 import sqlite3
 import os
 from datetime import datetime
+import cv2
 from detection.moto_detection_enhanced import MotoDetector
+from detection.moto_detector import MotoDetector as BatchMotoDetector
+from detection.model_registry import get_timings
 
 class PerformanceReport:
     def __init__(self):
@@ -24,6 +27,7 @@ class PerformanceReport:
             'timestamp': datetime.now().isoformat(),
             'system_info': {},
             'performance_metrics': {},
+            'batch_throughput': {},
             'detection_results': {},
             'backend_metrics': {},
             'summary': {}
@@ -33,8 +37,9 @@ class PerformanceReport:
         """Executa teste de performance completo"""
         print("🔍 Executando teste de performance...")
         
-        # Teste de detecção
+        # Teste de detecção (carga e aquecimento do modelo ficam fora da medição)
         detector = MotoDetector()
+        self.report_data['system_info']['model_loading'] = get_timings()
         
         start_time = time.time()
         detector.process_video(
@@ -54,11 +59,53 @@ class PerformanceReport:
             'fps': fps,
             'avg_fps': detector.calculate_metrics()['avg_fps'],
             'total_detections': detector.total_detections,
-            'unique_motos': len(detector.unique_motos)
+            'unique_motos': detector.tracker.unique_count
         }
         
         print(f"✅ Teste de performance concluído: {fps:.2f} FPS")
     
+    def run_batch_benchmark(self, batch_sizes=(1, 2, 4, 8), max_frames=64,
+                            video_path="assets/sample_video.mp4"):
+        """Mede o throughput da inferência em batch para cada tamanho de batch"""
+        print("📦 Executando benchmark de inferência em batch...")
+
+        # Decodifica os frames uma única vez: mede-se apenas a inferência
+        cap = cv2.VideoCapture(video_path)
+        frames = []
+        while len(frames) < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+
+        if not frames:
+            print("⚠️ Nenhum frame lido para o benchmark de batch")
+            return
+
+        detector = BatchMotoDetector()
+        results = {}
+        for batch_size in batch_sizes:
+            start_time = time.time()
+            total_detections = 0
+            for i in range(0, len(frames), batch_size):
+                batch = frames[i:i + batch_size]
+                for detections in detector.detect_motos_batch_array(batch):
+                    total_detections += len(detector.filter_motos_array(detections))
+            total_time = time.time() - start_time
+
+            results[str(batch_size)] = {
+                'batch_size': batch_size,
+                'frames': len(frames),
+                'processing_time': total_time,
+                'fps': len(frames) / total_time if total_time > 0 else 0,
+                'total_detections': total_detections
+            }
+            print(f"   • batch={batch_size}: {results[str(batch_size)]['fps']:.2f} FPS")
+
+        self.report_data['batch_throughput'] = results
+        print("✅ Benchmark de batch concluído")
+
     def check_backend_metrics(self):
         """Verifica métricas do backend"""
         print("📊 Verificando métricas do backend...")
@@ -195,6 +242,11 @@ class PerformanceReport:
         print(f"🎯 Sprint: 3º Sprint - Disruptive Architectures")
         print(f"🏆 Disciplina: IoT, IoB & Generative AI")
         
+        # Carga dos modelos (fora das medições de FPS)
+        for timing in self.report_data['system_info'].get('model_loading', []):
+            print(f"🧠 Modelo {timing['model_path']} ({timing['precision']}, {timing['imgsz']}px): "
+                  f"carga {timing['load_time']:.2f}s, aquecimento {timing['warmup_time']:.2f}s")
+        
         # Performance
         perf = self.report_data['performance_metrics']
         print(f"\n📊 PERFORMANCE:")
@@ -204,6 +256,14 @@ class PerformanceReport:
         print(f"   • Total de detecções: {perf.get('total_detections', 0)}")
         print(f"   • Motos únicas: {perf.get('unique_motos', 0)}")
         
+        # Throughput por tamanho de batch
+        batch = self.report_data.get('batch_throughput', {})
+        if batch:
+            print(f"\n📦 THROUGHPUT POR BATCH:")
+            for item in batch.values():
+                print(f"   • batch={item['batch_size']}: {item['fps']:.2f} FPS "
+                      f"({item['frames']} frames em {item['processing_time']:.2f}s)")
+        
         # Backend
         backend = self.report_data['backend_metrics']
         print(f"\n🔌 BACKEND:")
@@ -257,6 +317,7 @@ class PerformanceReport:
         print("🚀 Iniciando relatório de performance completo...")
         
         self.run_performance_test()
+        self.run_batch_benchmark()
         self.check_backend_metrics()
         self.analyze_database()
         self.generate_summary()
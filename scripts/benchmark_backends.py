@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos backends de inferência (PyTorch x ONNX Runtime x OpenVINO)
+Mede o FPS de cada runtime no mesmo vídeo e compara as detecções com as
+do PyTorch (referência).
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+# Garante que a RAIZ do projeto está no sys.path
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+from src.detection.detection_array import bboxes, box_iou
+from src.detection.frame_source import FrameSource
+from src.detection.model_registry import get_timings
+from src.detection.moto_detector import MotoDetector
+
+
+def load_frames(video_path, max_frames):
+    """Decodifica os frames uma única vez: mede-se apenas a inferência"""
+    source = FrameSource(video_path, max_frames=max_frames).start()
+    frames = [packet.frame for packet in source]
+    source.release()
+    return frames
+
+
+def run_backend(backend, frames, model_path):
+    detector = MotoDetector(model_path=model_path, backend=backend)
+    outputs = []
+    start = time.perf_counter()
+    for frame in frames:
+        outputs.append(detector.filter_motos_array(detector.detect_motos_array(frame)))
+    elapsed = time.perf_counter() - start
+    return outputs, {
+        'backend': backend,
+        'frames': len(frames),
+        'processing_time': elapsed,
+        'fps': len(frames) / elapsed if elapsed > 0 else 0.0,
+        'total_detections': int(sum(len(d) for d in outputs)),
+    }
+
+
+def compare(reference, candidate):
+    """IoU médio e diferença de confiança das caixas pareadas com a referência"""
+    ious, conf_diffs, unmatched = [], [], 0
+    for ref, cand in zip(reference, candidate):
+        if len(ref) == 0 or len(cand) == 0:
+            unmatched += abs(len(ref) - len(cand))
+            continue
+        iou = box_iou(bboxes(ref), bboxes(cand))
+        best = iou.argmax(axis=1)
+        best_iou = iou[np.arange(len(ref)), best]
+        matched = best_iou >= 0.5
+        ious.extend(best_iou[matched].tolist())
+        conf_diffs.extend(np.abs(ref['conf'][matched] - cand['conf'][best[matched]]).tolist())
+        unmatched += int((~matched).sum()) + max(0, len(cand) - int(matched.sum()))
+    return {
+        'mean_iou': float(np.mean(ious)) if ious else None,
+        'max_conf_diff': float(np.max(conf_diffs)) if conf_diffs else None,
+        'unmatched_boxes': unmatched,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos backends de inferência")
+    parser.add_argument("--video", default=os.path.join(_PROJECT_ROOT, "assets", "sample_video.mp4"))
+    parser.add_argument("--model", default="yolov8n.pt")
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "openvino"])
+    parser.add_argument("--output", help="Arquivo JSON para salvar os resultados")
+    args = parser.parse_args()
+
+    frames = load_frames(args.video, args.frames)
+    print(f"🎞️ {len(frames)} frames carregados de {args.video}")
+
+    results, reference = [], None
+    for backend in args.backends:
+        try:
+            outputs, stats = run_backend(backend, frames, args.model)
+        except ImportError as e:
+            print(f"⚠️ {backend}: {e}")
+            continue
+        if reference is None:
+            reference = outputs
+        else:
+            stats['vs_reference'] = compare(reference, outputs)
+        results.append(stats)
+        print(f"   • {backend}: {stats['fps']:.2f} FPS ({stats['total_detections']} detecções)")
+
+    report = {'video': args.video, 'backends': results, 'model_loading': get_timings()}
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"💾 Resultados salvos em: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
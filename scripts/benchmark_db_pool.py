@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Benchmark do acesso concorrente ao SQLite do backend
+Compara o padrão antigo (uma conexão nova por requisição, journal de
+rollback) com o pool de conexões em WAL, com threads escritoras no padrão
+de POST /detections e leitoras no padrão de GET /metrics e /history.
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+# Garante que a RAIZ do projeto está no sys.path
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+from src.backend.db_pool import ConnectionPool
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS detections (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,
+    frame INTEGER, class INTEGER, class_name TEXT, confidence REAL,
+    x1 INTEGER, y1 INTEGER, x2 INTEGER, y2 INTEGER, area INTEGER,
+    fps REAL, total_detections INTEGER, unique_motos INTEGER, detection_rate REAL
+)
+"""
+
+INSERT = """INSERT INTO detections
+    (created_at, frame, class, class_name, confidence, x1, y1, x2, y2, area,
+     fps, total_detections, unique_motos, detection_rate)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+
+def _baseline_connect(db_path):
+    """Padrão anterior dos apps: conexão nova a cada requisição"""
+    connection = sqlite3.connect(db_path)
+    connection.row_factory = sqlite3.Row
+    return connection
+
+
+def _write(connect, i):
+    connection = connect()
+    try:
+        connection.execute(INSERT, (datetime.utcnow().isoformat(), i, 3, 'motorbike', 0.8,
+                                    10, 20, 110, 120, 10000, 15.0, i, 1, 2.0))
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def _read(connect, i):
+    connection = connect()
+    try:
+        if i % 2:
+            # /metrics
+            connection.execute('SELECT COUNT(*) FROM detections').fetchone()
+            connection.execute('SELECT fps FROM detections WHERE fps IS NOT NULL ORDER BY id DESC LIMIT 60').fetchall()
+        else:
+            # /history
+            connection.execute('SELECT * FROM detections ORDER BY created_at DESC LIMIT 100').fetchall()
+    finally:
+        connection.close()
+
+
+def run_mode(mode, writers, readers, duration, seed_rows):
+    fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    setup = sqlite3.connect(db_path)
+    setup.execute(SCHEMA)
+    setup.executemany(INSERT, [(datetime.utcnow().isoformat(), i, 3, 'motorbike', 0.8,
+                                10, 20, 110, 120, 10000, 15.0, i, 1, 2.0) for i in range(seed_rows)])
+    setup.commit()
+    setup.close()
+
+    pool = None
+    if mode == 'pool':
+        pool = ConnectionPool(db_path, max_idle=writers + readers)
+        connect = pool.connect
+    else:
+        connect = lambda: _baseline_connect(db_path)
+
+    counts = {'writes': 0, 'reads': 0, 'errors': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(kind, op):
+        done = errors = 0
+        while time.perf_counter() < deadline:
+            try:
+                op(connect, done)
+                done += 1
+            except sqlite3.OperationalError:
+                errors += 1  # database is locked
+        with lock:
+            counts[kind] += done
+            counts['errors'] += errors
+
+    threads = [threading.Thread(target=worker, args=('writes', _write)) for _ in range(writers)]
+    threads += [threading.Thread(target=worker, args=('reads', _read)) for _ in range(readers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    if pool is not None:
+        pool.close_all()
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+
+    return {
+        'mode': mode,
+        'writers': writers,
+        'readers': readers,
+        'duration': elapsed,
+        'writes_per_s': counts['writes'] / elapsed,
+        'reads_per_s': counts['reads'] / elapsed,
+        'lock_errors': counts['errors'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do pool de conexões SQLite")
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=5.0, help="Segundos por modo")
+    parser.add_argument("--seed-rows", type=int, default=5000, help="Linhas pré-carregadas")
+    parser.add_argument("--output", help="Arquivo JSON para salvar os resultados")
+    args = parser.parse_args()
+
+    results = []
+    for mode in ('baseline', 'pool'):
+        result = run_mode(mode, args.writers, args.readers, args.duration, args.seed_rows)
+        results.append(result)
+        print(f"   • {mode:8s}: {result['writes_per_s']:8.1f} escritas/s | "
+              f"{result['reads_per_s']:8.1f} leituras/s | locks {result['lock_errors']}")
+
+    base, pooled = results
+    if base['writes_per_s'] > 0 and base['reads_per_s'] > 0:
+        print(f"📈 Ganho: escritas x{pooled['writes_per_s'] / base['writes_per_s']:.2f} | "
+              f"leituras x{pooled['reads_per_s'] / base['reads_per_s']:.2f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"💾 Resultados salvos em: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
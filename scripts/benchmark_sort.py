@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Benchmark do rastreador SORT
+- kalman: filtro por objeto (KalmanBoxTracker, um filterpy por rastro, em
+  laço Python) x filtro empilhado (KalmanBoxBatch), com a mesma sequência
+  de predições e correções, conferindo que os estados são iguais
+- association: Hungarian na matriz de IoU inteira x associação com gate
+  de IoU e componentes conexas (associate_detections_to_trackers), com a
+  matriz de IoU densa e com os candidatos da grade espacial, num pátio com
+  motos estacionadas em grade
+- memory: execução longa com motos entrando e saindo do pátio; compara um
+  objeto KalmanBoxTracker (filterpy) por rastro com o pool de linhas do
+  Sort, medindo alocação (tracemalloc), coletas do GC e tempo por frame
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+# Garante que a RAIZ do projeto está no sys.path
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+from scipy.optimize import linear_sum_assignment
+
+from src.detection.detection_array import box_iou
+from src.detection.sort import KalmanBoxBatch, KalmanBoxTracker, Sort, associate_detections_to_trackers
+
+
+def _scenario(n_tracks, steps, seed=0):
+    """Bboxes iniciais e, por passo, os rastros corrigidos e as medições"""
+    rng = np.random.default_rng(seed)
+    boxes = rng.uniform(0, 1000, (n_tracks, 4))
+    boxes[:, 2:] += boxes[:, :2]
+    updates = []
+    for step in range(steps):
+        idx = np.flatnonzero(rng.random(n_tracks) < 0.8)  # ~20% sem detecção no frame
+        z = boxes[idx] + step + rng.normal(0, 2, (len(idx), 4))
+        updates.append((idx, z))
+    return boxes, updates
+
+
+def run_per_object(boxes, updates):
+    trackers = [KalmanBoxTracker(box) for box in boxes]
+    start = time.perf_counter()
+    for idx, z in updates:
+        for trk in trackers:
+            trk.predict()
+        for i, bbox in zip(idx, z):
+            trackers[i].update(bbox)
+    elapsed = time.perf_counter() - start
+    return elapsed, np.array([trk.kf.x[:, 0] for trk in trackers])
+
+
+def run_batched(boxes, updates):
+    batch = KalmanBoxBatch()
+    batch.add(boxes)
+    start = time.perf_counter()
+    for idx, z in updates:
+        batch.predict()
+        batch.update(idx, z)
+    elapsed = time.perf_counter() - start
+    return elapsed, batch.x[batch.active]
+
+
+def _yard(n_objects, seed=0):
+    """Motos estacionadas em grade (detecções) e as predições dos rastros com ruído"""
+    rng = np.random.default_rng(seed)
+    cols = int(np.ceil(np.sqrt(n_objects)))
+    cells = np.arange(n_objects)
+    x1 = (cells % cols) * 70.0 + rng.uniform(0, 10, n_objects)
+    y1 = (cells // cols) * 90.0 + rng.uniform(0, 10, n_objects)
+    dets = np.column_stack((x1, y1, x1 + 50, y1 + 70, np.ones(n_objects)))
+    trks = dets[rng.permutation(n_objects)].copy()
+    trks[:, :4] += rng.normal(0, 4, (n_objects, 4))
+    return dets, trks
+
+
+def dense_association(dets, trks, iou_threshold=0.3):
+    """Referência: Hungarian na matriz de IoU completa, limiar aplicado depois"""
+    iou = box_iou(dets[:, :4], trks[:, :4])
+    rows, cols = linear_sum_assignment(-iou)
+    keep = iou[rows, cols] >= iou_threshold
+    return np.column_stack((rows[keep], cols[keep]))
+
+
+def _best_time(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def bench_kalman(tracks, steps):
+    report = {}
+    print(f"🧮 Kalman: {steps} frames por cenário")
+    for n_tracks in tracks:
+        boxes, updates = _scenario(n_tracks, steps)
+        t_obj, x_obj = run_per_object(boxes, updates)
+        t_batch, x_batch = run_batched(boxes, updates)
+        track_steps = n_tracks * steps
+        report[n_tracks] = {
+            'per_object_track_steps_s': track_steps / t_obj,
+            'batched_track_steps_s': track_steps / t_batch,
+            'speedup': t_obj / t_batch,
+            'max_state_diff': float(np.abs(x_obj - x_batch).max()),
+        }
+        stats = report[n_tracks]
+        print(f"   • {n_tracks:>5} rastros: por objeto {stats['per_object_track_steps_s']:,.0f} rastro·frame/s | "
+              f"empilhado {stats['batched_track_steps_s']:,.0f} rastro·frame/s | "
+              f"{stats['speedup']:.1f}x | diferença máx. {stats['max_state_diff']:.2e}")
+    return report
+
+
+def bench_association(objects, repeat):
+    report = {}
+    print(f"🔗 Associação: melhor de {repeat} execuções")
+    for n_objects in objects:
+        dets, trks = _yard(n_objects)
+        t_dense, dense = _best_time(lambda: dense_association(dets, trks), repeat)
+        t_gated, (gated, _, _) = _best_time(
+            lambda: associate_detections_to_trackers(dets, trks, spatial_index=False), repeat)
+        t_grid, (matches, _, _) = _best_time(
+            lambda: associate_detections_to_trackers(dets, trks, spatial_index=True), repeat)
+        reference = {tuple(m) for m in dense}
+        same = reference == {tuple(m) for m in gated} == {tuple(m) for m in matches}
+        report[n_objects] = {
+            'dense_ms': t_dense * 1000,
+            'gated_ms': t_gated * 1000,
+            'grid_ms': t_grid * 1000,
+            'speedup': t_dense / t_grid,
+            'matches': int(len(matches)),
+            'same_matches': same,
+        }
+        stats = report[n_objects]
+        print(f"   • {n_objects:>5} motos: denso {stats['dense_ms']:.2f} ms | com gate {stats['gated_ms']:.2f} ms | "
+              f"grade {stats['grid_ms']:.2f} ms | {stats['speedup']:.1f}x | {stats['matches']} pares | "
+              f"mesmos pares: {'sim' if same else 'não'}")
+    return report
+
+
+class PerObjectSort:
+    """Sort com um KalmanBoxTracker por rastro (layout anterior ao pool)"""
+
+    def __init__(self, max_age=5, iou_threshold=0.3, history=0):
+        self.max_age = max_age
+        self.iou_threshold = iou_threshold
+        self.history = history
+        self.trackers = []
+
+    def update(self, dets):
+        trks = np.array([trk.predict()[:4, 0] for trk in self.trackers]).reshape(-1, 4)
+        matches, unmatched_dets, _ = associate_detections_to_trackers(dets, trks, self.iou_threshold)
+        for d, t in matches:
+            self.trackers[t].update(dets[d])
+        for d in unmatched_dets:
+            self.trackers.append(KalmanBoxTracker(dets[d], history=self.history))
+        ret = [np.append(trk.kf.x[:4, 0], trk.id + 1) for trk in reversed(self.trackers) if trk.time_since_update < 1]
+        self.trackers = [trk for trk in self.trackers if trk.time_since_update <= self.max_age]
+        return np.array(ret).reshape(-1, 5)
+
+
+def _yard_stream(frames, population, seed=0):
+    """Detecções por frame: motos paradas com ruído, entrando/saindo e ~10% de falhas"""
+    rng = np.random.default_rng(seed)
+    size = int(np.ceil(np.sqrt(population * 2)))
+    spots = rng.permutation(size * size)
+    parked = list(spots[:population])
+    free = list(spots[population:])
+    stream = []
+    for _ in range(frames):
+        # ~1% das motos sai e outras entram em vagas livres
+        for _ in range(rng.binomial(len(parked), 0.01)):
+            free.append(parked.pop(rng.integers(len(parked))))
+        while len(parked) < population and free:
+            parked.append(free.pop(rng.integers(len(free))))
+        spot = np.array(parked)
+        spot = spot[rng.random(len(spot)) > 0.1]
+        x1 = (spot % size) * 70.0 + rng.normal(0, 1.5, len(spot))
+        y1 = (spot // size) * 90.0 + rng.normal(0, 1.5, len(spot))
+        stream.append(np.column_stack((x1, y1, x1 + 50, y1 + 70, np.ones(len(spot)))))
+    return stream
+
+
+def _run_tracker(tracker, stream):
+    gc.collect()
+    collections = sum(stat['collections'] for stat in gc.get_stats())
+    tracemalloc.start()
+    start = time.perf_counter()
+    for dets in stream:
+        tracker.update(dets)
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'ms_per_frame': elapsed * 1000 / len(stream),
+        'current_kb': current / 1024,
+        'peak_kb': peak / 1024,
+        'gc_collections': sum(stat['collections'] for stat in gc.get_stats()) - collections,
+    }
+
+
+def bench_memory(frames, population, history):
+    stream = _yard_stream(frames, population)
+    print(f"💾 Memória: {frames} frames, ~{population} motos no pátio, histórico={history}")
+    report = {
+        'per_object': _run_tracker(PerObjectSort(history=history), stream),
+        'pool': _run_tracker(Sort(history=history), stream),
+    }
+    for name, stats in report.items():
+        print(f"   • {name:>10}: {stats['ms_per_frame']:.2f} ms/frame | memória final {stats['current_kb']:,.0f} KB | "
+              f"pico {stats['peak_kb']:,.0f} KB | coletas do GC {stats['gc_collections']}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do rastreador SORT")
+    parser.add_argument("--tracks", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--steps", type=int, default=200, help="Frames simulados (predict + update)")
+    parser.add_argument("--objects", type=int, nargs="+", default=[100, 500, 1000], help="Motos no pátio (associação)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--frames", type=int, default=1000, help="Frames da execução longa (memória)")
+    parser.add_argument("--population", type=int, default=200, help="Motos no pátio (memória)")
+    parser.add_argument("--history", type=int, default=0, help="Predições guardadas por rastro (0 = sem histórico)")
+    parser.add_argument("--sections", nargs="+", choices=("kalman", "association", "memory"),
+                        default=["kalman", "association", "memory"])
+    parser.add_argument("--output", help="Arquivo JSON para salvar os resultados")
+    args = parser.parse_args()
+
+    report = {}
+    if "kalman" in args.sections:
+        report['kalman'] = bench_kalman(args.tracks, args.steps)
+    if "association" in args.sections:
+        report['association'] = bench_association(args.objects, args.repeat)
+    if "memory" in args.sections:
+        report['memory'] = bench_memory(args.frames, args.population, args.history)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Resultados salvos em: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -34,7 +34,7 @@ def send_detection_data():
     try:
         response = requests.post('http://localhost:5000/detections', json=data, timeout=2)
         print(f"✅ Detecção enviada: {response.status_code} - Frame {data['frame']}")
-        return response.status_code == 200
+        return response.status_code in (201, 202)
     except Exception as e:
         print(f"❌ Erro ao enviar detecção: {e}")
         return False
@@ -56,7 +56,7 @@ def send_iot_sensor_data():
     try:
         response = requests.post('http://localhost:5000/iot/sensor', json=sensor_data, timeout=2)
         print(f"📡 Sensor enviado: {response.status_code} - {sensor_data['sensor_id']}")
-        return response.status_code == 201
+        return response.status_code in (201, 202)
     except Exception as e:
         print(f"❌ Erro ao enviar sensor: {e}")
         return False
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Quantização INT8 do detector de motos
+Calibra com frames dos vídeos do pátio, gera <modelo>_int8.onnx e compara
+com o FP32 (FPS, tamanho e queda de AP@0.5 na classe moto).
+"""
+
+import argparse
+import json
+import os
+import sys
+
+# Garante que a RAIZ do projeto está no sys.path
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+from src.detection.quantization import evaluate_int8, quantize_model, split_frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantização INT8 do detector de motos")
+    parser.add_argument("--model", default="yolov8n.pt")
+    parser.add_argument("--videos", nargs="+",
+                        default=[os.path.join(_PROJECT_ROOT, "assets", "sample_video.mp4")],
+                        help="Vídeos usados na calibração e na avaliação")
+    parser.add_argument("--calib-frames", type=int, default=200)
+    parser.add_argument("--eval-frames", type=int, default=100)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--confidence", type=float, default=0.5,
+                        help="Limiar de operação das detecções de referência (FP32)")
+    parser.add_argument("--per-tensor", action="store_true", help="Pesos por tensor em vez de por canal")
+    parser.add_argument("--output", help="Arquivo JSON para salvar a avaliação")
+    args = parser.parse_args()
+
+    try:
+        # Calibração e avaliação em frames disjuntos dos mesmos vídeos
+        calib_frames, frames = split_frames(args.videos, args.calib_frames, args.eval_frames)
+        fp32_path, int8_path = quantize_model(
+            args.model, args.videos, imgsz=args.imgsz, per_channel=not args.per_tensor,
+            frames=calib_frames,
+        )
+    except (ImportError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    report = evaluate_int8(fp32_path, int8_path, frames, confidence=args.confidence, imgsz=args.imgsz)
+    report.update({'model': args.model, 'fp32_model': fp32_path, 'int8_model': int8_path})
+
+    print("\n📊 INT8 x FP32 (classe moto):")
+    print(f"   • FPS: {report['fp32_fps']:.2f} -> {report['int8_fps']:.2f}")
+    print(f"   • Tamanho: {report['fp32_size_mb']:.1f} MB -> {report['int8_size_mb']:.1f} MB")
+    if report['moto_map50_drop'] is None:
+        print("   • Nenhuma moto detectada pelo FP32 nos frames de avaliação")
+    else:
+        print(f"   • AP@0.5 do INT8: {report['moto_ap50_int8']:.3f} "
+              f"(queda de {report['moto_map50_drop'] * 100:.1f} pontos)")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"💾 Resultados salvos em: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,50 @@
+import atexit
+import io
 import os
 import sqlite3
 from datetime import datetime, timedelta
-from flask import Flask, request, jsonify, send_from_directory
+import numpy as np
+from flask import Flask, Response, request, jsonify, send_from_directory
 from flask_socketio import SocketIO
 import json
 
+try:
+    from .db_pool import get_pool
+    from .device_registry import DeviceRegistry, migrate as migrate_devices
+    from .event_broadcaster import EventBroadcaster
+    from .metrics_aggregator import MetricsAggregator
+    from .occupancy_grid import OCCUPANCY_SCHEMA, OCCUPANCY_UPSERT, OccupancyGrid
+    from .streaming import history_response
+    from . import telemetry_store
+    from .write_behind import WriteBehindQueue, WriteError
+except ImportError:  # executado como script (python app.py)
+    from db_pool import get_pool
+    from device_registry import DeviceRegistry, migrate as migrate_devices
+    from event_broadcaster import EventBroadcaster
+    from metrics_aggregator import MetricsAggregator
+    from occupancy_grid import OCCUPANCY_SCHEMA, OCCUPANCY_UPSERT, OccupancyGrid
+    from streaming import history_response
+    import telemetry_store
+    from write_behind import WriteBehindQueue, WriteError
+
 DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'fleetzone.db')
 
+# Ingestão: 'async' responde 202 e grava em group commit; 'sync' grava na requisição
+DURABILITY = os.environ.get('FLEETZONE_DURABILITY', 'async')
+FLUSH_INTERVAL_MS = int(os.environ.get('FLEETZONE_FLUSH_MS', '50'))
+FLUSH_MAX_ROWS = int(os.environ.get('FLEETZONE_FLUSH_ROWS', '500'))
+
+# Janela de agrupamento dos eventos enviados ao dashboard
+BROADCAST_WINDOW_MS = int(os.environ.get('FLEETZONE_BROADCAST_MS', '100'))
+
 def create_app() -> Flask:
     app = Flask(__name__, static_folder='static', template_folder='templates')
     app.config['SECRET_KEY'] = 'fleetzone-secret'
     return app
 
 def get_db_connection() -> sqlite3.Connection:
-    connection = sqlite3.connect(DB_PATH)
-    connection.row_factory = sqlite3.Row
-    return connection
+    # Conexão do pool (WAL); close() a devolve para a próxima requisição
+    return get_pool(DB_PATH).connect()
 
 def init_db() -> None:
     connection = get_db_connection()
@@ -36,6 +65,7 @@ def init_db() -> None:
             x2 INTEGER,
             y2 INTEGER,
             area INTEGER,
+            track_id INTEGER,
             fps REAL,
             total_detections INTEGER,
             unique_motos INTEGER,
@@ -44,6 +74,11 @@ def init_db() -> None:
         """
     )
     
+    # Bancos anteriores ao rastreamento: acrescenta a coluna track_id
+    columns = {row[1] for row in cursor.execute('PRAGMA table_info(detections)')}
+    if 'track_id' not in columns:
+        cursor.execute('ALTER TABLE detections ADD COLUMN track_id INTEGER')
+    
     # Tabela de alertas
     cursor.execute(
         """
@@ -80,6 +115,11 @@ def init_db() -> None:
         """
     )
     
+    # Uma linha por dispositivo: remove duplicatas antigas e cria o índice único
+    removed = migrate_devices(connection)
+    if removed:
+        print(f"🧹 {removed} linha(s) duplicada(s) removida(s) de iot_devices")
+    
     # Tabela de eventos IoT
     cursor.execute(
         """
@@ -94,81 +134,240 @@ def init_db() -> None:
         """
     )
     
+    # Telemetria tipada dos sensores e agregados por minuto/hora
+    telemetry_store.create_schema(connection)
+    migrated = telemetry_store.backfill(connection)
+    if migrated:
+        print(f"📈 {migrated} leitura(s) de sensor migrada(s) para sensor_telemetry")
+    
+    # Grade de ocupação do pátio (motos únicas e heatmap)
+    cursor.execute(OCCUPANCY_SCHEMA)
+    
+    # ?since= é um filtro ao lado de id < ? e a paginação percorre a chave
+    # primária; os índices de tempo não são usados e só pesavam na ingestão
+    cursor.execute('DROP INDEX IF EXISTS idx_detections_created_at')
+    cursor.execute('DROP INDEX IF EXISTS idx_iot_events_timestamp')
+    
     connection.commit()
     connection.close()
 
 app = create_app()
 socketio = SocketIO(app, cors_allowed_origins='*')
 
+# Fila de escrita compartilhada pelos endpoints de ingestão (flush na saída)
+write_queue = WriteBehindQueue(
+    get_db_connection,
+    durability=DURABILITY,
+    flush_interval=FLUSH_INTERVAL_MS / 1000.0,
+    max_batch=FLUSH_MAX_ROWS,
+)
+atexit.register(write_queue.stop)
+
+# Último estado de cada dispositivo IoT; gravado periodicamente pela fila de escrita
+device_registry = DeviceRegistry().start(write_queue.submit)
+atexit.register(device_registry.stop)  # atexit é LIFO: grava o cache antes de esvaziar a fila
+
+# Métricas do dashboard e grade de ocupação em memória (carregadas do banco antes da 1ª requisição)
+metrics_aggregator = MetricsAggregator()
+occupancy_grid = OccupancyGrid()
+
+def dashboard_metrics():
+    """Métricas do dashboard, montadas só a partir da memória"""
+    response = metrics_aggregator.snapshot()
+    response['unique_motos'] = occupancy_grid.unique_motos()
+    return response
+
+# Eventos do dashboard agrupados em um quadro por janela, com ack por cliente;
+# cada quadro leva só as métricas que mudaram (estado inicial: /dashboard/snapshot)
+broadcaster = EventBroadcaster(socketio, window=BROADCAST_WINDOW_MS / 1000.0, state=dashboard_metrics)
+atexit.register(broadcaster.stop)
+
+@socketio.on('connect')
+def on_connect():
+    broadcaster.register(request.sid)
+    broadcaster.start()
+
+@socketio.on('disconnect')
+def on_disconnect(reason=None):
+    broadcaster.unregister(request.sid)
+
+@app.before_request
+def bootstrap_metrics():
+    metrics_aggregator.bootstrap(get_db_connection)
+    device_registry.bootstrap(get_db_connection)
+    occupancy_grid.bootstrap(get_db_connection)
+
+def record_detections(events):
+    """Atualiza agregados em memória e enfileira as células alteradas da grade"""
+    metrics_aggregator.record_detections(events)
+    try:
+        write_queue.submit(OCCUPANCY_UPSERT, occupancy_grid.record(events))
+    except WriteError as e:
+        # As detecções já foram gravadas; a grade em memória segue valendo
+        print(f"⚠️ Células da grade não gravadas: {e}")
+
+def queue_full_response():
+    response = jsonify({'status': 'error', 'error': 'fila de escrita cheia, tente novamente'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+@app.errorhandler(WriteError)
+def write_error_response(error):
+    # Modo 'sync': o banco recusou o commit; repetir a requisição não resolve
+    return jsonify({'status': 'error', 'error': f'falha ao gravar: {error}'}), 500
+
 @app.route('/')
 def index():
     return send_from_directory(app.static_folder, 'index.html')
 
-@app.route('/detections', methods=['POST'])
-def detections():
-    payload = request.get_json(silent=True) or {}
+MAX_BATCH_SIZE = 1000
+
+DETECTION_INSERT = '''INSERT INTO detections 
+           (created_at, frame, class, class_name, confidence, x1, y1, x2, y2, area, track_id, 
+            fps, total_detections, unique_motos, detection_rate) 
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+
+ALERT_INSERT = '''INSERT INTO alerts (created_at, alert_type, message, severity) 
+                   VALUES (?, ?, ?, ?)'''
+
+def alert_row(alert):
+    """Tupla na ordem de ALERT_INSERT"""
+    return (alert['created_at'], alert['alert_type'], alert['message'], alert['severity'])
+
+def publish_alerts(alerts):
+    """
+    on_commit do ALERT_INSERT: os ids vêm do banco e só depois do commit os
+    alertas contam nas métricas e vão ao dashboard (um resolve posterior
+    remove o alerta exibido)
+    """
+    def on_commit(ids):
+        for alert, alert_id in zip(alerts, ids):
+            alert['id'] = alert_id
+        metrics_aggregator.record_alerts(len(alerts))
+        broadcaster.alerts(alerts)
+    return on_commit
+
+IOT_EVENT_INSERT = '''
+        INSERT INTO iot_events (device_id, event_type, event_data, timestamp)
+        VALUES (?, ?, ?, ?)
+    '''
+
+def parse_detection(payload, created_at):
+    """Valida um payload de detecção; devolve o evento (ValueError se inválido)"""
+    if not isinstance(payload, dict):
+        raise ValueError('detecção deve ser um objeto JSON')
     
-    # Extrai dados básicos
-    frame = int(payload.get('frame', 0))
-    class_id = int(payload.get('class', -1))
-    class_name = payload.get('class_name', 'unknown')
-    confidence = float(payload.get('confidence', 0.0))
     bbox = payload.get('bbox', [0, 0, 0, 0])
-    area = int(payload.get('area', 0))
-    
-    # Extrai métricas
-    metrics = payload.get('metrics', {})
-    fps = float(metrics.get('avg_fps', 0.0))
-    total_detections = int(metrics.get('total_detections', 0))
-    unique_motos = int(metrics.get('unique_motos', 0))
-    detection_rate = float(metrics.get('detection_rate', 0.0))
-    
-    created_at = datetime.utcnow().isoformat()
+    if not isinstance(bbox, (list, tuple)) or len(bbox) != 4:
+        raise ValueError('bbox deve ter 4 coordenadas')
+    metrics = payload.get('metrics') or {}
+    if not isinstance(metrics, dict):
+        raise ValueError('metrics deve ser um objeto JSON')
     
-    # Salva no banco
-    connection = get_db_connection()
-    cursor = connection.cursor()
-    
-    cursor.execute(
-        '''INSERT INTO detections 
-           (created_at, frame, class, class_name, confidence, x1, y1, x2, y2, area, 
-            fps, total_detections, unique_motos, detection_rate) 
-           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-        (created_at, frame, class_id, class_name, confidence, 
-         bbox[0], bbox[1], bbox[2], bbox[3], area,
-         fps, total_detections, unique_motos, detection_rate)
-    )
+    track_id = payload.get('track_id')
     
-    # Métricas são calculadas dinamicamente, não precisam ser salvas separadamente
+    try:
+        return {
+            'created_at': created_at,
+            'frame': int(payload.get('frame', 0)),
+            'class': int(payload.get('class', -1)),
+            'class_name': str(payload.get('class_name', 'unknown')),
+            'confidence': float(payload.get('confidence', 0.0)),
+            'bbox': [int(v) for v in bbox],
+            'area': int(payload.get('area', 0)),
+            'track_id': None if track_id is None else int(track_id),
+            'fps': float(metrics.get('avg_fps', 0.0)),
+            'total_detections': int(metrics.get('total_detections', 0)),
+            'unique_motos': int(metrics.get('unique_motos', 0)),
+            'detection_rate': float(metrics.get('detection_rate', 0.0)),
+        }
+    except (TypeError, ValueError) as e:
+        raise ValueError(f'campo numérico inválido: {e}')
+
+def detection_row(event):
+    """Tupla na ordem de DETECTION_INSERT"""
+    x1, y1, x2, y2 = event['bbox']
+    return (event['created_at'], event['frame'], event['class'], event['class_name'],
+            event['confidence'], x1, y1, x2, y2, event['area'], event['track_id'],
+            event['fps'], event['total_detections'], event['unique_motos'], event['detection_rate'])
+
+@app.route('/detections', methods=['POST'])
+def detections():
+    payload = request.get_json(silent=True) or {}
     
-    connection.commit()
-    connection.close()
+    try:
+        event = parse_detection(payload, datetime.utcnow().isoformat())
+    except ValueError as e:
+        return jsonify({'status': 'error', 'error': str(e)}), 400
     
-    # Prepara evento para Socket.IO
-    event = {
-        'created_at': created_at,
-        'frame': frame,
-        'class': class_id,
-        'class_name': class_name,
-        'confidence': confidence,
-        'bbox': bbox,
-        'area': area,
-        'fps': fps,
-        'total_detections': total_detections,
-        'unique_motos': unique_motos,
-        'detection_rate': detection_rate
-    }
+    # Enfileira para o escritor (group commit); métricas são calculadas dinamicamente
+    if not write_queue.submit(DETECTION_INSERT, [detection_row(event)]):
+        return queue_full_response()
+    record_detections([event])
     
-    # Emite evento em tempo real
-    socketio.emit('detection', event)
+    # Vai para o próximo quadro do dashboard
+    broadcaster.detections([event])
     
     # Verifica alertas
-    check_alerts(class_id, confidence, total_detections, unique_motos)
+    check_alerts(event['class'], event['confidence'], event['total_detections'], event['unique_motos'])
     
-    return jsonify({'status': 'ok'}), 201
+    return jsonify({'status': 'ok'}), write_queue.accepted_status
 
-def check_alerts(class_id, confidence, total_detections, unique_motos):
-    """Verifica e cria alertas baseados nos dados"""
+@app.route('/detections/batch', methods=['POST'])
+def detections_batch():
+    """
+    Recebe uma lista de detecções (ou {"detections": [...]}).
+    O lote é validado inteiro antes de gravar: um item inválido rejeita o
+    lote com 400. Detecções e alertas são enfileirados juntos (mesmo group
+    commit) e vão juntos para o próximo quadro do dashboard.
+    """
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict):
+        payload = payload.get('detections')
+    if not isinstance(payload, list):
+        return jsonify({'status': 'error', 'error': 'esperada uma lista de detecções'}), 400
+    if len(payload) > MAX_BATCH_SIZE:
+        return jsonify({'status': 'error', 'error': f'lote maior que {MAX_BATCH_SIZE} detecções'}), 413
+    if not payload:
+        return jsonify({'status': 'ok', 'inserted': 0, 'alerts': 0}), 200
+    
+    created_at = datetime.utcnow().isoformat()
+    events, errors = [], []
+    for index, item in enumerate(payload):
+        try:
+            events.append(parse_detection(item, created_at))
+        except ValueError as e:
+            errors.append({'index': index, 'error': str(e)})
+    if errors:
+        return jsonify({'status': 'error', 'errors': errors[:20], 'invalid': len(errors)}), 400
+    
+    # Regras de alerta numa única passada sobre o lote
+    alerts = []
+    for event in events:
+        for alert in evaluate_alerts(event['class'], event['confidence'],
+                                     event['total_detections'], event['unique_motos']):
+            alerts.append({
+                'created_at': created_at,
+                'alert_type': alert['type'],
+                'message': alert['message'],
+                'severity': alert['severity'],
+            })
+    
+    # Alertas contam e vão ao dashboard no commit, já com o id do banco
+    accepted = write_queue.submit_many([
+        (DETECTION_INSERT, [detection_row(event) for event in events]),
+        (ALERT_INSERT, [alert_row(alert) for alert in alerts], publish_alerts(alerts)),
+    ])
+    if not accepted:
+        return queue_full_response()
+    record_detections(events)
+    
+    broadcaster.detections(events)
+    
+    return jsonify({'status': 'ok', 'inserted': len(events), 'alerts': len(alerts)}), write_queue.accepted_status
+
+def evaluate_alerts(class_id, confidence, total_detections, unique_motos):
+    """Regras de alerta de uma detecção (sem efeitos colaterais)"""
     alerts = []
     
     # Alerta para baixa confiança
@@ -203,81 +402,43 @@ def check_alerts(class_id, confidence, total_detections, unique_motos):
             'severity': 'info'
         })
     
+    return alerts
+
+def check_alerts(class_id, confidence, total_detections, unique_motos):
+    """Verifica e cria alertas baseados nos dados"""
+    alerts = evaluate_alerts(class_id, confidence, total_detections, unique_motos)
+    
     # Salva alertas
     if alerts:
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        
-        for alert in alerts:
-            cursor.execute(
-                '''INSERT INTO alerts (created_at, alert_type, message, severity) 
-                   VALUES (?, ?, ?, ?)''',
-                (datetime.utcnow().isoformat(), alert['type'], alert['message'], alert['severity'])
-            )
-        
-        connection.commit()
-        connection.close()
-        
-        # Emite alertas via Socket.IO
-        for alert in alerts:
-            socketio.emit('alert', alert)
+        created_at = datetime.utcnow().isoformat()
+        alerts = [
+            {'created_at': created_at, 'alert_type': alert['type'],
+             'message': alert['message'], 'severity': alert['severity']}
+            for alert in alerts
+        ]
+        # Contam e vão ao dashboard só depois do commit, com o id do banco
+        # (fila cheia ou commit recusado: os alertas não aparecem)
+        try:
+            write_queue.submit(ALERT_INSERT, [alert_row(alert) for alert in alerts],
+                               on_commit=publish_alerts(alerts))
+        except WriteError as e:
+            print(f"⚠️ Alertas não gravados: {e}")  # a detecção já foi gravada
 
 @app.route('/metrics', methods=['GET'])
 def metrics():
-    connection = get_db_connection()
-    cursor = connection.cursor()
-    
-    # Métricas gerais
-    cursor.execute('SELECT COUNT(*) FROM detections')
-    total_events = cursor.fetchone()[0]
-    
-    cursor.execute('SELECT COUNT(DISTINCT class_name) FROM detections WHERE class_name IS NOT NULL')
-    unique_classes = cursor.fetchone()[0]
-    
-    # Calcula motos únicas baseado em posição aproximada (bbox)
-    cursor.execute('''
-        SELECT COUNT(DISTINCT CAST(x1/50 AS INTEGER) || '_' || CAST(y1/50 AS INTEGER)) 
-        FROM detections 
-        WHERE class_name = 'motorbike'
-    ''')
-    unique_motos_count = cursor.fetchone()[0]
-    
-    cursor.execute('SELECT fps FROM detections WHERE fps IS NOT NULL ORDER BY id DESC LIMIT 60')
-    last_fps = [row[0] for row in cursor.fetchall()]
-    avg_fps = sum(last_fps) / len(last_fps) if last_fps else 0.0
-    
-    # Métricas de performance
-    cursor.execute('SELECT AVG(detection_rate) FROM detections WHERE detection_rate > 0')
-    avg_detection_rate = cursor.fetchone()[0] or 0.0
-    
-    # Últimas métricas agregadas
-    try:
-        cursor.execute('SELECT * FROM metrics ORDER BY id DESC LIMIT 1')
-        last_metrics = cursor.fetchone()
-    except sqlite3.OperationalError:
-        last_metrics = None
-    
-    # Alertas ativos
-    try:
-        cursor.execute('SELECT COUNT(*) FROM alerts WHERE resolved = FALSE')
-        active_alerts = cursor.fetchone()[0]
-    except sqlite3.OperationalError:
-        active_alerts = 0
-    
-    connection.close()
-    
-    return jsonify({
-        'total_events': total_events,
-        'unique_classes': unique_classes,
-        'unique_motos': unique_motos_count,
-        'avg_fps_last_60': avg_fps,
-        'avg_detection_rate': avg_detection_rate,
-        'active_alerts': active_alerts,
-        'last_metrics': dict(last_metrics) if last_metrics else None
-    })
+    """Métricas do dashboard servidas da memória (O(1), sem varrer detections)"""
+    response = dashboard_metrics()
+    response['ingest_queue'] = write_queue.stats()
+    response['broadcast'] = broadcaster.stats()
+    return jsonify(response)
 
-@app.route('/alerts', methods=['GET'])
-def get_alerts():
+@app.route('/occupancy/heatmap', methods=['GET'])
+def occupancy_heatmap():
+    """Mapa de calor do pátio: células da grade com peso atual >= min_score"""
+    min_score = request.args.get('min_score', 0.05, type=float)
+    return jsonify(occupancy_grid.heatmap(min_score=min_score))
+
+def active_alerts(limit=20):
     connection = get_db_connection()
     cursor = connection.cursor()
     
@@ -285,43 +446,52 @@ def get_alerts():
         SELECT * FROM alerts 
         WHERE resolved = FALSE 
         ORDER BY created_at DESC 
-        LIMIT 20
-    ''')
+        LIMIT ?
+    ''', (limit,))
     
     alerts = [dict(row) for row in cursor.fetchall()]
     connection.close()
-    
-    return jsonify(alerts)
+    return alerts
+
+@app.route('/alerts', methods=['GET'])
+def get_alerts():
+    return jsonify(active_alerts())
+
+@app.route('/dashboard/snapshot', methods=['GET'])
+def dashboard_snapshot():
+    """
+    Estado completo do dashboard para a carga inicial e reconexões; depois
+    disso o cliente só recebe os quadros 'dashboard_frame' (seq > seq do snapshot).
+    """
+    return jsonify({
+        'seq': broadcaster.seq,
+        'metrics': dashboard_metrics(),
+        'alerts': active_alerts(limit=10),
+        'devices': device_registry.devices(),
+    })
 
 @app.route('/alerts/<int:alert_id>/resolve', methods=['POST'])
 def resolve_alert(alert_id):
     connection = get_db_connection()
     cursor = connection.cursor()
     
-    cursor.execute('UPDATE alerts SET resolved = TRUE WHERE id = ?', (alert_id,))
+    cursor.execute('UPDATE alerts SET resolved = TRUE WHERE id = ? AND resolved = FALSE', (alert_id,))
     connection.commit()
     connection.close()
+    if cursor.rowcount:
+        metrics_aggregator.resolve_alerts(cursor.rowcount)
+        broadcaster.resolved(alert_id)
     
     return jsonify({'status': 'ok'})
 
 @app.route('/history', methods=['GET'])
 def get_history():
-    """Retorna histórico de detecções"""
-    limit = request.args.get('limit', 100, type=int)
-    
-    connection = get_db_connection()
-    cursor = connection.cursor()
-    
-    cursor.execute('''
-        SELECT * FROM detections 
-        ORDER BY created_at DESC 
-        LIMIT ?
-    ''', (limit,))
-    
-    history = [dict(row) for row in cursor.fetchall()]
-    connection.close()
-    
-    return jsonify(history)
+    """
+    Retorna histórico de detecções (mais recentes primeiro).
+    Paginação por cursor: ?before_id=<X-Next-Before-Id da página anterior>;
+    exportação: ?format=ndjson|stream&since=<ISO>&limit=0
+    """
+    return history_response(get_db_connection, 'detections', 100, 'created_at')
 
 @app.route('/iot/sensor', methods=['POST'])
 def iot_sensor():
@@ -332,25 +502,16 @@ def iot_sensor():
     moto_id = payload.get('moto_id', 'unknown')
     location = payload.get('location', 'unknown')
     timestamp = payload.get('timestamp', datetime.utcnow().isoformat())
-    is_active = payload.get('is_active', False)
-    battery_level = payload.get('battery_level', 0.0)
-    signal_strength = payload.get('signal_strength', 0.0)
-    temperature = payload.get('temperature', 0.0)
-    humidity = payload.get('humidity', 0.0)
-    vibration = payload.get('vibration', 0.0)
-    
-    connection = get_db_connection()
-    cursor = connection.cursor()
-    
-    # Atualiza ou insere dispositivo
-    cursor.execute('''
-        INSERT OR REPLACE INTO iot_devices 
-        (device_id, device_type, location, created_at, last_seen, status, 
-         battery_level, signal_strength, temperature, humidity, vibration)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (device_id, 'sensor', location, timestamp, timestamp, 
-          'active' if is_active else 'idle', battery_level, signal_strength,
-          temperature, humidity, vibration))
+    is_active = bool(payload.get('is_active', False))
+    try:
+        ts = telemetry_store.to_epoch(timestamp)
+        battery_level = float(payload.get('battery_level', 0.0))
+        signal_strength = float(payload.get('signal_strength', 0.0))
+        temperature = float(payload.get('temperature', 0.0))
+        humidity = float(payload.get('humidity', 0.0))
+        vibration = float(payload.get('vibration', 0.0))
+    except (TypeError, ValueError) as e:
+        return jsonify({'status': 'error', 'error': f'campo numérico ou timestamp inválido: {e}'}), 400
     
     # Registra evento
     event_data = {
@@ -363,26 +524,23 @@ def iot_sensor():
         'vibration': vibration
     }
     
-    cursor.execute('''
-        INSERT INTO iot_events (device_id, event_type, event_data, timestamp)
-        VALUES (?, ?, ?, ?)
-    ''', (device_id, 'sensor_data', json.dumps(event_data), timestamp))
-    
-    connection.commit()
-    connection.close()
-    
-    # Emite evento via Socket.IO
-    socketio.emit('iot_sensor', {
-        'device_id': device_id,
-        'moto_id': moto_id,
-        'location': location,
-        'is_active': is_active,
-        'timestamp': timestamp,
-        'battery_level': battery_level,
-        'signal_strength': signal_strength
-    })
-    
-    return jsonify({'status': 'ok'}), 201
+    # Evento no log + leitura tipada (agregados pelo trigger), no mesmo commit
+    telemetry_row = telemetry_store.reading_row(device_id, ts, moto_id, is_active, event_data)
+    if not write_queue.submit_many([
+        (IOT_EVENT_INSERT, [(device_id, 'sensor_data', json.dumps(event_data), timestamp)]),
+        (telemetry_store.TELEMETRY_INSERT, [telemetry_row]),
+    ]):
+        return queue_full_response()
+    
+    # Atualiza o cadastro do dispositivo (UPSERT no próximo flush) e o dashboard
+    broadcaster.device(device_registry.update(
+        device_id, 'sensor', location, timestamp,
+        status='active' if is_active else 'idle', battery_level=battery_level,
+        signal_strength=signal_strength, temperature=temperature,
+        humidity=humidity, vibration=vibration,
+    ))
+    
+    return jsonify({'status': 'ok'}), write_queue.accepted_status
 
 @app.route('/iot/actuator', methods=['POST'])
 def iot_actuator():
@@ -394,20 +552,11 @@ def iot_actuator():
     timestamp = payload.get('timestamp', datetime.utcnow().isoformat())
     status = payload.get('status', 'idle')
     last_action = payload.get('last_action')
-    power_level = payload.get('power_level', 0.0)
-    temperature = payload.get('temperature', 0.0)
-    
-    connection = get_db_connection()
-    cursor = connection.cursor()
-    
-    # Atualiza ou insere dispositivo
-    cursor.execute('''
-        INSERT OR REPLACE INTO iot_devices 
-        (device_id, device_type, location, created_at, last_seen, status, 
-         power_level, temperature, last_action)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (device_id, 'actuator', location, timestamp, timestamp, status,
-          power_level, temperature, last_action))
+    try:
+        power_level = float(payload.get('power_level', 0.0))
+        temperature = float(payload.get('temperature', 0.0))
+    except (TypeError, ValueError) as e:
+        return jsonify({'status': 'error', 'error': f'campo numérico inválido: {e}'}), 400
     
     # Registra evento
     event_data = {
@@ -417,59 +566,69 @@ def iot_actuator():
         'temperature': temperature
     }
     
-    cursor.execute('''
-        INSERT INTO iot_events (device_id, event_type, event_data, timestamp)
-        VALUES (?, ?, ?, ?)
-    ''', (device_id, 'actuator_data', json.dumps(event_data), timestamp))
-    
-    connection.commit()
-    connection.close()
+    if not write_queue.submit(IOT_EVENT_INSERT, [(device_id, 'actuator_data', json.dumps(event_data), timestamp)]):
+        return queue_full_response()
     
-    # Emite evento via Socket.IO
-    socketio.emit('iot_actuator', {
-        'device_id': device_id,
-        'location': location,
-        'status': status,
-        'timestamp': timestamp,
-        'power_level': power_level
-    })
+    # Atualiza o cadastro do dispositivo (UPSERT no próximo flush) e o dashboard
+    broadcaster.device(device_registry.update(
+        device_id, 'actuator', location, timestamp,
+        status=status, power_level=power_level, temperature=temperature, last_action=last_action,
+    ))
     
-    return jsonify({'status': 'ok'}), 201
+    return jsonify({'status': 'ok'}), write_queue.accepted_status
 
 @app.route('/iot/devices', methods=['GET'])
 def get_iot_devices():
-    """Retorna status de todos os dispositivos IoT"""
-    connection = get_db_connection()
-    cursor = connection.cursor()
-    
-    cursor.execute('''
-        SELECT * FROM iot_devices 
-        ORDER BY device_type, device_id
-    ''')
-    
-    devices = [dict(row) for row in cursor.fetchall()]
-    connection.close()
-    
-    return jsonify(devices)
+    """Retorna o último estado de cada dispositivo IoT (servido do cache)"""
+    return jsonify(device_registry.devices())
 
 @app.route('/iot/events', methods=['GET'])
 def get_iot_events():
-    """Retorna eventos IoT recentes"""
-    limit = request.args.get('limit', 50, type=int)
-    
-    connection = get_db_connection()
-    cursor = connection.cursor()
-    
-    cursor.execute('''
-        SELECT * FROM iot_events 
-        ORDER BY timestamp DESC 
-        LIMIT ?
-    ''', (limit,))
-    
-    events = [dict(row) for row in cursor.fetchall()]
-    connection.close()
+    """Retorna eventos IoT recentes (mesma paginação/streaming de /history)"""
+    return history_response(get_db_connection, 'iot_events', 50, 'timestamp')
+
+@app.route('/iot/telemetry', methods=['GET'])
+def get_iot_telemetry():
+    """
+    Série temporal dos sensores, em colunas:
+      ?resolution=  raw (leituras de ?device_id=), 1m ou 1h (agregados)
+      ?metric=      métrica dos agregados (padrão battery_level)
+      ?device_id=   dispositivo (opcional nos agregados: sem ele, a frota toda)
+      ?start=/?end= intervalo [start, end), ISO 8601 (sem fuso = UTC) ou segundos desde a época
+      ?format=      json (padrão) ou npy (array estruturado para numpy.load)
+    """
+    resolution = request.args.get('resolution', '1m')
+    metric = request.args.get('metric', 'battery_level')
+    device_id = request.args.get('device_id')
+    fmt = request.args.get('format', 'json')
+    try:
+        start = request.args.get('start')
+        end = request.args.get('end')
+        start = telemetry_store.to_epoch(start) if start else None
+        end = telemetry_store.to_epoch(end) if end else None
+        if fmt not in ('json', 'npy'):
+            raise ValueError("format deve ser 'json' ou 'npy'")
+        if resolution == 'raw':
+            if not device_id:
+                raise ValueError('resolution=raw exige device_id')
+            data = telemetry_store.query_readings(get_db_connection, device_id, start, end)
+        else:
+            data = telemetry_store.query_rollup(get_db_connection, metric, resolution, device_id, start, end)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'error': str(e)}), 400
+    
+    if fmt == 'npy':
+        buffer = io.BytesIO()
+        np.save(buffer, data, allow_pickle=False)
+        return Response(buffer.getvalue(), mimetype='application/octet-stream')
     
-    return jsonify(events)
+    return jsonify({
+        'device_id': device_id,
+        'resolution': resolution,
+        'metric': None if resolution == 'raw' else metric,
+        'count': int(len(data)),
+        'columns': telemetry_store.to_columns(data),
+    })
 
 @app.route('/static/<path:path>')
 def send_static(path):
@@ -5,11 +5,15 @@ Versão mínima para demonstração
 """
 
 import os
-import sqlite3
 from datetime import datetime
 from flask import Flask, request, jsonify, send_from_directory
 import json
 
+try:
+    from .db_pool import get_pool
+except ImportError:  # executado como script (python app_minimal.py)
+    from db_pool import get_pool
+
 # Configuração
 DB_PATH = 'fleetzone.db'
 app = Flask(__name__, static_folder='static')
@@ -17,9 +21,8 @@ app = Flask(__name__, static_folder='static')
 def get_db_connection():
     """Conecta ao banco de dados"""
     try:
-        connection = sqlite3.connect(DB_PATH)
-        connection.row_factory = sqlite3.Row
-        return connection
+        # Conexão do pool (WAL); close() a devolve para a próxima requisição
+        return get_pool(DB_PATH).connect()
     except Exception as e:
         print(f"Erro ao conectar banco: {e}")
         return None
@@ -5,12 +5,16 @@ Versão otimizada para demonstração
 """
 
 import os
-import sqlite3
 from datetime import datetime
 from flask import Flask, request, jsonify, send_from_directory
 from flask_socketio import SocketIO
 import json
 
+try:
+    from .db_pool import get_pool
+except ImportError:  # executado como script (python app_simple.py)
+    from db_pool import get_pool
+
 # Configuração
 DB_PATH = 'fleetzone.db'
 app = Flask(__name__, static_folder='static')
@@ -19,9 +23,8 @@ socketio = SocketIO(app, cors_allowed_origins='*')
 
 def get_db_connection():
     """Conecta ao banco de dados"""
-    connection = sqlite3.connect(DB_PATH)
-    connection.row_factory = sqlite3.Row
-    return connection
+    # Conexão do pool (WAL); close() a devolve para a próxima requisição
+    return get_pool(DB_PATH).connect()
 
 def init_db():
     """Inicializa o banco de dados"""
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Pool de conexões SQLite do backend
+Conexões persistentes em modo WAL (leitores não bloqueiam o escritor),
+synchronous=NORMAL, busy_timeout e cache de statements preparados.
+
+Cada conexão é usada por uma thread de cada vez: connect() entrega uma
+conexão ociosa (ou abre uma nova) e close() a devolve ao pool em vez de
+fechá-la. O servidor de desenvolvimento do Flask cria uma thread por
+requisição, por isso as conexões não ficam presas a uma thread.
+"""
+
+import sqlite3
+import threading
+
+
+class PooledConnection(sqlite3.Connection):
+    """Conexão cujo close() devolve ao pool (descartando transação aberta)"""
+
+    pool = None
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+        if self.pool is None or not self.pool.release(self):
+            super().close()
+
+    def close_connection(self):
+        """Fecha de fato a conexão"""
+        super().close()
+
+
+class ConnectionPool:
+    """
+    Pool de conexões para um arquivo SQLite.
+
+    - max_idle: conexões ociosas mantidas abertas (excedentes são fechadas)
+    - timeout: espera máxima (s) por um lock antes de 'database is locked'
+    - synchronous: NORMAL é seguro com WAL (perde-se no máximo a última
+      transação em queda de energia, sem corromper o banco)
+    - cached_statements: statements preparados por conexão
+    """
+
+    def __init__(self, db_path, max_idle=8, timeout=5.0, synchronous='NORMAL',
+                 cached_statements=256, cache_size_kb=8192):
+        self.db_path = db_path
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.synchronous = synchronous
+        self.cached_statements = cached_statements
+        self.cache_size_kb = cache_size_kb
+
+        self._idle = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self.opened = 0
+        self.reused = 0
+
+    def _open(self):
+        connection = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            factory=PooledConnection,
+            cached_statements=self.cached_statements,
+            check_same_thread=False,  # uma thread por vez, garantido pelo pool
+        )
+        connection.pool = self
+        connection.row_factory = sqlite3.Row
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute(f'PRAGMA synchronous={self.synchronous}')
+        connection.execute(f'PRAGMA busy_timeout={int(self.timeout * 1000)}')
+        connection.execute(f'PRAGMA cache_size=-{int(self.cache_size_kb)}')
+        connection.execute('PRAGMA temp_store=MEMORY')
+        with self._lock:
+            self.opened += 1
+        return connection
+
+    def connect(self):
+        """Conexão exclusiva até close()"""
+        with self._lock:
+            if self._idle:
+                self.reused += 1
+                return self._idle.pop()
+        return self._open()
+
+    def release(self, connection):
+        """Devolve ao pool; False se a conexão deve ser fechada"""
+        with self._lock:
+            if self._closed or len(self._idle) >= self.max_idle:
+                return False
+            self._idle.append(connection)
+            return True
+
+    def close_all(self):
+        """Fecha as conexões ociosas (as em uso fecham ao serem devolvidas)"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close_connection()
+
+    def stats(self):
+        with self._lock:
+            return {'opened': self.opened, 'reused': self.reused, 'idle': len(self._idle)}
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path, **options):
+    """Pool compartilhado do arquivo `db_path` (criado na primeira chamada)"""
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = _pools[db_path] = ConnectionPool(db_path, **options)
+        return pool
+
+
+def close_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close_all()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+DeviceRegistry - Cadastro de dispositivos IoT com cache do último valor
+`iot_devices` passa a ter uma linha por device_id (índice único). As
+leituras atualizam um cache em memória; as entradas alteradas são
+gravadas periodicamente com UPSERT, e GET /iot/devices é servido do
+cache, em O(dispositivos) e não O(leituras).
+"""
+
+import sqlite3
+import threading
+
+DEVICE_COLUMNS = (
+    'device_id', 'device_type', 'location', 'created_at', 'last_seen', 'status',
+    'battery_level', 'signal_strength', 'temperature', 'humidity', 'vibration',
+    'power_level', 'last_action',
+)
+
+# created_at fica com o valor da primeira leitura
+DEVICE_UPSERT = f'''
+        INSERT INTO iot_devices ({', '.join(DEVICE_COLUMNS)})
+        VALUES ({', '.join('?' for _ in DEVICE_COLUMNS)})
+        ON CONFLICT(device_id) DO UPDATE SET
+            {', '.join(f'{c} = excluded.{c}' for c in DEVICE_COLUMNS if c not in ('device_id', 'created_at'))}
+    '''
+
+
+def migrate(connection):
+    """
+    Remove as linhas duplicadas de cada device_id (mantém a mais recente)
+    e cria o índice único que o UPSERT exige.
+    """
+    cursor = connection.cursor()
+    cursor.execute('''
+        DELETE FROM iot_devices
+        WHERE id NOT IN (SELECT MAX(id) FROM iot_devices GROUP BY device_id)
+    ''')
+    removed = cursor.rowcount
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_iot_devices_device_id ON iot_devices (device_id)')
+    return removed
+
+
+class DeviceRegistry:
+    """
+    Último estado conhecido de cada dispositivo.
+
+    - flush_interval: segundos entre gravações das entradas alteradas
+    """
+
+    def __init__(self, flush_interval=2.0):
+        self.flush_interval = float(flush_interval)
+        self._devices = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._writer = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    # ---------- carga inicial ----------
+
+    def bootstrap(self, connect):
+        with self._lock:
+            if self._loaded:
+                return
+            connection = connect()
+            try:
+                rows = connection.execute(f"SELECT {', '.join(DEVICE_COLUMNS)} FROM iot_devices").fetchall()
+            except sqlite3.OperationalError:
+                rows = []
+            finally:
+                connection.close()
+            self._devices = {row['device_id']: dict(row) for row in rows}
+            self._loaded = True
+
+    # ---------- leituras ----------
+
+    def update(self, device_id, device_type, location, timestamp, **fields):
+        """Aplica uma leitura ao cache (a gravação fica para o próximo flush)"""
+        with self._lock:
+            device = self._devices.get(device_id)
+            if device is None:
+                device = self._devices[device_id] = dict.fromkeys(DEVICE_COLUMNS)
+                device.update(device_id=device_id, created_at=timestamp)
+            device.update(device_type=device_type, location=location, last_seen=timestamp, **fields)
+            self._dirty.add(device_id)
+            return dict(device)
+
+    def devices(self):
+        """Todos os dispositivos, na ordem (device_type, device_id)"""
+        with self._lock:
+            return sorted(
+                (dict(device) for device in self._devices.values()),
+                key=lambda d: (d['device_type'] or '', d['device_id']),
+            )
+
+    def get(self, device_id):
+        with self._lock:
+            device = self._devices.get(device_id)
+            return dict(device) if device else None
+
+    # ---------- gravação ----------
+
+    def dirty_rows(self):
+        """Linhas de DEVICE_UPSERT das entradas alteradas desde o último flush"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            return [tuple(self._devices[d][c] for c in DEVICE_COLUMNS) for d in dirty]
+
+    def flush(self):
+        rows = self.dirty_rows()
+        if not rows or self._writer is None:
+            return len(rows)
+        try:
+            accepted = self._writer(DEVICE_UPSERT, rows)
+        except Exception as e:
+            accepted = False
+            print(f"⚠️ Cadastro de dispositivos não gravado: {e}")
+        if not accepted:
+            with self._lock:
+                self._dirty.update(row[0] for row in rows)  # tenta no próximo ciclo
+        return len(rows)
+
+    def start(self, writer):
+        """
+        Inicia o flush periódico; `writer(statement, rows)` grava as linhas
+        (ex.: WriteBehindQueue.submit) e devolve False se não aceitou.
+        """
+        with self._lock:
+            self._writer = writer
+            if self._thread is None:
+                self._stop_event.clear()
+                self._thread = threading.Thread(target=self._run, name='device-registry', daemon=True)
+                self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+
+    def stop(self):
+        """Encerra o flush periódico gravando o que estiver pendente"""
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join(timeout=self.flush_interval + 1.0)
+            self._thread = None
+        self.flush()
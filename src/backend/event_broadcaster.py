@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+EventBroadcaster - Envio agrupado de eventos para o dashboard
+Em vez de um emit do Socket.IO por detecção/alerta/leitura, os eventos
+são acumulados em um quadro a cada `window` segundos: contagens por
+classe, as últimas detecções e alertas, o estado mais recente de cada
+dispositivo e os campos das métricas do dashboard que mudaram desde o
+quadro anterior. Cada cliente confirma (ack) o quadro recebido; um
+cliente lento não recebe quadros novos enquanto tiver `max_in_flight`
+sem confirmação — os quadros seguintes são fundidos em um só, que guarda
+apenas o estado mais recente. O estado completo para a carga inicial e
+reconexões vem de GET /dashboard/snapshot.
+"""
+
+import threading
+import time
+from functools import partial
+
+FRAME_EVENT = 'dashboard_frame'
+
+
+def empty_frame():
+    return {
+        'detections': {'count': 0, 'by_class': {}, 'recent': []},
+        'alerts': {'count': 0, 'recent': [], 'resolved': []},
+        'devices': {},
+        'metrics': {},
+        'dropped_frames': 0,
+    }
+
+
+def merge_frames(older, newer, max_recent):
+    """Funde dois quadros num novo (não altera os originais)"""
+    by_class = dict(older['detections']['by_class'])
+    for class_name, count in newer['detections']['by_class'].items():
+        by_class[class_name] = by_class.get(class_name, 0) + count
+    return {
+        'seq': newer.get('seq'),
+        'detections': {
+            'count': older['detections']['count'] + newer['detections']['count'],
+            'by_class': by_class,
+            'recent': (older['detections']['recent'] + newer['detections']['recent'])[-max_recent:],
+        },
+        'alerts': {
+            'count': older['alerts']['count'] + newer['alerts']['count'],
+            'recent': (older['alerts']['recent'] + newer['alerts']['recent'])[-max_recent:],
+            'resolved': older['alerts']['resolved'] + newer['alerts']['resolved'],
+        },
+        'devices': {**older['devices'], **newer['devices']},
+        'metrics': {**older['metrics'], **newer['metrics']},
+        'dropped_frames': older['dropped_frames'] + newer['dropped_frames'] + 1,
+    }
+
+
+class _Client:
+    __slots__ = ('in_flight', 'sent_at', 'pending')
+
+    def __init__(self):
+        self.in_flight = 0
+        self.sent_at = 0.0
+        self.pending = None
+
+
+class EventBroadcaster:
+    """
+    Agrupa eventos em quadros e os distribui com controle de fluxo por cliente.
+
+    - window: segundos entre quadros (ex.: 0.1)
+    - max_recent: detecções/alertas individuais mantidos por quadro
+    - max_in_flight: quadros sem ack antes de o cliente ser considerado lento
+    - ack_timeout: segundos sem ack após os quais o cliente volta a receber
+    - state: função que devolve o estado atual do dashboard (dict); a cada
+      quadro só os campos alterados são enviados
+    """
+
+    def __init__(self, socketio, window=0.1, max_recent=20, max_in_flight=2, ack_timeout=5.0, state=None):
+        self.socketio = socketio
+        self.state = state
+        self._last_state = {}
+        self.window = float(window)
+        self.max_recent = max_recent
+        self.max_in_flight = max_in_flight
+        self.ack_timeout = float(ack_timeout)
+        self._lock = threading.Lock()
+        self._frame = None
+        self._seq = 0
+        self._clients = {}
+        self._running = False
+        self._stats = {'frames': 0, 'events': 0, 'sent': 0, 'coalesced': 0}
+
+    # ---------- clientes ----------
+
+    def register(self, sid):
+        with self._lock:
+            self._clients[sid] = _Client()
+
+    def unregister(self, sid):
+        with self._lock:
+            self._clients.pop(sid, None)
+
+    def _ack(self, sid, *args):
+        with self._lock:
+            client = self._clients.get(sid)
+            if client is not None:
+                client.in_flight = max(0, client.in_flight - 1)
+
+    # ---------- produtores ----------
+
+    def _current(self):
+        if self._frame is None:
+            self._frame = empty_frame()
+        return self._frame
+
+    def detections(self, events):
+        if not events:
+            return
+        with self._lock:
+            section = self._current()['detections']
+            section['count'] += len(events)
+            for event in events:
+                class_name = event['class_name']
+                section['by_class'][class_name] = section['by_class'].get(class_name, 0) + 1
+            section['recent'] = (section['recent'] + list(events[-self.max_recent:]))[-self.max_recent:]
+            self._stats['events'] += len(events)
+
+    def alerts(self, alerts):
+        if not alerts:
+            return
+        with self._lock:
+            section = self._current()['alerts']
+            section['count'] += len(alerts)
+            section['recent'] = (section['recent'] + list(alerts[-self.max_recent:]))[-self.max_recent:]
+            self._stats['events'] += len(alerts)
+
+    def resolved(self, alert_id):
+        with self._lock:
+            self._current()['alerts']['resolved'].append(alert_id)
+
+    def device(self, state):
+        """Estado atual de um dispositivo (várias leituras no quadro viram uma)"""
+        with self._lock:
+            self._current()['devices'][state['device_id']] = state
+            self._stats['events'] += 1
+
+    # ---------- envio ----------
+
+    @property
+    def seq(self):
+        """Número do último quadro fechado (o snapshot informa de onde parte)"""
+        with self._lock:
+            return self._seq
+
+    def _state_delta(self):
+        """Campos do estado que mudaram desde a última chamada"""
+        current = self.state()
+        delta = {key: value for key, value in current.items() if self._last_state.get(key, object()) != value}
+        self._last_state = current
+        return delta
+
+    def flush(self):
+        """Fecha o quadro atual e envia para os clientes que não estão atrasados"""
+        now = time.monotonic()
+        targets = []
+        with self._lock:
+            has_clients = bool(self._clients)
+        # Fora do lock: o provedor de estado usa os locks dos agregadores
+        delta = self._state_delta() if has_clients and self.state is not None else None
+        with self._lock:
+            if delta:
+                self._current()['metrics'].update(delta)
+            frame, self._frame = self._frame, None
+            if frame is not None:
+                self._seq += 1
+                frame['seq'] = self._seq
+                self._stats['frames'] += 1
+            for sid, client in self._clients.items():
+                if frame is not None:
+                    if client.pending is None:
+                        client.pending = frame
+                    else:
+                        client.pending = merge_frames(client.pending, frame, self.max_recent)
+                        self._stats['coalesced'] += 1
+                if client.pending is None:
+                    continue
+                if client.in_flight >= self.max_in_flight:
+                    if now - client.sent_at < self.ack_timeout:
+                        continue  # cliente lento: segue acumulando só o estado mais recente
+                    client.in_flight = 0  # acks perdidos: volta a enviar
+                targets.append((sid, client.pending))
+                client.pending = None
+                client.in_flight += 1
+                client.sent_at = now
+            self._stats['sent'] += len(targets)
+
+        for sid, payload in targets:
+            self.socketio.emit(FRAME_EVENT, payload, to=sid, callback=partial(self._ack, sid))
+        return len(targets)
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            self.socketio.start_background_task(self._run)
+        return self
+
+    def _run(self):
+        while self._running:
+            self.socketio.sleep(self.window)
+            self.flush()
+
+    def stop(self):
+        self._running = False
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._stats,
+                'window_ms': round(self.window * 1000),
+                'clients': len(self._clients),
+                'slow_clients': sum(1 for c in self._clients.values() if c.in_flight >= self.max_in_flight),
+            }
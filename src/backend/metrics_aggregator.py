@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+MetricsAggregator - Métricas do dashboard mantidas em memória
+Os contadores são atualizados na ingestão (detecções e alertas) e
+carregados do banco uma única vez na primeira requisição, de modo que
+GET /metrics não varre a tabela de detecções. As motos únicas vêm da
+grade de ocupação (occupancy_grid.py).
+"""
+
+import sqlite3
+import threading
+import time
+from collections import deque
+
+
+class MetricsAggregator:
+    """
+    Agregador incremental das métricas de GET /metrics.
+
+    - fps_window: amostras de FPS na média móvel (mesmo LIMIT 60 da consulta antiga)
+    - last_metrics_ttl: a última linha da tabela `metrics` (escrita por outros
+      processos) é relida no máximo a cada `last_metrics_ttl` segundos
+    """
+
+    def __init__(self, fps_window=60, last_metrics_ttl=5.0):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._connect = None
+        self.last_metrics_ttl = last_metrics_ttl
+
+        self.total_events = 0
+        self.class_names = set()
+        self.fps_samples = deque(maxlen=fps_window)
+        self.detection_rate_sum = 0.0
+        self.detection_rate_count = 0
+        self.active_alerts = 0
+        self._last_metrics = None
+        self._last_metrics_at = 0.0
+
+    # ---------- carga inicial ----------
+
+    def bootstrap(self, connect):
+        """Carrega os contadores do banco (uma vez por processo)"""
+        with self._lock:
+            if self._loaded:
+                return
+            self._connect = connect
+            connection = connect()
+            try:
+                self._load(connection)
+            finally:
+                connection.close()
+            self._loaded = True
+
+    def _load(self, connection):
+        cursor = connection.cursor()
+        try:
+            self.total_events = cursor.execute('SELECT COUNT(*) FROM detections').fetchone()[0]
+            self.class_names = {
+                row[0] for row in cursor.execute(
+                    'SELECT DISTINCT class_name FROM detections WHERE class_name IS NOT NULL'
+                )
+            }
+            rows = cursor.execute(
+                f'SELECT fps FROM detections WHERE fps IS NOT NULL ORDER BY id DESC LIMIT {self.fps_samples.maxlen}'
+            ).fetchall()
+            self.fps_samples.clear()
+            self.fps_samples.extend(row[0] for row in reversed(rows))
+            rate_sum, rate_count = cursor.execute(
+                'SELECT SUM(detection_rate), COUNT(*) FROM detections WHERE detection_rate > 0'
+            ).fetchone()
+            self.detection_rate_sum = float(rate_sum or 0.0)
+            self.detection_rate_count = rate_count
+        except sqlite3.OperationalError:
+            pass  # banco ainda sem a tabela de detecções
+
+        try:
+            self.active_alerts = cursor.execute('SELECT COUNT(*) FROM alerts WHERE resolved = FALSE').fetchone()[0]
+        except sqlite3.OperationalError:
+            self.active_alerts = 0
+
+    # ---------- ingestão ----------
+
+    def record_detections(self, events):
+        """Atualiza os contadores com eventos de detecção já validados"""
+        with self._lock:
+            for event in events:
+                self.total_events += 1
+                class_name = event['class_name']
+                if class_name is not None:
+                    self.class_names.add(class_name)
+
+                self.fps_samples.append(event['fps'])
+
+                if event['detection_rate'] > 0:
+                    self.detection_rate_sum += event['detection_rate']
+                    self.detection_rate_count += 1
+
+    def record_alerts(self, count):
+        with self._lock:
+            self.active_alerts += count
+
+    def resolve_alerts(self, count=1):
+        with self._lock:
+            self.active_alerts = max(0, self.active_alerts - count)
+
+    # ---------- leitura ----------
+
+    def _refresh_last_metrics(self):
+        now = time.monotonic()
+        if self._connect is None or now - self._last_metrics_at < self.last_metrics_ttl:
+            return
+        self._last_metrics_at = now
+        connection = self._connect()
+        try:
+            row = connection.execute('SELECT * FROM metrics ORDER BY id DESC LIMIT 1').fetchone()
+            self._last_metrics = dict(row) if row else None
+        except sqlite3.OperationalError:
+            self._last_metrics = None
+        finally:
+            connection.close()
+
+    def snapshot(self):
+        """Resposta de GET /metrics, montada só a partir da memória"""
+        with self._lock:
+            self._refresh_last_metrics()
+            return {
+                'total_events': self.total_events,
+                'unique_classes': len(self.class_names),
+                'avg_fps_last_60': sum(self.fps_samples) / len(self.fps_samples) if self.fps_samples else 0.0,
+                'avg_detection_rate': (self.detection_rate_sum / self.detection_rate_count
+                                       if self.detection_rate_count else 0.0),
+                'active_alerts': self.active_alerts,
+                'last_metrics': self._last_metrics,
+            }
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+OccupancyGrid - Ocupação do pátio por células da imagem
+Cada detecção de moto incrementa a célula (cell_size x cell_size pixels)
+do canto superior esquerdo da bbox. O peso da célula decai pela metade a
+cada `half_life` segundos, então uma moto que sai da vaga deixa de contar
+sozinha. "Motos únicas" = células com peso >= `occupied_threshold`.
+
+O estado vive em memória e é espelhado na tabela `occupancy_cells` (uma
+linha por célula), de modo que contagem e heatmap não dependem do tamanho
+da tabela de detecções.
+"""
+
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+CELL_SIZE = 50
+
+OCCUPANCY_SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS occupancy_cells (
+            cell_x INTEGER NOT NULL,
+            cell_y INTEGER NOT NULL,
+            hits INTEGER NOT NULL,
+            score REAL NOT NULL,
+            last_seen REAL NOT NULL,
+            PRIMARY KEY (cell_x, cell_y)
+        );
+    '''
+
+OCCUPANCY_UPSERT = '''
+        INSERT INTO occupancy_cells (cell_x, cell_y, hits, score, last_seen)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(cell_x, cell_y) DO UPDATE SET
+            hits = excluded.hits, score = excluded.score, last_seen = excluded.last_seen
+    '''
+
+
+def _epoch(created_at):
+    """created_at ISO (UTC, sem fuso) -> segundos desde a época (None se inválido)"""
+    try:
+        return datetime.fromisoformat(created_at).replace(tzinfo=timezone.utc).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class OccupancyGrid:
+    """
+    Grade de ocupação com decaimento exponencial.
+
+    - cell_size: lado da célula em pixels (mesma grade da consulta antiga)
+    - half_life: segundos para o peso de uma célula cair pela metade
+    - occupied_threshold: peso mínimo para a célula contar como ocupada
+    """
+
+    def __init__(self, cell_size=CELL_SIZE, half_life=300.0, occupied_threshold=0.5):
+        self.cell_size = cell_size
+        self.half_life = float(half_life)
+        self.occupied_threshold = occupied_threshold
+        self._cells = {}  # (cx, cy) -> [hits, score, last_seen]
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def _decayed(self, score, last_seen, now):
+        return score * 0.5 ** (max(0.0, now - last_seen) / self.half_life)
+
+    def cell_of(self, x, y):
+        return int(x / self.cell_size), int(y / self.cell_size)
+
+    # ---------- carga inicial ----------
+
+    def bootstrap(self, connect):
+        """
+        Carrega as células da tabela. Na primeira execução (tabela vazia)
+        semeia a grade a partir das detecções já gravadas. Roda antes de
+        cada requisição: uma falha na carga deixa a grade vazia em vez de
+        derrubar a API.
+        """
+        with self._lock:
+            if self._loaded:
+                return
+            connection = connect()
+            try:
+                rows = connection.execute(
+                    'SELECT cell_x, cell_y, hits, score, last_seen FROM occupancy_cells'
+                ).fetchall()
+                if not rows:
+                    rows = self._seed(connection)
+            except sqlite3.OperationalError:
+                rows = []  # banco ainda não inicializado
+            except Exception as e:
+                print(f"⚠️ Grade de ocupação não carregada: {e}")
+                rows = []
+            finally:
+                connection.close()
+            self._cells = {(cx, cy): [hits, score, last_seen] for cx, cy, hits, score, last_seen in rows}
+            self._loaded = True
+
+    def _seed(self, connection):
+        rows = []
+        for cx, cy, hits, last_created in connection.execute(f'''
+            SELECT CAST(x1/{self.cell_size} AS INTEGER), CAST(y1/{self.cell_size} AS INTEGER),
+                   COUNT(*), MAX(CASE WHEN julianday(created_at) IS NOT NULL THEN created_at END)
+            FROM detections
+            WHERE class_name = 'motorbike' AND x1 IS NOT NULL AND y1 IS NOT NULL
+            GROUP BY 1, 2
+        '''):
+            # Sem o histórico de horários, o peso inicial é o da última aparição;
+            # células sem created_at legível ficam de fora
+            last_seen = _epoch(last_created)
+            if last_seen is not None:
+                rows.append((cx, cy, hits, 1.0, last_seen))
+        if rows:
+            with connection:
+                connection.executemany(OCCUPANCY_UPSERT, rows)
+        return rows
+
+    # ---------- ingestão ----------
+
+    def record(self, events, now=None):
+        """
+        Soma as detecções de moto à grade; devolve as linhas de
+        OCCUPANCY_UPSERT das células alteradas (para a fila de escrita).
+        """
+        now = time.time() if now is None else now
+        touched = {}
+        with self._lock:
+            for event in events:
+                if event['class_name'] != 'motorbike':
+                    continue
+                key = self.cell_of(event['bbox'][0], event['bbox'][1])
+                cell = self._cells.get(key)
+                if cell is None:
+                    cell = self._cells[key] = [0, 0.0, now]
+                cell[1] = self._decayed(cell[1], cell[2], now) + 1.0
+                cell[0] += 1
+                cell[2] = now
+                touched[key] = cell
+            return [(cx, cy, hits, score, last_seen) for (cx, cy), (hits, score, last_seen) in touched.items()]
+
+    # ---------- leitura ----------
+
+    def unique_motos(self, now=None):
+        """Células ocupadas agora (limitado pelo tamanho da grade, não do histórico)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            return sum(
+                1 for _, score, last_seen in self._cells.values()
+                if self._decayed(score, last_seen, now) >= self.occupied_threshold
+            )
+
+    def heatmap(self, min_score=0.0, now=None):
+        """Células com peso atual >= min_score, para o mapa de calor do pátio"""
+        now = time.time() if now is None else now
+        with self._lock:
+            cells = []
+            for (cx, cy), (hits, score, last_seen) in self._cells.items():
+                current = self._decayed(score, last_seen, now)
+                if current < min_score:
+                    continue
+                cells.append({
+                    'cell_x': cx,
+                    'cell_y': cy,
+                    'x1': cx * self.cell_size,
+                    'y1': cy * self.cell_size,
+                    'score': round(current, 4),
+                    'hits': hits,
+                    'occupied': current >= self.occupied_threshold,
+                    'last_seen': datetime.fromtimestamp(last_seen, timezone.utc).replace(tzinfo=None).isoformat(),
+                })
+            return {
+                'cell_size': self.cell_size,
+                'half_life': self.half_life,
+                'occupied_threshold': self.occupied_threshold,
+                'cells': cells,
+            }
@@ -12,40 +12,55 @@ const alertsContainer = document.getElementById('alerts-container');
 const iotDevicesContainer = document.getElementById('iot-devices-container');
 
 // Estado da aplicação
+let metrics = {};
 let alerts = [];
 let iotDevicesList = [];
+let lastSeq = 0;  // último quadro já refletido no estado
+let pendingFrames = null;  // quadros recebidos enquanto um snapshot carrega
+let snapshotRequest = 0;
 
 // Variáveis para controle de paginação
 let showAllDevices = false;
 const maxDevicesShow = 6;
 
-// Função para atualizar métricas
-function updateMetrics() {
-    fetch('/metrics', {
-        method: 'GET',
-        headers: {
-            'Accept': 'application/json',
-            'Content-Type': 'application/json'
-        }
-    })
+// Função para exibir métricas (estado local atualizado pelos quadros)
+function displayMetrics() {
+    totalDetections.textContent = (metrics.total_events || 0).toLocaleString();
+    uniqueMotos.textContent = metrics.unique_motos || 0;
+    avgFps.textContent = (metrics.avg_fps_last_60 || 0).toFixed(1);
+    detectionRate.textContent = (metrics.avg_detection_rate || 0).toFixed(2);
+    uniqueClasses.textContent = metrics.unique_classes || 0;
+}
+
+// Estado completo na carga inicial e a cada reconexão; depois só chegam quadros.
+// Os quadros que chegam antes da resposta ficam guardados e são aplicados
+// sobre o snapshot (os com seq <= snapshot.seq já estão nele)
+function loadSnapshot() {
+    const request = ++snapshotRequest;
+    pendingFrames = pendingFrames || [];
+    fetch('/dashboard/snapshot')
         .then(response => {
             if (!response.ok) {
                 throw new Error(`HTTP ${response.status}: ${response.statusText}`);
             }
             return response.json();
         })
-        .then(data => {
-            totalDetections.textContent = data.total_events.toLocaleString();
-            uniqueMotos.textContent = data.unique_motos || 0;
-            avgFps.textContent = data.avg_fps_last_60.toFixed(1);
-            detectionRate.textContent = (data.avg_detection_rate || 0).toFixed(2);
-            uniqueClasses.textContent = data.unique_classes || 0;
-            
-            // Atualiza métricas IoT apenas se métricas principais funcionaram
-            updateIoTMetrics();
+        .then(snapshot => {
+            if (request !== snapshotRequest) return;  // há um snapshot mais novo a caminho
+            lastSeq = snapshot.seq;
+            metrics = snapshot.metrics;
+            alerts = snapshot.alerts;
+            iotDevicesList = snapshot.devices;
+            displayMetrics();
+            displayAlerts();
+            iotDevices.textContent = iotDevicesList.length;
+            displayIoTDevices();
+            applyPendingFrames();
         })
         .catch(error => {
-            console.error('Erro detalhado ao buscar métricas:', error.message);
+            if (request !== snapshotRequest) return;
+            applyPendingFrames();
+            console.error('Erro ao carregar o estado do dashboard:', error.message);
             // Mostra indicador de erro na interface
             totalDetections.textContent = 'Erro';
             uniqueMotos.textContent = 'Erro';
@@ -55,21 +70,6 @@ function updateMetrics() {
         });
 }
 
-// Função para atualizar métricas IoT
-function updateIoTMetrics() {
-    fetch('/iot/devices')
-        .then(response => response.json())
-        .then(data => {
-            iotDevicesList = data;
-            iotDevices.textContent = data.length;
-            displayIoTDevices();
-        })
-        .catch(error => {
-            console.error('Erro ao carregar dispositivos IoT:', error.message);
-            iotDevicesContainer.innerHTML = '<p style="color: #ff5252;">Erro ao carregar dispositivos IoT</p>';
-        });
-}
-
 // Função para exibir dispositivos IoT
 function displayIoTDevices() {
     if (iotDevicesList.length === 0) {
@@ -159,20 +159,6 @@ function displayIoTDevices() {
     iotDevicesContainer.innerHTML = html;
 }
 
-// Função para carregar alertas
-function loadAlerts() {
-    fetch('/alerts')
-        .then(response => response.json())
-        .then(data => {
-            alerts = data;
-            displayAlerts();
-        })
-        .catch(error => {
-            console.error('Erro ao carregar alertas:', error.message);
-            alertsContainer.innerHTML = '<p style="color: #ff5252;">Erro ao carregar alertas</p>';
-        });
-}
-
 // Função para exibir alertas
 function displayAlerts() {
     if (alerts.length === 0) {
@@ -216,52 +202,78 @@ function addDetection(detection) {
     }
 }
 
+function applyPendingFrames() {
+    const frames = pendingFrames || [];
+    pendingFrames = null;
+    frames.forEach(applyFrame);
+}
+
+// Aplica um quadro agrupado do servidor
+function applyFrame(frame) {
+    if (frame.seq <= lastSeq) return;  // já incluído no snapshot
+    lastSeq = frame.seq;
+    
+    frame.detections.recent.forEach(addDetection);
+    
+    if (frame.alerts.recent.length || frame.alerts.resolved.length) {
+        // Alertas chegam com o id do banco: resolves removem os já exibidos
+        // (um alerta gravado antes do snapshot pode chegar também num quadro)
+        const resolved = new Set(frame.alerts.resolved);
+        const known = new Set(alerts.map(alert => alert.id));
+        const fresh = frame.alerts.recent.filter(alert => !known.has(alert.id));
+        alerts = fresh.reverse().concat(alerts)
+            .filter(alert => !resolved.has(alert.id))
+            .slice(0, 10);
+        displayAlerts();
+    }
+    
+    const changed = Object.values(frame.devices);
+    if (changed.length) {
+        changed.forEach(device => {
+            const index = iotDevicesList.findIndex(d => d.device_id === device.device_id);
+            if (index >= 0) {
+                iotDevicesList[index] = device;
+            } else {
+                iotDevicesList.push(device);
+            }
+        });
+        iotDevices.textContent = iotDevicesList.length;
+        displayIoTDevices();
+    }
+    
+    if (Object.keys(frame.metrics).length) {
+        Object.assign(metrics, frame.metrics);
+        displayMetrics();
+    }
+}
+
 // Função para alternar visualização de dispositivos
 function toggleDevicesView() {
     showAllDevices = !showAllDevices;
     displayIoTDevices();
 }
 
-// Função de inicialização
-function initializeDashboard() {
-    updateMetrics();
-    loadAlerts();
-    updateIoTMetrics();
-    
-    // Atualiza métricas a cada 2 segundos
-    setInterval(updateMetrics, 2000);
-    setInterval(loadAlerts, 5000);
-    setInterval(updateIoTMetrics, 3000);
-}
-
 // Configuração do Socket.IO
 function setupSocketIO() {
     const socket = io();
+    let connectedBefore = false;
     
     socket.on('connect', () => {
         console.log('Conectado ao servidor');
+        // Reconexão: quadros perdidos no intervalo são repostos pelo snapshot
+        if (connectedBefore) loadSnapshot();
+        connectedBefore = true;
     });
     
-    socket.on('detection', (detection) => {
-        addDetection(detection);
-        updateMetrics();
-    });
-    
-    socket.on('alert', (alert) => {
-        alerts.unshift(alert);
-        if (alerts.length > 10) alerts.pop();
-        displayAlerts();
-        updateMetrics();
-    });
-    
-    socket.on('iot_sensor', (data) => {
-        console.log('Dados IoT Sensor:', data);
-        updateIoTMetrics();
-    });
-    
-    socket.on('iot_actuator', (data) => {
-        console.log('Dados IoT Atuador:', data);
-        updateIoTMetrics();
+    // Um quadro por janela (~100 ms) com o que mudou: contagens, últimas
+    // detecções/alertas e o estado atual dos dispositivos alterados
+    socket.on('dashboard_frame', (frame, ack) => {
+        if (pendingFrames) {
+            pendingFrames.push(frame);  // aplicado quando o snapshot chegar
+        } else {
+            applyFrame(frame);
+        }
+        if (ack) ack();  // libera o próximo quadro (controle de fluxo no servidor)
     });
     
     socket.on('disconnect', () => {
@@ -271,6 +283,6 @@ function setupSocketIO() {
 
 // Inicialização quando o DOM estiver carregado
 document.addEventListener('DOMContentLoaded', () => {
-    initializeDashboard();
+    loadSnapshot();
     setupSocketIO();
 });
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Paginação por cursor e respostas em streaming
+Consultas de histórico paginadas por `id` (chave primária) em vez de
+OFFSET/ORDER BY em colunas sem índice: cada página é uma busca na árvore
+da PK. Exportações longas saem em NDJSON ou em um array JSON enviado em
+partes, lendo o banco em blocos, sem montar a lista inteira em memória;
+respostas grandes são comprimidas com gzip quando o cliente aceita.
+"""
+
+import gzip
+import json
+import zlib
+from urllib.parse import urlencode
+
+from flask import Response, jsonify, request, stream_with_context
+
+MAX_PAGE_SIZE = 1000
+STREAM_CHUNK = 500
+GZIP_MIN_SIZE = 1024
+FORMATS = ('json', 'ndjson', 'stream')
+
+
+def keyset_query(table, before_id=None, limit=100, time_column=None, since=None):
+    """
+    SELECT de uma página ordenada por id decrescente a partir do cursor.
+    O filtro de tempo fica como predicado da própria consulta: a coluna de
+    tempo pode vir do cliente (ex.: iot_events.timestamp) e chegar fora de
+    ordem, então não equivale a um intervalo de ids.
+    """
+    clauses, params = [], []
+    if since is not None:
+        clauses.append(f'{time_column} >= ?')
+        params.append(since)
+    if before_id is not None:
+        clauses.append('id < ?')
+        params.append(before_id)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    params.append(limit)
+    return f'SELECT * FROM {table} {where} ORDER BY id DESC LIMIT ?', params
+
+
+def fetch_page(connect, table, before_id=None, limit=100, time_column=None, since=None):
+    """Uma página de linhas (dicts) e o cursor da próxima (None no fim)"""
+    sql, params = keyset_query(table, before_id, limit, time_column, since)
+    connection = connect()
+    try:
+        rows = [dict(row) for row in connection.execute(sql, params)]
+    finally:
+        connection.close()
+    next_before_id = rows[-1]['id'] if len(rows) == limit else None
+    return rows, next_before_id
+
+
+def iter_rows(connect, table, before_id=None, limit=None, time_column=None, since=None, chunk=STREAM_CHUNK):
+    """
+    Gera as linhas em blocos de `chunk` (cada bloco é uma consulta curta,
+    sem segurar uma transação de leitura durante toda a exportação).
+    """
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = chunk if remaining is None else min(chunk, remaining)
+        rows, before_id = fetch_page(connect, table, before_id, size, time_column, since)
+        yield from rows
+        if remaining is not None:
+            remaining -= len(rows)
+        if before_id is None:
+            return
+
+
+def _accepts_gzip():
+    return 'gzip' in request.headers.get('Accept-Encoding', '').lower()
+
+
+def _gzip_stream(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: formato gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _ndjson_chunks(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def _json_array_chunks(rows):
+    yield '['
+    first = True
+    for row in rows:
+        yield ('' if first else ',') + json.dumps(row, ensure_ascii=False)
+        first = False
+    yield ']'
+
+
+def stream_response(rows, fmt='ndjson'):
+    """Resposta em partes (NDJSON ou array JSON), com gzip incremental se aceito"""
+    chunks = _ndjson_chunks(rows) if fmt == 'ndjson' else _json_array_chunks(rows)
+    mimetype = 'application/x-ndjson' if fmt == 'ndjson' else 'application/json'
+    headers = {'Vary': 'Accept-Encoding'}
+    if _accepts_gzip():
+        chunks = _gzip_stream(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+
+
+def page_response(rows, next_before_id, limit, since=None):
+    """Página JSON (lista, como antes) com o cursor da próxima nos headers"""
+    response = jsonify(rows)
+    response.headers['Vary'] = 'Accept-Encoding'
+    if next_before_id is not None:
+        query = {'before_id': next_before_id, 'limit': limit}
+        if since is not None:
+            query['since'] = since
+        response.headers['X-Next-Before-Id'] = str(next_before_id)
+        response.headers['Link'] = f'<{request.path}?{urlencode(query)}>; rel="next"'
+    if _accepts_gzip() and response.content_length and response.content_length >= GZIP_MIN_SIZE:
+        response.set_data(gzip.compress(response.get_data(), compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def history_response(connect, table, default_limit, time_column):
+    """
+    Atende um endpoint de histórico:
+      ?before_id=  cursor (id da última linha da página anterior)
+      ?limit=      tamanho da página (json) ou total exportado (streaming; 0 = tudo)
+      ?since=      só linhas com `time_column` >= since (ISO 8601)
+      ?format=     json (padrão, paginado), ndjson ou stream (array JSON em partes)
+    """
+    fmt = request.args.get('format', 'json')
+    if fmt not in FORMATS:
+        return jsonify({'status': 'error', 'error': f'format deve ser um de {FORMATS}'}), 400
+    before_id = request.args.get('before_id', type=int)
+    since = request.args.get('since') or None
+    limit = request.args.get('limit', default_limit, type=int)
+
+    if fmt == 'json':
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        rows, next_before_id = fetch_page(connect, table, before_id, limit, time_column, since)
+        return page_response(rows, next_before_id, limit, since)
+
+    rows = iter_rows(connect, table, before_id, limit if limit > 0 else None, time_column, since)
+    return stream_response(rows, fmt)
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+TelemetryStore - Série temporal tipada das leituras dos sensores IoT
+Cada leitura de /iot/sensor vira uma linha com colunas numéricas em
+`sensor_telemetry`, agrupada fisicamente por (device_id, ts) (tabela
+WITHOUT ROWID), em vez de um JSON em `iot_events.event_data`. Um trigger
+soma cada leitura nova aos agregados por minuto e por hora em
+`telemetry_rollups`, então tendências da frota (ex.: bateria) são lidas
+dos buckets, sem reler nem decodificar as leituras. Leituras reenviadas
+(mesmo device_id e ts) são ignoradas nas duas tabelas.
+
+Timestamps sem fuso horário são interpretados como UTC (ver to_epoch).
+
+As consultas devolvem arrays estruturados do NumPy (TELEMETRY_DTYPE e
+ROLLUP_DTYPE), prontos para análise.
+"""
+
+import json
+import sqlite3
+from datetime import datetime, timezone
+
+import numpy as np
+
+TELEMETRY_METRICS = ('battery_level', 'signal_strength', 'temperature', 'humidity', 'vibration')
+
+# Resolução dos agregados -> tamanho do bucket em segundos
+RESOLUTIONS = {'1m': 60, '1h': 3600}
+
+TELEMETRY_DTYPE = np.dtype(
+    [('ts', 'f8')] + [(m, 'f4') for m in TELEMETRY_METRICS] + [('is_active', '?')]
+)
+
+ROLLUP_DTYPE = np.dtype([
+    ('bucket', 'f8'), ('count', 'i8'), ('devices', 'i4'),
+    ('mean', 'f8'), ('min', 'f8'), ('max', 'f8'), ('active_ratio', 'f8'),
+])
+
+TELEMETRY_SCHEMA = f'''
+        CREATE TABLE IF NOT EXISTS sensor_telemetry (
+            device_id TEXT NOT NULL,
+            ts REAL NOT NULL,
+            moto_id TEXT,
+            is_active INTEGER NOT NULL,
+            {', '.join(f'{m} REAL NOT NULL' for m in TELEMETRY_METRICS)},
+            PRIMARY KEY (device_id, ts)
+        ) WITHOUT ROWID;
+    '''
+
+# Chave (resolution, bucket, device_id): tendência da frota = faixa contígua da PK
+ROLLUP_SCHEMA = f'''
+        CREATE TABLE IF NOT EXISTS telemetry_rollups (
+            resolution INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            device_id TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            active_count INTEGER NOT NULL,
+            {', '.join(f'{m}_sum REAL NOT NULL, {m}_min REAL NOT NULL, {m}_max REAL NOT NULL' for m in TELEMETRY_METRICS)},
+            PRIMARY KEY (resolution, bucket, device_id)
+        ) WITHOUT ROWID;
+    '''
+
+ROLLUP_DEVICE_INDEX = '''
+        CREATE INDEX IF NOT EXISTS idx_telemetry_rollups_device
+        ON telemetry_rollups (device_id, resolution, bucket)
+    '''
+
+TELEMETRY_COLUMNS = ('device_id', 'ts', 'moto_id', 'is_active') + TELEMETRY_METRICS
+
+# Reenvio da mesma leitura: mantém a primeira (e o trigger não soma de novo)
+TELEMETRY_INSERT = f'''
+        INSERT OR IGNORE INTO sensor_telemetry ({', '.join(TELEMETRY_COLUMNS)})
+        VALUES ({', '.join('?' for _ in TELEMETRY_COLUMNS)})
+    '''
+
+ROLLUP_COLUMNS = ('resolution', 'bucket', 'device_id', 'count', 'active_count') + tuple(
+    f'{m}_{agg}' for m in TELEMETRY_METRICS for agg in ('sum', 'min', 'max')
+)
+
+
+def _rollup_upsert(seconds):
+    """Soma incremental da linha NEW (bucket de 1 amostra) na resolução `seconds`"""
+    values = ', '.join(f'NEW.{m}, NEW.{m}, NEW.{m}' for m in TELEMETRY_METRICS)
+    return f'''
+            INSERT INTO telemetry_rollups ({', '.join(ROLLUP_COLUMNS)})
+            VALUES ({seconds}, CAST(NEW.ts / {seconds} AS INTEGER) * {seconds}, NEW.device_id,
+                    1, NEW.is_active, {values})
+            ON CONFLICT(resolution, bucket, device_id) DO UPDATE SET
+                count = count + excluded.count,
+                active_count = active_count + excluded.active_count,
+                {', '.join(
+                    f'{m}_sum = {m}_sum + excluded.{m}_sum, '
+                    f'{m}_min = MIN({m}_min, excluded.{m}_min), '
+                    f'{m}_max = MAX({m}_max, excluded.{m}_max)'
+                    for m in TELEMETRY_METRICS
+                )};'''
+
+
+# Só dispara quando a leitura é de fato inserida (INSERT OR IGNORE de um reenvio não soma)
+ROLLUP_TRIGGER = f'''
+        CREATE TRIGGER IF NOT EXISTS sensor_telemetry_rollup
+        AFTER INSERT ON sensor_telemetry
+        BEGIN{''.join(_rollup_upsert(seconds) for seconds in RESOLUTIONS.values())}
+        END
+    '''
+
+
+def to_epoch(value):
+    """
+    Timestamp ISO 8601 ou segundos desde a época -> float.
+    ISO sem fuso horário (ex.: datetime.utcnow().isoformat()) é tratado
+    como UTC; dispositivos em hora local devem enviar o offset (+/-HH:MM).
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    moment = datetime.fromisoformat(str(value))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def reading_row(device_id, ts, moto_id, is_active, values):
+    """
+    Linha de TELEMETRY_INSERT de uma leitura (os agregados vêm do trigger).
+    `values` mapeia cada métrica de TELEMETRY_METRICS para float.
+    """
+    metrics = tuple(float(values[m]) for m in TELEMETRY_METRICS)
+    return (device_id, ts, moto_id, int(bool(is_active))) + metrics
+
+
+def create_schema(connection):
+    cursor = connection.cursor()
+    cursor.execute(TELEMETRY_SCHEMA)
+    cursor.execute(ROLLUP_SCHEMA)
+    cursor.execute(ROLLUP_DEVICE_INDEX)
+    has_trigger = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'sensor_telemetry_rollup'"
+    ).fetchone()
+    cursor.execute(ROLLUP_TRIGGER)
+    if not has_trigger and cursor.execute('SELECT 1 FROM sensor_telemetry LIMIT 1').fetchone():
+        # Agregados gravados antes do trigger podem ter contado reenvios duas vezes
+        rebuild_rollups(connection)
+
+
+def backfill(connection):
+    """
+    Migra uma única vez as leituras antigas (JSON em iot_events) para a
+    tabela tipada (o trigger monta os agregados). Não faz nada se
+    `sensor_telemetry` já tiver dados.
+    """
+    if connection.execute('SELECT 1 FROM sensor_telemetry LIMIT 1').fetchone():
+        return 0
+    rows = []
+    for device_id, event_data, timestamp in connection.execute(
+        "SELECT device_id, event_data, timestamp FROM iot_events WHERE event_type = 'sensor_data'"
+    ):
+        try:
+            data = json.loads(event_data)
+            values = {m: float(data.get(m) or 0.0) for m in TELEMETRY_METRICS}
+            ts = to_epoch(timestamp)
+        except (TypeError, ValueError):
+            continue  # evento corrompido: fica só no log de eventos
+        rows.append(reading_row(device_id, ts, data.get('moto_id'), data.get('is_active'), values))
+    if not rows:
+        return 0
+    cursor = connection.executemany(TELEMETRY_INSERT, rows)
+    return cursor.rowcount
+
+
+def rebuild_rollups(connection):
+    """Recalcula `telemetry_rollups` inteira a partir de `sensor_telemetry`"""
+    aggregates = ', '.join(f'SUM({m}), MIN({m}), MAX({m})' for m in TELEMETRY_METRICS)
+    connection.execute('DELETE FROM telemetry_rollups')
+    for seconds in RESOLUTIONS.values():
+        connection.execute(f'''
+            INSERT INTO telemetry_rollups ({', '.join(ROLLUP_COLUMNS)})
+            SELECT {seconds}, CAST(ts / {seconds} AS INTEGER) * {seconds}, device_id,
+                   COUNT(*), SUM(is_active), {aggregates}
+            FROM sensor_telemetry
+            GROUP BY 2, device_id
+        ''')
+
+
+def _time_range(column, start, end):
+    clauses, params = [], []
+    if start is not None:
+        clauses.append(f'{column} >= ?')
+        params.append(start)
+    if end is not None:
+        clauses.append(f'{column} < ?')
+        params.append(end)
+    return clauses, params
+
+
+def _fetch_array(connect, sql, params, dtype):
+    connection = connect()
+    try:
+        cursor = connection.cursor()
+        cursor.row_factory = None  # tuplas simples: o NumPy converte direto
+        rows = cursor.execute(sql, params).fetchall()
+    except sqlite3.OperationalError:
+        rows = []  # banco ainda sem as tabelas de telemetria
+    finally:
+        connection.close()
+    return np.array(rows, dtype=dtype)
+
+
+def query_readings(connect, device_id, start=None, end=None):
+    """
+    Leituras de um dispositivo em [start, end) (segundos desde a época),
+    em ordem de tempo, como array TELEMETRY_DTYPE (busca na PK).
+    """
+    clauses, params = _time_range('ts', start, end)
+    where = ' AND '.join(['device_id = ?'] + clauses)
+    sql = (f"SELECT ts, {', '.join(TELEMETRY_METRICS)}, is_active "
+           f'FROM sensor_telemetry WHERE {where} ORDER BY ts')
+    return _fetch_array(connect, sql, [device_id] + params, TELEMETRY_DTYPE)
+
+
+def query_rollup(connect, metric, resolution='1m', device_id=None, start=None, end=None):
+    """
+    Agregados de `metric` por bucket (`resolution` em RESOLUTIONS) como
+    array ROLLUP_DTYPE. Sem device_id soma a frota inteira em cada bucket.
+    """
+    if metric not in TELEMETRY_METRICS:
+        raise ValueError(f'metric deve ser um de {TELEMETRY_METRICS}')
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f'resolution deve ser um de {tuple(RESOLUTIONS)}')
+    seconds = RESOLUTIONS[resolution]
+    # Os limites são alinhados ao bucket que contém start / após end
+    clauses, params = _time_range(
+        'bucket',
+        None if start is None else int(start // seconds) * seconds,
+        end,
+    )
+    clauses.insert(0, 'resolution = ?')
+    params.insert(0, seconds)
+    if device_id is not None:
+        clauses.append('device_id = ?')
+        params.append(device_id)
+    sql = f'''
+        SELECT bucket, SUM(count), COUNT(*),
+               SUM({metric}_sum) / SUM(count), MIN({metric}_min), MAX({metric}_max),
+               CAST(SUM(active_count) AS REAL) / SUM(count)
+        FROM telemetry_rollups
+        WHERE {' AND '.join(clauses)}
+        GROUP BY bucket
+        ORDER BY bucket
+    '''
+    return _fetch_array(connect, sql, params, ROLLUP_DTYPE)
+
+
+def to_columns(array):
+    """Array estruturado -> {campo: lista} (JSON em colunas)"""
+    columns = {}
+    for name in array.dtype.names:
+        column = array[name]
+        if column.dtype == np.float32:
+            column = column.astype(np.float64).round(4)  # sem o ruído do float32 no JSON
+        columns[name] = column.tolist()
+    return columns
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+WriteBehindQueue - Ingestão com escrita assíncrona no SQLite
+Os endpoints validam o payload, enfileiram as linhas e respondem 202 sem
+esperar o disco. Uma thread escritora esvazia a fila em group commits
+(uma transação a cada `flush_interval` segundos ou `max_batch` linhas),
+de modo que a latência da requisição não depende do fsync.
+
+Modos de durabilidade:
+  - 'async':  write-behind (padrão); perde-se no máximo o que estava na
+              fila se o processo morrer sem passar pelo flush de saída
+  - 'sync':   grava e faz commit dentro da requisição (comportamento antigo);
+              se o commit falhar, submit levanta WriteError
+
+Uma escrita pode levar `on_commit(ids)`: depois do commit, recebe o
+lastrowid de cada linha (ex.: id dos alertas para o dashboard). Se a
+escrita for descartada, o callback não é chamado.
+"""
+
+import queue
+import threading
+import time
+
+DURABILITY_MODES = ('async', 'sync')
+
+
+class WriteError(Exception):
+    """Commit recusado pelo banco no modo 'sync' (não adianta repetir a requisição)"""
+
+
+class WriteBehindQueue:
+    """
+    Fila limitada de escritas com uma thread de group commit.
+
+    - connect: função que devolve uma conexão SQLite (ex.: get_db_connection)
+    - max_queue: escritas pendentes (uma por requisição) antes de recusar
+    - flush_interval / max_batch: limites de tempo (s) e linhas por commit
+    """
+
+    def __init__(self, connect, durability='async', max_queue=10000,
+                 flush_interval=0.05, max_batch=500):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Durabilidade inválida: {durability} (use {DURABILITY_MODES})")
+        self.connect = connect
+        self.durability = durability
+        self.flush_interval = float(flush_interval)
+        self.max_batch = max(1, int(max_batch))
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+        self.enqueued_rows = 0
+        self.written_rows = 0
+        self.rejected_rows = 0
+        self.failed_rows = 0
+        self.commits = 0
+        self.max_depth = 0
+        self.last_commit_ms = 0.0
+
+    # ---------- produtores (threads das requisições) ----------
+
+    def submit(self, statement, rows, on_commit=None):
+        """
+        Agenda `statement` para cada tupla de `rows`.
+        Retorna False se a fila está cheia (o chamador responde 503);
+        no modo 'sync', levanta WriteError se o commit falhar.
+        """
+        return self.submit_many([(statement, rows, on_commit)])
+
+    def submit_many(self, writes):
+        """Agenda vários (statement, rows[, on_commit]) que vão sempre no mesmo commit"""
+        writes = [(write[0], list(write[1]), write[2] if len(write) > 2 else None) for write in writes]
+        writes = [write for write in writes if write[1]]
+        if not writes:
+            return True
+        if self.durability == 'sync':
+            error = self._write([writes])
+            if error is not None:
+                raise WriteError(str(error))
+            return True
+
+        count = sum(len(rows) for _, rows, _ in writes)
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(writes)
+        except queue.Full:
+            with self._stats_lock:
+                self.rejected_rows += count
+            return False
+
+        depth = self._queue.qsize()
+        with self._stats_lock:
+            self.enqueued_rows += count
+            if depth > self.max_depth:
+                self.max_depth = depth
+        return True
+
+    @property
+    def accepted_status(self):
+        """Status HTTP de sucesso: 202 quando a escrita fica para depois"""
+        return 202 if self.durability == 'async' else 201
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._stop_event.clear()
+                self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+                self._thread.start()
+
+    # ---------- escritor ----------
+
+    def _next_batch(self):
+        """Junta escritas até `max_batch` linhas ou `flush_interval`; devolve a lista de itens (um por submit)"""
+        try:
+            first = self._queue.get(timeout=0.1)
+        except queue.Empty:
+            return []
+        batch = [first]
+        rows = sum(len(r) for _, r, _ in first)
+        deadline = time.monotonic() + self.flush_interval
+        while rows < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0 or self._stop_event.is_set():
+                    writes = self._queue.get_nowait()
+                else:
+                    writes = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(writes)
+            rows += sum(len(r) for _, r, _ in writes)
+        return batch
+
+    def _commit(self, writes):
+        """
+        Grava as escritas numa única transação, na ordem de chegada
+        (statements iguais consecutivos viram um único executemany).
+        Devolve os (on_commit, ids) a notificar depois do commit.
+        """
+        runs = []
+        for statement, rows, on_commit in writes:
+            if on_commit is None and runs and runs[-1][2] is None and runs[-1][0] == statement:
+                runs[-1][1].extend(rows)
+            else:
+                runs.append((statement, list(rows), on_commit))
+        committed = []
+        connection = self.connect()
+        try:
+            with connection:
+                for statement, rows, on_commit in runs:
+                    if on_commit is None:
+                        connection.executemany(statement, rows)
+                    else:
+                        # linha a linha: executemany não expõe o lastrowid de cada uma
+                        ids = [connection.execute(statement, row).lastrowid for row in rows]
+                        committed.append((on_commit, ids))
+        finally:
+            connection.close()
+        return committed
+
+    def _write(self, items):
+        """
+        Grava os itens (um por submit) num group commit. Se a transação
+        falhar, regrava item a item: só o item com erro é descartado.
+        Devolve o último erro de gravação (None se tudo foi gravado).
+        """
+        counts = [sum(len(rows) for _, rows, _ in item) for item in items]
+        start = time.perf_counter()
+        committed = []
+        try:
+            committed = self._commit([write for item in items for write in item])
+            written, failed, commits, error = sum(counts), 0, 1, None
+        except Exception as e:
+            written = failed = commits = 0
+            error = e
+            if len(items) == 1:
+                failed = counts[0]
+                self._log_dropped(items[0], counts[0], e)
+            else:
+                print(f"⚠️ Erro no group commit ({len(items)} escritas): {e}; regravando uma a uma")
+                for item, count in zip(items, counts):
+                    try:
+                        committed.extend(self._commit(item))
+                    except Exception as item_error:
+                        failed += count
+                        error = item_error
+                        self._log_dropped(item, count, item_error)
+                    else:
+                        written += count
+                        commits += 1
+                if not failed:
+                    error = None
+
+        with self._stats_lock:
+            self.written_rows += written
+            self.failed_rows += failed
+            self.commits += commits
+            if commits:
+                self.last_commit_ms = (time.perf_counter() - start) * 1000
+
+        for on_commit, ids in committed:
+            try:
+                on_commit(ids)
+            except Exception as e:
+                print(f"⚠️ Erro no callback pós-commit: {e}")
+        return error
+
+    @staticmethod
+    def _log_dropped(item, count, error):
+        statements = '; '.join(' '.join(statement.split())[:60] for statement, _, _ in item)
+        print(f"❌ Escrita descartada ({count} linhas): {error} [{statements}]")
+
+    def _run(self):
+        while not self._stop_event.is_set() or not self._queue.empty():
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    # ---------- encerramento ----------
+
+    def flush(self, timeout=5.0):
+        """Aguarda tudo o que foi enfileirado ser gravado (True se dentro do prazo)"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return not self._queue.unfinished_tasks
+
+    def stop(self, timeout=10.0):
+        """Grava o que restou na fila e encerra a thread escritora"""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join(timeout=timeout)
+        self._thread = None
+        if not self._queue.empty():
+            print(f"⚠️ {self._queue.qsize()} escrita(s) pendente(s) não gravada(s)")
+
+    # ---------- métricas ----------
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'durability': self.durability,
+                'depth': self._queue.qsize(),
+                'max_depth': self.max_depth,
+                'enqueued_rows': self.enqueued_rows,
+                'written_rows': self.written_rows,
+                'rejected_rows': self.rejected_rows,
+                'failed_rows': self.failed_rows,
+                'commits': self.commits,
+                'avg_rows_per_commit': self.written_rows / self.commits if self.commits else 0.0,
+                'last_commit_ms': self.last_commit_ms,
+            }
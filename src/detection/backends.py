@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Backends - Runtimes de inferência do detector
+Exporta o modelo YOLOv8 (.pt) para ONNX ou OpenVINO IR e devolve o
+artefato a ser carregado. O artefato é aberto pela mesma classe YOLO, de
+modo que pré-processamento (letterbox) e pós-processamento (NMS) são os
+mesmos do caminho PyTorch e só o runtime do forward pass muda:
+
+  - 'torch':    PyTorch (padrão)
+  - 'onnx':     ONNX Runtime (CPUExecutionProvider)
+  - 'openvino': OpenVINO IR (CPU)
+
+Os artefatos são exportados com batch dinâmico (dynamic=True), para que a
+inferência em batch e os recortes de ROI vão ao modelo numa única chamada;
+artefatos antigos com batch fixo são exportados de novo.
+
+Com precision='int8' é carregado o modelo quantizado (ONNX INT8, gerado
+por scripts/quantize_model.py), que roda no ONNX Runtime qualquer que seja
+o backend pedido.
+"""
+
+import glob
+import importlib.util
+import os
+
+from ultralytics import YOLO
+
+BACKENDS = ('torch', 'onnx', 'openvino')
+
+# Pacotes opcionais exigidos por cada backend
+_REQUIREMENTS = {
+    'onnx': ('onnx', 'onnxruntime'),
+    'openvino': ('openvino',),
+}
+
+
+def _check_requirements(backend):
+    missing = [pkg for pkg in _REQUIREMENTS.get(backend, ()) if importlib.util.find_spec(pkg) is None]
+    if missing:
+        raise ImportError(f"Backend '{backend}' requer: pip install {' '.join(missing)}")
+
+
+def artifact_path(model_path, backend):
+    """Caminho do artefato exportado ao lado dos pesos originais"""
+    stem, _ = os.path.splitext(model_path)
+    if backend == 'onnx':
+        return f"{stem}.onnx"
+    if backend == 'openvino':
+        return f"{stem}_openvino_model"
+    return model_path
+
+
+def quantized_path(model_path):
+    """Caminho do modelo INT8 gerado a partir dos pesos originais"""
+    stem, _ = os.path.splitext(model_path)
+    return f"{stem}_int8.onnx"
+
+
+def has_dynamic_batch(path):
+    """
+    True se o modelo aceita qualquer tamanho de batch (pesos .pt, ou ONNX/
+    OpenVINO exportados com dynamic=True); False para grafos de batch fixo
+    ou quando não dá para inspecionar o grafo (uma imagem por chamada é
+    sempre seguro).
+    """
+    path = str(path)
+    try:
+        if path.endswith('.onnx'):
+            import onnx
+            dims = onnx.load(path, load_external_data=False).graph.input[0].type.tensor_type.shape.dim
+            return bool(dims) and (bool(dims[0].dim_param) or dims[0].dim_value == 0)
+        if os.path.isdir(path):
+            xml = glob.glob(os.path.join(path, '*.xml'))
+            if not xml:
+                return False
+            import openvino
+            return openvino.Core().read_model(xml[0]).inputs[0].get_partial_shape()[0].is_dynamic
+    except ImportError:
+        return False
+    return True
+
+
+def export_model(model_path='yolov8n.pt', backend='onnx', imgsz=640, force=False):
+    """
+    Exporta os pesos para o backend com batch dinâmico (reaproveita o
+    artefato se já existir e aceitar batch dinâmico)
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend inválido: {backend} (use {BACKENDS})")
+    if backend == 'torch':
+        return model_path
+
+    _check_requirements(backend)
+    target = artifact_path(model_path, backend)
+    if os.path.exists(target) and not force:
+        if has_dynamic_batch(target):
+            return target
+        print(f"♻️ {target} tem batch fixo: exportando de novo com batch dinâmico")
+
+    print(f"📦 Exportando {model_path} para {backend} ({imgsz}px, batch dinâmico)...")
+    exported = YOLO(model_path).export(format=backend, imgsz=imgsz, dynamic=True)
+    return str(exported)
+
+
+def resolve_model_path(model_path='yolov8n.pt', backend='torch', imgsz=640, precision='fp32'):
+    """Caminho a carregar para o backend/precisão escolhidos (exportando se preciso)"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend inválido: {backend} (use {BACKENDS})")
+    if precision == 'int8':
+        if model_path.endswith('.onnx'):
+            target = model_path
+        else:
+            _check_requirements('onnx')
+            target = quantized_path(model_path)
+            if not os.path.exists(target):
+                raise FileNotFoundError(
+                    f"Modelo INT8 não encontrado: {target} (gere com python scripts/quantize_model.py)"
+                )
+        if backend not in ('torch', 'onnx'):
+            # 'torch' é o padrão: só avisa quando outro runtime foi pedido
+            print(f"⚠️ precision=int8: usando {target} no ONNX Runtime (backend '{backend}' ignorado)")
+        return target
+    if backend == 'torch' or not model_path.endswith('.pt'):
+        # Artefatos já exportados (.onnx, *_openvino_model) são usados como estão
+        return model_path
+    return export_model(model_path, backend, imgsz)
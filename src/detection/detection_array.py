@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+DetectionArray - Resultado compacto do detector
+Detecções de um frame num único array estruturado NumPy (uma linha por
+detecção) em vez de uma lista de dicts. `track_id` é preenchido pela
+etapa de rastreamento (tracking.py); -1 = detecção sem rastro.
+"""
+
+import numpy as np
+
+# Classes COCO que podem ser motos ou similares
+MOTO_CLASSES = {
+    3: "motorbike",
+    1: "bicycle",
+    2: "car",
+    7: "truck",
+}
+
+MOTO_CLASS = 3
+BICYCLE_CLASS = 1
+BICYCLE_CONFIDENCE_FACTOR = 0.7
+
+DETECTION_DTYPE = np.dtype([
+    ('class', np.int16),
+    ('class_name', 'U12'),
+    ('conf', np.float32),
+    ('x1', np.int32),
+    ('y1', np.int32),
+    ('x2', np.int32),
+    ('y2', np.int32),
+    ('area', np.int32),
+    ('track_id', np.int32),
+])
+
+NO_TRACK = -1
+
+
+def empty_detections():
+    """Array de detecções vazio"""
+    return np.empty(0, dtype=DETECTION_DTYPE)
+
+
+def detections_from_boxes(xyxy, conf, cls, class_names=MOTO_CLASSES):
+    """
+    Monta o array de detecções a partir das colunas já em NumPy
+    (uma única transferência tensor -> numpy por frame).
+    Mantém apenas as classes presentes em `class_names`.
+    """
+    xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+    conf = np.asarray(conf, dtype=np.float32).reshape(-1)
+    cls = np.asarray(cls).reshape(-1).astype(np.int16)
+
+    keys = np.array(sorted(class_names), dtype=np.int16)
+    names = np.array([class_names[k] for k in keys.tolist()])
+    mask = np.isin(cls, keys)
+
+    dets = np.empty(int(mask.sum()), dtype=DETECTION_DTYPE)
+    if len(dets) == 0:
+        return dets
+
+    # astype(int32) trunca como o int() usado antes
+    boxes = xyxy[mask].astype(np.int32)
+    dets['class'] = cls[mask]
+    dets['class_name'] = names[np.searchsorted(keys, dets['class'])]
+    dets['conf'] = conf[mask]
+    dets['x1'] = boxes[:, 0]
+    dets['y1'] = boxes[:, 1]
+    dets['x2'] = boxes[:, 2]
+    dets['y2'] = boxes[:, 3]
+    dets['area'] = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    dets['track_id'] = NO_TRACK
+    return dets
+
+
+def detections_from_dicts(detections):
+    """Converte a lista de dicts antiga no array de detecções"""
+    dets = np.empty(len(detections), dtype=DETECTION_DTYPE)
+    for i, det in enumerate(detections):
+        x1, y1, x2, y2 = det['bbox']
+        dets[i] = (
+            det.get('class', -1),
+            det.get('class_name', 'unknown'),
+            det.get('confidence', 0.0),
+            x1, y1, x2, y2,
+            det.get('area', (x2 - x1) * (y2 - y1)),
+            NO_TRACK if det.get('track_id') is None else det['track_id'],
+        )
+    return dets
+
+
+def as_detection_array(detections):
+    """Aceita array de detecções ou lista de dicts e devolve o array"""
+    if isinstance(detections, np.ndarray):
+        return detections
+    if not detections:
+        return empty_detections()
+    return detections_from_dicts(detections)
+
+
+def filter_motos(dets):
+    """
+    Mantém apenas motos (classe 3). Sem motos no frame, bicicletas são
+    consideradas possíveis motos com a confiança reduzida.
+    """
+    motos = dets['class'] == MOTO_CLASS
+    if motos.any():
+        return dets[motos]
+
+    # Indexação por máscara já devolve cópia: não altera o array original
+    bicycles = dets[dets['class'] == BICYCLE_CLASS]
+    bicycles['conf'] *= BICYCLE_CONFIDENCE_FACTOR
+    return bicycles
+
+
+def bboxes(dets):
+    """Caixas (N, 4) em x1, y1, x2, y2"""
+    return np.stack([dets['x1'], dets['y1'], dets['x2'], dets['y2']], axis=1)
+
+
+def track_ids(dets):
+    """track_id de cada detecção como int ou None (sem rastro)"""
+    return [None if tid == NO_TRACK else tid for tid in dets['track_id'].tolist()]
+
+
+def to_dicts(dets):
+    """Converte o array no formato de lista de dicts (compatibilidade)"""
+    return [
+        {
+            'class': cls,
+            'class_name': name,
+            'confidence': conf,
+            'bbox': bbox,
+            'area': area,
+            'track_id': track_id,
+        }
+        for cls, name, conf, bbox, area, track_id in zip(
+            dets['class'].tolist(),
+            dets['class_name'].tolist(),
+            dets['conf'].tolist(),
+            bboxes(dets).tolist(),
+            dets['area'].tolist(),
+            track_ids(dets),
+        )
+    ]
+
+
+def build_detection_payloads(detections, frame, metrics, **extra):
+    """
+    Monta os payloads da API (/detections) a partir do array de detecções.
+    Campos adicionais (ex.: created_at, timestamp) vão em `extra`.
+    """
+    dets = as_detection_array(detections)
+    return [
+        {
+            'frame': frame,
+            'class': cls,
+            'class_name': name,
+            'confidence': conf,
+            'bbox': bbox,
+            'area': area,
+            'track_id': track_id,
+            'metrics': metrics,
+            **extra,
+        }
+        for cls, name, conf, bbox, area, track_id in zip(
+            dets['class'].tolist(),
+            dets['class_name'].tolist(),
+            dets['conf'].tolist(),
+            bboxes(dets).tolist(),
+            dets['area'].tolist(),
+            track_ids(dets),
+        )
+    ]
+
+
+def detection_rows(dets, *prefix, suffix=()):
+    """
+    Linhas prontas para executemany: `prefix` + colunas da detecção +
+    `suffix`, com valores Python nativos (uma conversão por coluna).
+    """
+    columns = [
+        dets['class'].tolist(),
+        dets['class_name'].tolist(),
+        dets['conf'].tolist(),
+        dets['x1'].tolist(),
+        dets['y1'].tolist(),
+        dets['x2'].tolist(),
+        dets['y2'].tolist(),
+        dets['area'].tolist(),
+        track_ids(dets),
+    ]
+    return [
+        tuple(prefix) + row + tuple(suffix)
+        for row in zip(*columns)
+    ]
+
+
+def box_iou(a, b):
+    """IoU par a par entre caixas (N, 4) e (M, 4) em x1, y1, x2, y2 -> (N, M)"""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    w = np.clip(np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0]), 0, None)
+    h = np.clip(np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1]), 0, None)
+    inter = w * h
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-6)
+
+
+def paired_box_iou(a, b):
+    """IoU entre as caixas correspondentes de (K, 4) e (K, 4) -> (K,)"""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    w = np.clip(np.minimum(a[:, 2], b[:, 2]) - np.maximum(a[:, 0], b[:, 0]), 0, None)
+    h = np.clip(np.minimum(a[:, 3], b[:, 3]) - np.maximum(a[:, 1], b[:, 1]), 0, None)
+    inter = w * h
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-6)
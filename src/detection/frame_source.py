@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+FrameSource - Decodificação de vídeo em thread dedicada
+Lê frames de um cv2.VideoCapture em segundo plano para uma fila limitada,
+de modo que a decodificação se sobreponha à inferência.
+"""
+
+import queue
+import threading
+import time
+from collections import namedtuple
+
+import cv2
+
+# index começa em 1 (mesma contagem de frame_count dos loops de detecção)
+FramePacket = namedtuple('FramePacket', ['index', 'timestamp', 'frame'])
+
+_END = object()
+
+
+class FrameSource:
+    """
+    Fonte de frames com thread de decodificação e fila limitada.
+
+    Políticas quando a fila está cheia:
+      - 'block': a decodificação espera o consumidor (arquivos de vídeo,
+        nenhum frame é perdido)
+      - 'drop_oldest': descarta o frame mais antigo da fila (câmeras ao
+        vivo, o consumidor sempre recebe os frames mais recentes)
+    """
+
+    POLICIES = ('block', 'drop_oldest')
+
+    def __init__(self, source, queue_size=8, policy='block', max_frames=None):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Política inválida: {policy} (use {self.POLICIES})")
+
+        self.source = source
+        self.policy = policy
+        self.max_frames = max_frames
+        self.cap = cv2.VideoCapture(source)
+        self.queue = queue.Queue(maxsize=max(1, int(queue_size)))
+
+        self.frames_decoded = 0
+        self.frames_dropped = 0
+
+        self._stop = threading.Event()
+        self._finished = False
+        self._thread = None
+
+    # ---------- ciclo de vida ----------
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def get(self, prop):
+        """Repassa cv2.CAP_PROP_* para o VideoCapture"""
+        return self.cap.get(prop)
+
+    def start(self):
+        """Inicia a thread de decodificação"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._reader, daemon=True)
+            self._thread.start()
+        return self
+
+    def release(self):
+        """Para a decodificação e libera o vídeo"""
+        self._stop.set()
+        # Desbloqueia o leitor caso esteja esperando espaço na fila
+        self._drain()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        self.cap.release()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.release()
+
+    # ---------- thread de decodificação ----------
+
+    def _reader(self):
+        while not self._stop.is_set():
+            if self.max_frames and self.frames_decoded >= self.max_frames:
+                break
+
+            ok, frame = self.cap.read()
+            if not ok:
+                break
+
+            self.frames_decoded += 1
+            packet = FramePacket(self.frames_decoded, time.time(), frame)
+            if self.policy == 'block':
+                self._put_blocking(packet)
+            else:
+                self._put_drop_oldest(packet)
+
+        # Sinaliza fim de stream (nunca é descartado)
+        self._put_blocking(_END)
+
+    def _put_blocking(self, item):
+        while not self._stop.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _put_drop_oldest(self, item):
+        while not self._stop.is_set():
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    dropped = self.queue.get_nowait()
+                    if dropped is _END:
+                        # preserva o marcador de fim
+                        self.queue.put_nowait(dropped)
+                        return
+                    self.frames_dropped += 1
+                except queue.Empty:
+                    pass
+
+    def _drain(self):
+        try:
+            while True:
+                self.queue.get_nowait()
+        except queue.Empty:
+            pass
+
+    # ---------- consumo ----------
+
+    @property
+    def finished(self):
+        """True depois que read() consumiu o fim do vídeo (distingue fim de timeout)"""
+        return self._finished
+
+    def read(self, timeout=None):
+        """Próximo FramePacket, ou None no fim do vídeo (ou se o timeout expirar)"""
+        if self._finished:
+            return None
+        self.start()
+        try:
+            item = self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if item is _END:
+            self._finished = True
+            return None
+        return item
+
+    def read_batch(self, batch_size):
+        """Até `batch_size` FramePackets (lista vazia no fim do vídeo)"""
+        packets = []
+        while len(packets) < batch_size:
+            packet = self.read()
+            if packet is None:
+                break
+            packets.append(packet)
+        return packets
+
+    def __iter__(self):
+        while True:
+            packet = self.read()
+            if packet is None:
+                return
+            yield packet
+
+    def stats(self):
+        """Contadores da fonte"""
+        return {
+            'frames_decoded': self.frames_decoded,
+            'frames_dropped': self.frames_dropped,
+            'queue_depth': self.queue.qsize(),
+            'policy': self.policy,
+        }
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+ModelRegistry - Cache de modelos YOLO por processo
+Cada combinação (caminho, precisão, imgsz) é carregada uma única vez e
+aquecida com frames sintéticos, de modo que o custo de inicialização não
+entre nas medições de FPS.
+"""
+
+import threading
+import time
+
+import numpy as np
+from ultralytics import YOLO
+
+PRECISIONS = ('fp32', 'fp16', 'int8')
+
+_models = {}
+_timings = {}
+_lock = threading.Lock()
+
+
+def predict_args(precision='fp32', imgsz=640):
+    """Argumentos de inferência correspondentes à chave do registro"""
+    return {'imgsz': imgsz, 'half': precision == 'fp16'}
+
+
+def get_model(model_path='yolov8n.pt', precision='fp32', imgsz=640, warmup_runs=2):
+    """
+    Devolve o modelo da chave (model_path, precision, imgsz), carregando e
+    aquecendo na primeira chamada.
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Precisão inválida: {precision} (use {PRECISIONS})")
+
+    key = (str(model_path), precision, int(imgsz))
+    with _lock:
+        model = _models.get(key)
+        if model is not None:
+            return model
+
+        start = time.perf_counter()
+        # task explícita: artefatos exportados (ONNX/OpenVINO) não a carregam sozinhos
+        model = YOLO(model_path, task='detect')
+        load_time = time.perf_counter() - start
+
+        # Primeiras inferências montam o predictor e alocam buffers
+        start = time.perf_counter()
+        dummy = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+        for _ in range(warmup_runs):
+            model(dummy, verbose=False, **predict_args(precision, imgsz))
+        warmup_time = time.perf_counter() - start
+
+        _models[key] = model
+        _timings[key] = {
+            'model_path': key[0],
+            'precision': precision,
+            'imgsz': key[2],
+            'load_time': load_time,
+            'warmup_time': warmup_time,
+            'warmup_runs': warmup_runs,
+        }
+        return model
+
+
+def get_timings():
+    """Tempos de carga e aquecimento de cada modelo do registro"""
+    with _lock:
+        return [dict(timing) for timing in _timings.values()]
+
+
+def clear():
+    """Esvazia o registro (próxima chamada recarrega os modelos)"""
+    with _lock:
+        _models.clear()
+        _timings.clear()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+MotionGate - Filtro de movimento antes da inferência
+Compara versões reduzidas dos frames: sem mudança relevante, o frame não
+passa pelo modelo e as detecções anteriores são reaproveitadas.
+"""
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    Decide, por diferença de frames em baixa resolução, se um frame
+    precisa de inferência.
+
+    - threshold: fração mínima de pixels alterados para considerar movimento
+    - pixel_delta: diferença de intensidade (0-255) para um pixel contar
+      como alterado
+    - downscale_width: largura da imagem usada na comparação
+    - max_skip: força uma inferência após esse número de frames seguidos
+      sem movimento (0 = nunca força)
+    """
+
+    def __init__(self, threshold=0.01, pixel_delta=25, downscale_width=160, max_skip=30):
+        self.threshold = threshold
+        self.pixel_delta = pixel_delta
+        self.downscale_width = downscale_width
+        self.max_skip = max_skip
+
+        self.frames_inferred = 0
+        self.frames_gated = 0
+
+        # Referência = último frame que passou pelo modelo, de modo que
+        # mudanças lentas se acumulam até disparar uma nova inferência
+        self._reference = None
+        self._skipped = 0
+
+    def _prepare(self, frame):
+        height, width = frame.shape[:2]
+        scale = self.downscale_width / float(width)
+        size = (self.downscale_width, max(1, int(height * scale)))
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def changed_fraction(self, frame):
+        """Fração de pixels alterados em relação à referência"""
+        small = self._prepare(frame)
+        if self._reference is None or self._reference.shape != small.shape:
+            return 1.0, small
+        diff = cv2.absdiff(small, self._reference)
+        return np.count_nonzero(diff > self.pixel_delta) / float(diff.size), small
+
+    def check(self, frame):
+        """True se o frame deve passar pelo modelo"""
+        fraction, small = self.changed_fraction(frame)
+        forced = self.max_skip and self._skipped >= self.max_skip
+
+        if fraction >= self.threshold or forced:
+            self._reference = small
+            self._skipped = 0
+            self.frames_inferred += 1
+            return True
+
+        self._skipped += 1
+        self.frames_gated += 1
+        return False
+
+    def reset(self):
+        """Esquece a referência (próximo frame sempre é inferido)"""
+        self._reference = None
+        self._skipped = 0
+
+    def stats(self):
+        """Contadores de frames inferidos vs. reaproveitados"""
+        total = self.frames_inferred + self.frames_gated
+        return {
+            'frames_inferred': self.frames_inferred,
+            'frames_gated': self.frames_gated,
+            'gated_ratio': self.frames_gated / total if total else 0.0,
+        }
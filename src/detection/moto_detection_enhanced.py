@@ -1,62 +1,84 @@
 import cv2
-from ultralytics import YOLO
 import numpy as np
 import argparse
 import time
 import json
-import requests
 from datetime import datetime
-import threading
 from collections import deque
 
+try:
+    from .backends import resolve_model_path
+    from .detection_array import (
+        MOTO_CLASSES, bboxes, build_detection_payloads, detections_from_boxes,
+        empty_detections, filter_motos as filter_moto_array, to_dicts,
+    )
+    from .frame_source import FrameSource
+    from .model_registry import get_model, predict_args
+    from .motion_gate import MotionGate
+    from .publisher import DetectionPublisher
+    from .tracking import RECORD_POLICIES, MotoTracker
+except ImportError:  # executado como script (python moto_detection_enhanced.py)
+    from backends import resolve_model_path
+    from detection_array import (
+        MOTO_CLASSES, bboxes, build_detection_payloads, detections_from_boxes,
+        empty_detections, filter_motos as filter_moto_array, to_dicts,
+    )
+    from frame_source import FrameSource
+    from model_registry import get_model, predict_args
+    from motion_gate import MotionGate
+    from publisher import DetectionPublisher
+    from tracking import RECORD_POLICIES, MotoTracker
+
 class MotoDetector:
-    def __init__(self, model_path='yolov8n.pt', confidence_threshold=0.5):
-        self.model = YOLO(model_path)
+    def __init__(self, model_path='yolov8n.pt', confidence_threshold=0.5, motion_gate=None,
+                 precision='fp32', imgsz=640):
+        # Modelo compartilhado no processo (carregado e aquecido uma única vez)
+        # precision='int8' carrega o modelo quantizado (ONNX INT8)
+        model_path = resolve_model_path(model_path, precision=precision, imgsz=imgsz)
+        self.model = get_model(model_path, precision, imgsz)
+        self._predict_args = predict_args(precision, imgsz)
         self.confidence_threshold = confidence_threshold
+        # MotionGate opcional: frames sem movimento reaproveitam as detecções anteriores
+        self.motion_gate = motion_gate
+        self._last_detections = empty_detections()
         self.fps_history = deque(maxlen=60)
         self.detection_history = deque(maxlen=100)
         self.total_detections = 0
-        self.unique_motos = set()
+        # Rastreamento SORT: track_id estável e contagem de motos únicas por rastro
+        self.tracker = MotoTracker()
         self.start_time = time.time()
+        # Envio ao backend por uma única thread (criado no primeiro envio)
+        self.publisher = None
         
         # Classes COCO que podem ser motos ou similares
-        self.moto_classes = {
-            3: "motorbike",      # moto
-            1: "bicycle",        # bicicleta (pode ser confundida)
-            2: "car",            # carro (para comparação)
-            7: "truck",          # caminhão (pode ser confundido)
-        }
+        self.moto_classes = dict(MOTO_CLASSES)
         
     def detect_motos(self, frame):
-        """Detecta motos no frame usando YOLOv8"""
-        results = self.model(frame, conf=self.confidence_threshold)
-        detections = []
-        
-        for result in results:
-            boxes = result.boxes
-            if boxes is not None:
-                for box in boxes:
-                    cls = int(box.cls.item())
-                    conf = box.conf.item()
-                    
-                    # Filtra apenas motos e veículos similares
-                    if cls in self.moto_classes:
-                        x1, y1, x2, y2 = box.xyxy[0].tolist()
-                        x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
-                        
-                        detection = {
-                            'class': cls,
-                            'class_name': self.moto_classes[cls],
-                            'confidence': conf,
-                            'bbox': [x1, y1, x2, y2],
-                            'area': (x2 - x1) * (y2 - y1)
-                        }
-                        detections.append(detection)
-        
-        return detections
+        """Detecta motos no frame usando YOLOv8 (lista de dicts)"""
+        return to_dicts(self.detect_motos_array(frame))
+
+    def detect_motos_array(self, frame):
+        """Detecta motos no frame e devolve o array de detecções"""
+        if self.motion_gate is not None and not self.motion_gate.check(frame):
+            return self._last_detections
+
+        self._last_detections = self._infer(frame)
+        return self._last_detections
+
+    def _infer(self, frame):
+        """Roda o modelo no frame"""
+        results = self.model(frame, conf=self.confidence_threshold, **self._predict_args)
+        boxes = results[0].boxes
+        if boxes is None:
+            return detections_from_boxes([], [], [], self.moto_classes)
+
+        # Uma única transferência tensor -> numpy: [x1, y1, x2, y2, (id), conf, cls]
+        data = boxes.data.cpu().numpy()
+        return detections_from_boxes(data[:, :4], data[:, -2], data[:, -1], self.moto_classes)
     
     def filter_motos(self, detections):
         """Filtra apenas motos baseado em características específicas"""
+        has_moto = any(det['class'] == 3 for det in detections)
         moto_detections = []
         
         for det in detections:
@@ -64,12 +86,16 @@ class MotoDetector:
             if det['class'] == 3:
                 moto_detections.append(det)
             # Se não há motos, considera bicicletas como possíveis motos
-            elif det['class'] == 1 and len([d for d in detections if d['class'] == 3]) == 0:
+            elif det['class'] == 1 and not has_moto:
                 # Ajusta a confiança para bicicletas
                 det['confidence'] *= 0.7
                 moto_detections.append(det)
         
         return moto_detections
+
+    def filter_motos_array(self, dets):
+        """Versão vetorizada de `filter_motos` (máscaras sobre o array)"""
+        return filter_moto_array(dets)
     
     def calculate_metrics(self):
         """Calcula métricas de performance"""
@@ -78,7 +104,7 @@ class MotoDetector:
         
         return {
             'total_detections': self.total_detections,
-            'unique_motos': len(self.unique_motos),
+            'unique_motos': self.tracker.unique_count,
             'current_fps': current_fps,
             'avg_fps': np.mean(list(self.fps_history)) if self.fps_history else 0,
             'elapsed_time': elapsed,
@@ -87,32 +113,43 @@ class MotoDetector:
     
     def send_to_backend(self, detections, frame_num, metrics):
         """Envia dados para o backend"""
-        for det in detections:
-            try:
-                payload = {
-                    'timestamp': datetime.utcnow().isoformat(),
-                    'frame': frame_num,
-                    'class': det['class'],
-                    'class_name': det['class_name'],
-                    'confidence': det['confidence'],
-                    'bbox': det['bbox'],
-                    'area': det['area'],
-                    'metrics': metrics
-                }
-                
-                requests.post('http://localhost:5000/detections', 
-                            json=payload, timeout=0.1)
-            except Exception as e:
-                pass  # Ignora erros de comunicação
+        if not len(detections):
+            return
+        if self.publisher is None:
+            self.publisher = DetectionPublisher(
+                batch_url='http://localhost:5000/detections/batch'
+            ).start()
+        # Só enfileira: erros de comunicação ficam na thread do publisher
+        self.publisher.publish_many(build_detection_payloads(
+            detections, frame_num, metrics, timestamp=datetime.utcnow().isoformat()
+        ))
+    
+    def reset(self):
+        """Esquece rastros e detecções reaproveitadas do vídeo anterior"""
+        self.tracker.reset()
+        if self.motion_gate is not None:
+            self.motion_gate.reset()
+        self._last_detections = empty_detections()
     
     def process_video(self, video_path, output_path=None, max_frames=None, 
-                     display=True, backend_url='http://localhost:5000/detections'):
-        """Processa vídeo com detecção de motos"""
-        cap = cv2.VideoCapture(video_path)
+                     display=True, backend_url='http://localhost:5000/detections',
+                     frame_policy='block', record_policy='all'):
+        """
+        Processa vídeo com detecção e rastreamento de motos.
+        record_policy='track' envia ao backend só uma detecção por moto
+        (a que confirma o rastro) em vez de todas.
+        """
+        if record_policy not in RECORD_POLICIES:
+            raise ValueError(f"record_policy deve ser um de {RECORD_POLICIES}")
+        # Decodificação em thread própria, sobreposta à inferência
+        cap = FrameSource(video_path, policy=frame_policy, max_frames=max_frames)
         
         if not cap.isOpened():
             print(f"Erro ao abrir vídeo: {video_path}")
             return
+        # Rastros (e motos únicas) não atravessam vídeos
+        self.reset()
+        self.publisher = DetectionPublisher(url=backend_url, batch_url=f"{backend_url}/batch").start()
         
         # Configuração do vídeo de saída
         writer = None
@@ -129,21 +166,19 @@ class MotoDetector:
         print("Iniciando detecção de motos...")
         print("Pressione 'q' para sair, 's' para salvar frame")
         
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-                
+        for packet in cap.start():
+            frame = packet.frame
             frame_count += 1
             
             # Detecção
-            detections = self.detect_motos(frame)
-            moto_detections = self.filter_motos(detections)
+            detections = self.detect_motos_array(frame)
+            moto_detections = self.filter_motos_array(detections)
+            
+            # Rastreamento: track_id estável; motos únicas = rastros confirmados
+            moto_detections, confirmed = self.tracker.update(moto_detections)
             
             # Atualiza métricas
             self.total_detections += len(moto_detections)
-            for det in moto_detections:
-                self.unique_motos.add(f"{det['class']}_{det['bbox']}")
             
             # Calcula FPS
             frame_time = time.time() - frame_start_time
@@ -153,16 +188,18 @@ class MotoDetector:
             frame_start_time = time.time()
             
             # Desenha detecções
-            for det in moto_detections:
-                x1, y1, x2, y2 = det['bbox']
-                conf = det['confidence']
-                class_name = det['class_name']
-                
+            for (x1, y1, x2, y2), cls, class_name, conf, track_id in zip(
+                bboxes(moto_detections).tolist(),
+                moto_detections['class'].tolist(),
+                moto_detections['class_name'].tolist(),
+                moto_detections['conf'].tolist(),
+                moto_detections['track_id'].tolist(),
+            ):
                 # Cor baseada na classe
-                color = (0, 255, 0) if det['class'] == 3 else (255, 0, 0)
+                color = (0, 255, 0) if cls == 3 else (255, 0, 0)
                 
                 cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-                label = f"{class_name}: {conf:.2f}"
+                label = f"#{track_id} {class_name}: {conf:.2f}"
                 cv2.putText(frame, label, (x1, y1-10), 
                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
             
@@ -180,7 +217,8 @@ class MotoDetector:
                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
             
             # Envia para backend
-            self.send_to_backend(moto_detections, frame_count, metrics)
+            records = moto_detections[confirmed] if record_policy == 'track' else moto_detections
+            self.send_to_backend(records, frame_count, metrics)
             
             # Salva frame se solicitado
             if output_path and writer:
@@ -202,10 +240,13 @@ class MotoDetector:
         
         # Limpeza
         cap.release()
+        if cap.frames_dropped:
+            print(f"Frames descartados pela fonte: {cap.frames_dropped}")
         if writer:
             writer.release()
         if display:
             cv2.destroyAllWindows()
+        self.publisher.stop()
         
         # Relatório final
         final_metrics = self.calculate_metrics()
@@ -216,6 +257,13 @@ class MotoDetector:
         print(f"Total de detecções: {final_metrics['total_detections']}")
         print(f"Motos únicas detectadas: {final_metrics['unique_motos']}")
         print(f"Taxa de detecção: {final_metrics['detection_rate']:.2f} detecções/segundo")
+        if self.motion_gate is not None:
+            gate = self.motion_gate.stats()
+            print(f"Frames inferidos: {gate['frames_inferred']} | "
+                  f"reaproveitados (sem movimento): {gate['frames_gated']}")
+        sent = self.publisher.stats()
+        print(f"Envios ao backend: {sent['published']} em {sent['batches']} lote(s) | "
+              f"descartados: {sent['dropped']} | falhas: {sent['failed']}")
 
 def main():
     parser = argparse.ArgumentParser(description="Detecção avançada de motos com YOLOv8")
@@ -230,13 +278,24 @@ def main():
                        help="Limiar de confiança para detecção")
     parser.add_argument("--model", default="yolov8n.pt", 
                        help="Caminho para o modelo YOLOv8")
+    parser.add_argument("--frame-policy", choices=("block", "drop_oldest"), default="block",
+                       help="Fila de decodificação cheia: esperar ou descartar o frame mais antigo")
+    parser.add_argument("--motion-threshold", type=float, default=None,
+                       help="Fração mínima de pixels alterados para rodar o modelo (desligado por padrão)")
+    parser.add_argument("--precision", choices=("fp32", "fp16", "int8"), default="fp32",
+                       help="Precisão do modelo (int8 requer scripts/quantize_model.py)")
+    parser.add_argument("--record-policy", choices=("all", "track"), default="all",
+                       help="Detecções enviadas ao backend: todas ou uma por moto rastreada")
     
     args = parser.parse_args()
     
     # Inicializa detector
     detector = MotoDetector(
         model_path=args.model,
-        confidence_threshold=args.confidence
+        confidence_threshold=args.confidence,
+        motion_gate=(MotionGate(threshold=args.motion_threshold)
+                     if args.motion_threshold is not None else None),
+        precision=args.precision
     )
     
     # Processa vídeo
@@ -244,7 +303,9 @@ def main():
         video_path=args.video,
         output_path=args.output,
         max_frames=args.max_frames,
-        display=not args.no_display
+        display=not args.no_display,
+        frame_policy=args.frame_policy,
+        record_policy=args.record_policy
     )
 
 if __name__ == "__main__":
@@ -5,76 +5,196 @@ Módulo principal de detecção
 """
 
 import cv2
-from ultralytics import YOLO
 import numpy as np
 from collections import deque
 
+from .detection_array import (
+    MOTO_CLASSES,
+    detections_from_boxes,
+    empty_detections,
+    filter_motos as filter_moto_array,
+    to_dicts,
+)
+from .backends import has_dynamic_batch, resolve_model_path
+from .model_registry import get_model, predict_args
+from .tracking import MotoTracker
+
 class MotoDetector:
     """Detector de motos usando YOLOv8"""
     
-    def __init__(self, model_path='yolov8n.pt', confidence_threshold=0.5):
-        self.model = YOLO(model_path)
+    def __init__(self, model_path='yolov8n.pt', confidence_threshold=0.5, motion_gate=None,
+                 roi=None, precision='fp32', imgsz=640, backend='torch'):
+        # backend: 'torch', 'onnx' ou 'openvino' (exporta os pesos na primeira vez)
+        # precision='int8' carrega o modelo quantizado (ONNX INT8)
+        self.backend = backend
+        model_path = resolve_model_path(model_path, backend, imgsz, precision)
+        # Modelo compartilhado no processo (carregado e aquecido uma única vez)
+        self.model = get_model(model_path, precision, imgsz)
+        self._predict_args = predict_args(precision, imgsz)
+        # Grafo de batch fixo (ex.: modelo INT8 quantizado antes do export dinâmico): uma imagem por chamada
+        self._max_batch = None if has_dynamic_batch(model_path) else 1
         self.confidence_threshold = confidence_threshold
+        # MotionGate opcional: frames sem movimento reaproveitam as detecções anteriores
+        self.motion_gate = motion_gate
+        self._last_detections = empty_detections()
+        # RoiConfig opcional: só os recortes das zonas do pátio vão ao modelo
+        self.roi = roi
         self.fps_history = deque(maxlen=60)
         self.total_detections = 0
-        self.unique_motos = set()
-        
+        # Rastreamento SORT: track_id estável e contagem de motos únicas por rastro
+        self.tracker = MotoTracker()
 
-        self.moto_classes = {
-            3: "motorbike",      
-            1: "bicycle",        
-            2: "car",            
-            7: "truck",          
-        }
+        self.moto_classes = dict(MOTO_CLASSES)
         
     def detect_motos(self, frame):
-        """Detecta motos no frame usando YOLOv8"""
-        results = self.model(frame, conf=self.confidence_threshold)
+        """Detecta motos no frame usando YOLOv8 (lista de dicts)"""
+        return to_dicts(self.detect_motos_array(frame))
+
+    def detect_motos_batch(self, frames):
+        """
+        Detecta motos em vários frames com uma única chamada ao modelo.
+        Retorna uma lista de detecções por frame, na mesma ordem de `frames`.
+        """
+        return [to_dicts(dets) for dets in self.detect_motos_batch_array(frames)]
+
+    def detect_motos_array(self, frame):
+        """Detecta motos no frame e devolve o array de detecções"""
+        return self.detect_motos_batch_array([frame])[0]
+
+    def detect_motos_batch_array(self, frames):
+        """
+        Versão em batch de `detect_motos_array` (um array por frame).
+        Com motion_gate, só os frames com movimento vão ao modelo; os demais
+        repetem as detecções do frame anterior.
+        """
+        frames = list(frames)
+        if not frames:
+            return []
+
+        if self.motion_gate is None:
+            detections = self._infer_batch(frames)
+            self._last_detections = detections[-1]
+            return detections
+
+        needs_inference = [self.motion_gate.check(frame) for frame in frames]
+        inferred = iter(self._infer_batch(
+            [frame for frame, needed in zip(frames, needs_inference) if needed]
+        ))
+
         detections = []
-        
-        for result in results:
-            boxes = result.boxes
-            if boxes is not None:
-                for box in boxes:
-                    cls = int(box.cls.item())
-                    conf = box.conf.item()
-                    
-                    # Filtra apenas motos e veículos similares
-                    if cls in self.moto_classes:
-                        x1, y1, x2, y2 = box.xyxy[0].tolist()
-                        x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
-                        
-                        detection = {
-                            'class': cls,
-                            'class_name': self.moto_classes[cls],
-                            'confidence': conf,
-                            'bbox': [x1, y1, x2, y2],
-                            'area': (x2 - x1) * (y2 - y1)
-                        }
-                        detections.append(detection)
-        
+        for needed in needs_inference:
+            if needed:
+                self._last_detections = next(inferred)
+            detections.append(self._last_detections)
         return detections
-    
+
+    def detect_frames_array(self, frames, rois):
+        """
+        Infere todos os frames numa única chamada, cada um com sua RoiConfig
+        (ou None = frame inteiro), sem passar pelo motion_gate do detector.
+        Usado quando um detector atende várias câmeras.
+        """
+        return self._infer_batch(list(frames), list(rois))
+
+    def _infer_batch(self, frames, rois=None):
+        """Roda o modelo em todos os frames (um único forward pass)"""
+        if not frames:
+            return []
+        if rois is None:
+            rois = [self.roi] * len(frames)
+        if any(roi is not None for roi in rois):
+            return self._infer_roi_batch(frames, rois)
+
+        # Uma lista de imagens vira um único batch
+        return [self._parse_result(result) for result in self._predict(frames)]
+
+    def _infer_roi_batch(self, frames, rois):
+        """
+        Infere apenas os recortes/tiles das ROIs de todos os frames numa
+        única chamada e remonta as detecções de cada frame (frames sem
+        ROI vão inteiros).
+        """
+        crops, offsets, spans = [], [], []
+        for frame, roi in zip(frames, rois):
+            start = len(crops)
+            for crop, offset in (roi.crops(frame) if roi is not None else [(frame, (0, 0))]):
+                crops.append(crop)
+                offsets.append(offset)
+            spans.append((start, len(crops)))
+
+        if not crops:
+            return [empty_detections() for _ in frames]
+
+        crop_detections = [self._parse_result(result) for result in self._predict(crops)]
+
+        detections = [
+            roi.merge(crop_detections[start:end], offsets[start:end]) if roi is not None
+            else crop_detections[start]
+            for roi, (start, end) in zip(rois, spans)
+        ]
+        return detections
+
+    def _predict(self, images):
+        """Chama o modelo com a lista de imagens, em partes se o batch for fixo"""
+        step = self._max_batch or len(images)
+        results = []
+        for start in range(0, len(images), step):
+            results.extend(self.model(images[start:start + step], conf=self.confidence_threshold,
+                                      **self._predict_args))
+        return results
+
+    def _parse_result(self, result):
+        """Converte o resultado YOLO de um frame no array de detecções"""
+        boxes = result.boxes
+        if boxes is None:
+            return detections_from_boxes([], [], [], self.moto_classes)
+
+        # Uma única transferência tensor -> numpy: [x1, y1, x2, y2, (id), conf, cls]
+        data = boxes.data.cpu().numpy()
+        return detections_from_boxes(data[:, :4], data[:, -2], data[:, -1], self.moto_classes)
+
     def filter_motos(self, detections):
         """Filtra apenas motos baseado em características específicas"""
+        has_moto = any(det['class'] == 3 for det in detections)
         moto_detections = []
-        
+
         for det in detections:
             # Prioriza motos (classe 3)
             if det['class'] == 3:
                 moto_detections.append(det)
             # Se não há motos, considera bicicletas como possíveis motos
-            elif det['class'] == 1 and len([d for d in detections if d['class'] == 3]) == 0:
+            elif det['class'] == 1 and not has_moto:
                 # Ajusta a confiança para bicicletas
                 det['confidence'] *= 0.7
                 moto_detections.append(det)
-        
+
         return moto_detections
+
+    def filter_motos_array(self, dets):
+        """Versão vetorizada de `filter_motos` (máscaras sobre o array)"""
+        return filter_moto_array(dets)
     
+    def track(self, dets):
+        """
+        Preenche `track_id` das detecções do frame (chamar em todo frame).
+        Devolve (detecções, máscara das que confirmaram um rastro novo).
+        """
+        return self.tracker.update(dets)
+
+    def reset(self):
+        """
+        Esquece o estado do vídeo anterior: rastros, referência do
+        motion_gate e detecções reaproveitadas (chamar a cada nova fonte).
+        """
+        self.tracker.reset()
+        if self.motion_gate is not None:
+            self.motion_gate.reset()
+        self._last_detections = empty_detections()
+
     def calculate_metrics(self):
         """Calcula métricas de performance"""
         return {
             'total_detections': self.total_detections,
-            'unique_motos': len(self.unique_motos),
+            'unique_motos': self.tracker.unique_count,
             'avg_fps': np.mean(list(self.fps_history)) if self.fps_history else 0
         }
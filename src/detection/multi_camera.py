@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+MultiCameraRunner - Orquestrador de várias câmeras
+N processos de detecção, cada um com sua instância do modelo e um grupo de
+fontes; o processo principal rastreia as motos de cada câmera (SORT),
+concentra a escrita no banco e o envio ao backend, e acompanha FPS e
+latência por câmera.
+"""
+
+import multiprocessing as mp
+import os
+import queue
+import time
+from collections import deque
+from datetime import datetime
+
+import requests
+
+from .detection_array import build_detection_payloads, empty_detections
+from .frame_source import FrameSource
+from .motion_gate import MotionGate
+from .moto_detector import MotoDetector
+from .publisher import DetectionPublisher
+from .roi import RoiConfig
+from .tracking import RECORD_POLICIES, MotoTracker
+from ..utils.database import DatabaseManager
+
+
+def _pin_cpus(cores):
+    """Fixa o processo atual nos núcleos informados (quando o SO permite)"""
+    if not cores:
+        return
+    if hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, cores)
+        except OSError:
+            pass
+    try:
+        import torch
+        torch.set_num_threads(len(cores))
+    except ImportError:
+        pass
+
+
+# Espera máxima por um frame: uma fonte travada não prende o worker
+READ_TIMEOUT = 0.1
+
+
+def _camera_worker(worker_id, cameras, options, results, stop_event, cores):
+    """
+    Processo de detecção: lê até `batch_size` frames de cada câmera do
+    grupo e roda o modelo uma vez para todos (batch entre câmeras). Cada
+    câmera tem seu MotionGate (frames sem movimento repetem as detecções
+    anteriores da câmera) e sua RoiConfig.
+    """
+    _pin_cpus(cores)
+    detector = MotoDetector(
+        model_path=options['model_path'],
+        confidence_threshold=options['confidence'],
+        backend=options['backend'],
+        precision=options['precision'],
+    )
+    threshold = options['motion_threshold']
+
+    sources, gates, last_detections = {}, {}, {}
+    for camera_id, source in cameras:
+        frame_source = FrameSource(
+            source,
+            queue_size=max(options['queue_size'], options['batch_size']),
+            policy=options['frame_policy'],
+            max_frames=options['max_frames'],
+        )
+        if frame_source.isOpened():
+            sources[camera_id] = frame_source.start()
+            gates[camera_id] = MotionGate(threshold=threshold) if threshold is not None else None
+            last_detections[camera_id] = empty_detections()
+        else:
+            results.put(('error', camera_id, f"Erro ao abrir fonte: {source}"))
+
+    def finish(camera_id):
+        frame_source = sources.pop(camera_id)
+        stats = frame_source.stats()
+        if gates[camera_id] is not None:
+            stats.update(gates[camera_id].stats())
+        results.put(('finished', camera_id, stats))
+        frame_source.release()
+
+    while sources and not stop_event.is_set():
+        camera_ids, packets = [], []
+        for camera_id, frame_source in list(sources.items()):
+            for _ in range(options['batch_size']):
+                # Só espera (com limite) enquanto o batch ainda está vazio
+                packet = frame_source.read(timeout=0 if packets else READ_TIMEOUT)
+                if packet is None:
+                    if frame_source.finished:
+                        finish(camera_id)
+                    break
+                camera_ids.append(camera_id)
+                packets.append(packet)
+
+        if not packets:
+            continue  # fontes sem frame no momento: volta a checar stop_event
+
+        needed = [
+            gates[camera_id] is None or gates[camera_id].check(packet.frame)
+            for camera_id, packet in zip(camera_ids, packets)
+        ]
+        inferred = iter(detector.detect_frames_array(
+            [packet.frame for packet, need in zip(packets, needed) if need],
+            [options['rois'].get(camera_id) for camera_id, need in zip(camera_ids, needed) if need],
+        ))
+        done = time.time()
+        for camera_id, packet, need in zip(camera_ids, packets, needed):
+            if need:
+                last_detections[camera_id] = next(inferred)
+            moto_dets = detector.filter_motos_array(last_detections[camera_id])
+            results.put(('detections', camera_id, packet.index, packet.timestamp, done, moto_dets))
+
+    for camera_id in list(sources):
+        finish(camera_id)
+    results.put(('worker_done', worker_id, None))
+
+
+class CameraStats:
+    """FPS e latência (captura -> detecção) de uma câmera"""
+
+    def __init__(self, camera_id, source):
+        self.camera_id = camera_id
+        self.source = source
+        self.frames = 0
+        self.total_detections = 0
+        self.first_frame_time = None
+        self.last_frame_time = None
+        self.latencies = deque(maxlen=500)
+        self.source_stats = {}
+        # Rastros da câmera (frames chegam em ordem do processo de detecção)
+        self.tracker = MotoTracker()
+
+    def update(self, captured_at, processed_at, detections):
+        if self.first_frame_time is None:
+            self.first_frame_time = processed_at
+        self.last_frame_time = processed_at
+        self.frames += 1
+        self.total_detections += detections
+        self.latencies.append(processed_at - captured_at)
+
+    @property
+    def fps(self):
+        if self.first_frame_time is None:
+            return 0.0
+        elapsed = self.last_frame_time - self.first_frame_time
+        return (self.frames - 1) / elapsed if elapsed > 0 else 0.0
+
+    def as_dict(self):
+        latencies = sorted(self.latencies)
+        return {
+            'camera_id': self.camera_id,
+            'source': str(self.source),
+            'frames': self.frames,
+            'fps': self.fps,
+            'total_detections': self.total_detections,
+            'unique_motos': self.tracker.unique_count,
+            'latency_avg_ms': (sum(latencies) / len(latencies) * 1000) if latencies else 0.0,
+            'latency_p95_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000
+                              if latencies else 0.0,
+            'frames_dropped': self.source_stats.get('frames_dropped', 0),
+            'frames_gated': self.source_stats.get('frames_gated', 0),
+        }
+
+
+class MultiCameraRunner:
+    """
+    Executa a detecção em várias câmeras com um pool de processos.
+
+    - sources: lista de vídeos/câmeras (índices numéricos abrem webcams)
+    - workers: número de processos (padrão: min(câmeras, núcleos))
+    - pin_cpus: distribui os núcleos disponíveis entre os processos
+    - backend: runtime de inferência ('torch', 'onnx' ou 'openvino')
+    - precision: 'fp32', 'fp16' ou 'int8' (modelo quantizado)
+    - batch_size: frames de cada câmera por chamada ao modelo
+    - motion_threshold: MotionGate por câmera (None = todo frame é inferido)
+    - roi_config: JSON com os polígonos das zonas do pátio por fonte
+    - record_policy: 'all' grava/envia toda detecção; 'track' só uma por
+      moto rastreada (a detecção que confirma o rastro)
+    """
+
+    def __init__(
+        self,
+        sources,
+        workers=None,
+        model_path='yolov8n.pt',
+        confidence=0.5,
+        frame_policy='drop_oldest',
+        queue_size=4,
+        max_frames=None,
+        db_path=None,
+        api_url='http://localhost:5000',
+        pin_cpus=True,
+        backend='torch',
+        precision='fp32',
+        record_policy='all',
+        batch_size=1,
+        motion_threshold=None,
+        roi_config=None,
+    ):
+        if record_policy not in RECORD_POLICIES:
+            raise ValueError(f"record_policy deve ser um de {RECORD_POLICIES}")
+        self.record_policy = record_policy
+        self.cameras = [
+            (f"cam{i + 1}", int(source) if str(source).isdigit() else source)
+            for i, source in enumerate(sources)
+        ]
+        cpu_count = os.cpu_count() or 1
+        self.workers = max(1, min(workers or cpu_count, len(self.cameras)))
+        self.options = {
+            'model_path': model_path,
+            'confidence': confidence,
+            'frame_policy': frame_policy,
+            'queue_size': queue_size,
+            'max_frames': max_frames,
+            'backend': backend,
+            'precision': precision,
+            'batch_size': max(1, int(batch_size)),
+            'motion_threshold': motion_threshold,
+            # Carregadas aqui: erro no JSON aparece antes de subir os processos
+            'rois': {
+                camera_id: RoiConfig.load(roi_config, source)
+                for camera_id, source in self.cameras
+            } if roi_config else {},
+        }
+        self.db = DatabaseManager(db_path=db_path)
+        self.api_url = api_url
+        self.pin_cpus = pin_cpus
+
+        self.stats = {camera_id: CameraStats(camera_id, source) for camera_id, source in self.cameras}
+        self._stop_event = None
+        # Publicador único: uma sessão HTTP reaproveitada para todas as câmeras
+        self.publisher = DetectionPublisher(
+            url=f"{api_url}/detections", batch_url=f"{api_url}/detections/batch"
+        )
+        self._publishing = False
+
+    # ---------- distribuição ----------
+
+    def _camera_groups(self):
+        """Câmeras distribuídas em round-robin entre os processos"""
+        return [self.cameras[i::self.workers] for i in range(self.workers)]
+
+    def _core_groups(self):
+        """Núcleos disponíveis divididos em blocos contíguos por processo"""
+        if not self.pin_cpus or not hasattr(os, 'sched_getaffinity'):
+            return [None] * self.workers
+        cores = sorted(os.sched_getaffinity(0))
+        if len(cores) < self.workers:
+            return [None] * self.workers
+        size = len(cores) // self.workers
+        return [set(cores[i * size:(i + 1) * size]) for i in range(self.workers)]
+
+    # ---------- envio ao backend ----------
+
+    def _check_backend(self):
+        try:
+            r = requests.get(f"{self.api_url}/metrics", timeout=1.5)
+            return r.status_code == 200
+        except requests.exceptions.RequestException:
+            return False
+
+    # ---------- execução ----------
+
+    def _handle_detections(self, camera_id, frame_index, captured_at, processed_at, moto_dets):
+        stats = self.stats[camera_id]
+        stats.update(captured_at, processed_at, len(moto_dets))
+        moto_dets, confirmed = stats.tracker.update(moto_dets)
+        records = moto_dets[confirmed] if self.record_policy == 'track' else moto_dets
+        if not len(records):
+            return
+
+        elapsed = processed_at - stats.first_frame_time
+        detection_rate = stats.total_detections / elapsed if elapsed > 0 else 0.0
+
+        # Escritor único do banco (processo principal)
+        self.db.save_detection(
+            frame_num=frame_index,
+            detections=records,
+            fps=stats.fps,
+            total_detections=stats.total_detections,
+            unique_motos=stats.tracker.unique_count,
+            detection_rate=detection_rate,
+        )
+
+        if self._publishing:
+            metrics = {
+                'avg_fps': stats.fps,
+                'total_detections': stats.total_detections,
+                'unique_motos': stats.tracker.unique_count,
+                'detection_rate': detection_rate,
+                'elapsed_time': elapsed,
+            }
+            self.publisher.publish_many(build_detection_payloads(
+                records, frame_index, metrics,
+                source=camera_id, created_at=datetime.now().isoformat(),
+            ))
+
+    def run(self):
+        """Executa todas as câmeras até o fim das fontes (ou Ctrl+C)"""
+        self.db.initialize()
+        self._publishing = self._check_backend()
+        if self._publishing:
+            self.publisher.start()
+
+        ctx = mp.get_context('spawn')
+        results = ctx.Queue(maxsize=1000)
+        self._stop_event = ctx.Event()
+
+        processes = []
+        for worker_id, (cameras, cores) in enumerate(zip(self._camera_groups(), self._core_groups())):
+            process = ctx.Process(
+                target=_camera_worker,
+                args=(worker_id, cameras, self.options, results, self._stop_event, cores),
+                daemon=True,
+            )
+            process.start()
+            processes.append(process)
+            names = ", ".join(camera_id for camera_id, _ in cameras)
+            print(f"🧵 Worker {worker_id}: {names}" + (f" (CPUs {sorted(cores)})" if cores else ""))
+
+        running = len(processes)
+        try:
+            while running:
+                try:
+                    kind, key, *data = results.get(timeout=1.0)
+                except queue.Empty:
+                    if not any(p.is_alive() for p in processes):
+                        break
+                    continue
+
+                if kind == 'detections':
+                    self._handle_detections(key, *data)
+                elif kind == 'finished':
+                    self.stats[key].source_stats = data[0]
+                elif kind == 'error':
+                    print(f"❌ {key}: {data[0]}")
+                elif kind == 'worker_done':
+                    running -= 1
+        except KeyboardInterrupt:
+            print("\n⏹️ Interrompido pelo usuário")
+            self.stop()
+        finally:
+            for process in processes:
+                process.join(timeout=5.0)
+            self._publishing = False
+            self.publisher.stop()
+
+        self.print_report()
+        return self.report()
+
+    def stop(self):
+        if self._stop_event is not None:
+            self._stop_event.set()
+
+    # ---------- relatório ----------
+
+    def report(self):
+        """Estatísticas por câmera"""
+        return [stats.as_dict() for stats in self.stats.values()]
+
+    def print_report(self):
+        print("\n📊 RELATÓRIO POR CÂMERA:")
+        print("=" * 60)
+        for item in self.report():
+            print(f"{item['camera_id']} ({item['source']}): {item['frames']} frames | "
+                  f"{item['fps']:.2f} FPS | latência média {item['latency_avg_ms']:.0f} ms "
+                  f"(p95 {item['latency_p95_ms']:.0f} ms) | detecções {item['total_detections']} | "
+                  f"motos únicas {item['unique_motos']} | "
+                  f"descartados {item['frames_dropped']} | sem movimento {item['frames_gated']}")
+        total_fps = sum(item['fps'] for item in self.report())
+        print(f"Throughput total: {total_fps:.2f} FPS")
+        if self.publisher.batches:
+            sent = self.publisher.stats()
+            print(f"Envios à API: {sent['published']} em {sent['batches']} lote(s) | "
+                  f"descartados {sent['dropped']} | backlog máx. {sent['max_backlog']}")
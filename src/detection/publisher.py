@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+DetectionPublisher - Envio assíncrono das detecções ao backend
+Uma única thread com sessão HTTP keep-alive esvazia uma fila limitada e
+agrupa os payloads em lotes (por quantidade ou por tempo). O laço de
+inferência só enfileira: se o backend estiver lento, os payloads
+excedentes são descartados e contados, em vez de travar a detecção.
+"""
+
+import queue
+import threading
+import time
+
+import requests
+
+
+class DetectionPublisher:
+    """
+    Publicador de payloads para a API.
+
+    - url: endpoint que recebe um payload por requisição
+    - batch_url: endpoint que recebe uma lista de payloads (ex.: POST
+      /detections/batch); se responder 404/405, o publicador volta ao
+      envio individual
+    - max_queue: tamanho da fila (backlog máximo antes de descartar)
+    - batch_size / flush_interval: um lote sai ao atingir a quantidade ou
+      quando o primeiro payload do lote espera `flush_interval` segundos
+    """
+
+    def __init__(
+        self,
+        url='http://localhost:5000/detections',
+        batch_url=None,
+        max_queue=1000,
+        batch_size=32,
+        flush_interval=0.25,
+        timeout=1.0,
+    ):
+        self.url = url
+        self.batch_url = batch_url
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = float(flush_interval)
+        self.timeout = timeout
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+        self.published = 0
+        self.failed = 0
+        self.dropped = 0
+        self.batches = 0
+        self.max_backlog = 0
+
+    # ---------- produtor ----------
+
+    def start(self):
+        """
+        Inicia a thread de envio. Se a thread de um stop() anterior ainda
+        está esvaziando a fila, ela é reaproveitada (nunca há dois envios).
+        """
+        with self._thread_lock:
+            self._stop_event.clear()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='detection-publisher', daemon=True)
+                self._thread.start()
+        return self
+
+    def publish(self, payload):
+        """Enfileira um payload sem bloquear; False se foi descartado"""
+        try:
+            self._queue.put_nowait(payload)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        backlog = self._queue.qsize()
+        if backlog > self.max_backlog:
+            self.max_backlog = backlog
+        return True
+
+    def publish_many(self, payloads):
+        """Enfileira vários payloads; devolve quantos entraram na fila"""
+        return sum(1 for payload in payloads if self.publish(payload))
+
+    def stop(self, timeout=5.0):
+        """Envia o que restou na fila (até `timeout`) e encerra a thread"""
+        with self._thread_lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._stop_event.set()
+        # A própria thread zera a referência ao sair; se o prazo estourar,
+        # ela segue esvaziando a fila e um start() a reaproveita
+        thread.join(timeout=timeout)
+
+    # ---------- thread de envio ----------
+
+    def _next_batch(self):
+        try:
+            batch = [self._queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop_event.is_set():
+                # Encerrando: esvazia o que já está na fila sem esperar
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except queue.Empty:
+                    break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _send(self, session, batch):
+        if self.batch_url:
+            try:
+                r = session.post(self.batch_url, json=batch, timeout=self.timeout)
+                if r.status_code not in (404, 405):
+                    return len(batch) if r.ok else 0
+                self.batch_url = None  # backend sem rota de lote
+            except requests.exceptions.RequestException:
+                return 0
+
+        sent = 0
+        for payload in batch:
+            try:
+                r = session.post(self.url, json=payload, timeout=self.timeout)
+                sent += 1 if r.ok else 0
+            except requests.exceptions.RequestException:
+                pass  # ignora se offline
+        return sent
+
+    def _keep_running(self):
+        # Decide a saída sob o mesmo lock de start(): um start() concorrente
+        # ou reaproveita esta thread ou cria outra depois que ela saiu
+        with self._thread_lock:
+            if self._stop_event.is_set() and self._queue.empty():
+                self._thread = None
+                return False
+            return True
+
+    def _run(self):
+        session = requests.Session()
+        try:
+            while self._keep_running():
+                batch = self._next_batch()
+                if not batch:
+                    continue
+                sent = self._send(session, batch)
+                with self._lock:
+                    self.batches += 1
+                    self.published += sent
+                    self.failed += len(batch) - sent
+        finally:
+            session.close()
+
+    # ---------- estatísticas ----------
+
+    def stats(self):
+        with self._lock:
+            return {
+                'published': self.published,
+                'failed': self.failed,
+                'dropped': self.dropped,
+                'batches': self.batches,
+                'backlog': self._queue.qsize(),
+                'max_backlog': self.max_backlog,
+                'avg_batch_size': (self.published + self.failed) / self.batches if self.batches else 0.0,
+            }
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Quantization - Quantização INT8 pós-treino do detector
+Exporta o modelo para ONNX (FP32), calibra as ativações com frames dos
+vídeos do pátio e gera um modelo INT8 estático (QDQ) para o ONNX Runtime.
+A avaliação compara o INT8 com o FP32 na classe moto (3): as detecções do
+FP32 servem de referência e mede-se o AP@0.5 do INT8 contra elas.
+
+O artefato é salvo como <stem>_int8.onnx ao lado dos pesos e carregado
+por MotoDetector(precision='int8').
+"""
+
+import importlib.util
+import os
+import shutil
+import time
+
+import cv2
+import numpy as np
+
+from .backends import export_model, quantized_path
+from .detection_array import MOTO_CLASS, bboxes, box_iou
+
+_REQUIREMENTS = ('onnx', 'onnxruntime')
+
+
+def _check_requirements():
+    missing = [pkg for pkg in _REQUIREMENTS if importlib.util.find_spec(pkg) is None]
+    if missing:
+        raise ImportError(f"Quantização INT8 requer: pip install {' '.join(missing)}")
+
+
+# ---------- calibração ----------
+
+def _split_indices(total, num_calib, num_eval):
+    """
+    Índices de calibração e de avaliação de um vídeo com `total` frames:
+    num_calib + num_eval índices distintos espaçados uniformemente, dos
+    quais os de avaliação são intercalados entre os de calibração.
+    """
+    needed = num_calib + num_eval
+    if total < needed:
+        raise ValueError(f"Vídeo com {total} frames; são necessários {needed} "
+                         f"({num_calib} de calibração + {num_eval} de avaliação)")
+    # Espaçamento >= 1 entre os pontos, então o floor dá índices distintos
+    picked = np.linspace(0, total - 1, needed).astype(int)
+    # Posição k de avaliação = floor((k + 0.5) * needed / num_eval): passo >= 1,
+    # centrado no intervalo (com quotas iguais é exatamente o intercalado [1::2])
+    is_eval = np.zeros(needed, dtype=bool)
+    if num_eval:
+        is_eval[(np.arange(num_eval) * 2 * needed + needed) // (2 * num_eval)] = True
+    calib, evaluation = picked[~is_eval], picked[is_eval]
+    assert not np.intersect1d(calib, evaluation).size, "calibração e avaliação sobrepostas"
+    return calib, evaluation
+
+
+def _frame_count(path):
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise FileNotFoundError(f"Erro ao abrir vídeo: {path}")
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    if total <= 0:  # contêiner sem contagem confiável: conta lendo
+        while cap.grab():
+            total += 1
+    cap.release()
+    return total
+
+
+def split_frames(video_paths, calib_frames=200, eval_frames=100):
+    """
+    Amostra frames espaçados uniformemente entre os vídeos e os separa em
+    (calibração, avaliação) sem frame em comum: a precisão do INT8 não
+    pode ser medida nas mesmas imagens usadas para calibrá-lo. Levanta
+    ValueError se algum vídeo não tiver frames suficientes para os dois.
+    """
+    video_paths = [video_paths] if isinstance(video_paths, str) else list(video_paths)
+    calib_per_video = max(1, calib_frames // len(video_paths))
+    eval_per_video = max(0, eval_frames // len(video_paths))
+    calib, evaluation = [], []
+    for path in video_paths:
+        calib_idx, eval_idx = _split_indices(_frame_count(path), calib_per_video, eval_per_video)
+        wanted = dict.fromkeys(calib_idx.tolist(), calib)
+        wanted.update(dict.fromkeys(eval_idx.tolist(), evaluation))
+        last = max(wanted)
+        cap = cv2.VideoCapture(path)
+        index = 0
+        while index <= last:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if index in wanted:
+                wanted[index].append(frame)
+            index += 1
+        cap.release()
+    return calib, evaluation
+
+
+def sample_frames(video_paths, num_frames=200):
+    """Amostra `num_frames` frames espaçados uniformemente entre os vídeos"""
+    return split_frames(video_paths, num_frames, 0)[0]
+
+
+def letterbox(frame, imgsz=640):
+    """Mesmo pré-processamento do YOLO: letterbox, BGR->RGB, NCHW em [0, 1]"""
+    height, width = frame.shape[:2]
+    ratio = min(imgsz / height, imgsz / width)
+    new_w, new_h = int(round(width * ratio)), int(round(height * ratio))
+    if (new_w, new_h) != (width, height):
+        frame = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+
+    dw, dh = (imgsz - new_w) / 2, (imgsz - new_h) / 2
+    top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+    left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+    frame = cv2.copyMakeBorder(frame, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+
+    blob = frame[:, :, ::-1].transpose(2, 0, 1)[None]
+    return np.ascontiguousarray(blob, dtype=np.float32) / 255.0
+
+
+def _calibration_reader(input_name, frames, imgsz):
+    """CalibrationDataReader do ONNX Runtime sobre os frames amostrados"""
+    from onnxruntime.quantization import CalibrationDataReader
+
+    class FrameCalibrationReader(CalibrationDataReader):
+        def __init__(self):
+            self._frames = iter(frames)
+
+        def get_next(self):
+            frame = next(self._frames, None)
+            if frame is None:
+                return None
+            return {input_name: letterbox(frame, imgsz)}
+
+    return FrameCalibrationReader()
+
+
+def _copy_metadata(source_path, target_path):
+    """Preserva nomes das classes, stride e imgsz que o YOLO lê do ONNX"""
+    import onnx
+
+    source = onnx.load(source_path, load_external_data=False)
+    target = onnx.load(target_path)
+    del target.metadata_props[:]
+    for prop in source.metadata_props:
+        target.metadata_props.add(key=prop.key, value=prop.value)
+    onnx.save(target, target_path)
+
+
+def quantize_model(model_path='yolov8n.pt', video_paths=('assets/sample_video.mp4',),
+                   num_frames=200, imgsz=640, output_path=None, per_channel=True, frames=None):
+    """
+    Gera o modelo INT8 calibrado com frames dos vídeos (ou com `frames`,
+    já amostrados por split_frames). Devolve (caminho_fp32_onnx, caminho_int8_onnx).
+    """
+    _check_requirements()
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+    import onnx
+
+    fp32_path = export_model(model_path, 'onnx', imgsz)
+    int8_path = output_path or quantized_path(model_path)
+
+    if frames is None:
+        frames = sample_frames(video_paths, num_frames)
+    if not frames:
+        raise ValueError("Nenhum frame de calibração lido dos vídeos")
+    print(f"🎯 Calibrando com {len(frames)} frames ({imgsz}px)...")
+
+    # Pré-processamento recomendado (inferência de shapes + fusões) antes de quantizar
+    prep_path = f"{os.path.splitext(int8_path)[0]}_prep.onnx"
+    try:
+        quant_pre_process(fp32_path, prep_path, skip_symbolic_shape=True)
+    except Exception as e:
+        print(f"⚠️ Pré-processamento ignorado: {e}")
+        shutil.copyfile(fp32_path, prep_path)
+
+    input_name = onnx.load(prep_path, load_external_data=False).graph.input[0].name
+    start = time.perf_counter()
+    try:
+        quantize_static(
+            prep_path,
+            int8_path,
+            _calibration_reader(input_name, frames, imgsz),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=per_channel,
+        )
+    finally:
+        os.remove(prep_path)
+    _copy_metadata(fp32_path, int8_path)
+
+    print(f"✅ Modelo INT8 salvo em {int8_path} ({time.perf_counter() - start:.1f}s)")
+    return fp32_path, int8_path
+
+
+# ---------- avaliação ----------
+
+def average_precision(predictions, references, iou_threshold=0.5):
+    """
+    AP (interpolação em todos os pontos) das predições contra as
+    referências; ambas são listas, por frame, de arrays de detecção.
+    """
+    total_refs = sum(len(ref) for ref in references)
+    if total_refs == 0:
+        return None
+
+    scores, hits = [], []
+    for preds, refs in zip(predictions, references):
+        if len(preds) == 0:
+            continue
+        order = np.argsort(-preds['conf'])
+        preds = preds[order]
+        matched = np.zeros(len(refs), dtype=bool)
+        iou = box_iou(bboxes(preds), bboxes(refs)) if len(refs) else None
+        for i in range(len(preds)):
+            hit = False
+            if iou is not None:
+                candidates = np.where(~matched & (iou[i] >= iou_threshold))[0]
+                if len(candidates):
+                    best = candidates[iou[i, candidates].argmax()]
+                    matched[best] = hit = True
+            scores.append(float(preds['conf'][i]))
+            hits.append(hit)
+
+    if not scores:
+        return 0.0
+
+    order = np.argsort(-np.asarray(scores))
+    tp = np.cumsum(np.asarray(hits)[order])
+    fp = np.cumsum(~np.asarray(hits)[order])
+    recall = np.concatenate([[0.0], tp / total_refs, [1.0]])
+    precision = np.concatenate([[1.0], tp / np.maximum(tp + fp, 1e-9), [0.0]])
+    precision = np.maximum.accumulate(precision[::-1])[::-1]
+    steps = np.where(recall[1:] != recall[:-1])[0]
+    return float(np.sum((recall[steps + 1] - recall[steps]) * precision[steps + 1]))
+
+
+def _run(detector, frames, confidence):
+    outputs = []
+    start = time.perf_counter()
+    for frame in frames:
+        dets = detector.detect_motos_array(frame)
+        outputs.append(dets[(dets['class'] == MOTO_CLASS) & (dets['conf'] >= confidence)])
+    elapsed = time.perf_counter() - start
+    return outputs, len(frames) / elapsed if elapsed > 0 else 0.0
+
+
+def evaluate_int8(fp32_path, int8_path, frames, confidence=0.5, imgsz=640):
+    """
+    Compara o INT8 com o FP32 na classe moto: as detecções do FP32 (com o
+    limiar de operação) são a referência, então o AP do FP32 é 1.0 e a
+    queda de mAP do INT8 é 1 - AP.
+    """
+    from .moto_detector import MotoDetector
+
+    # Limiar baixo: o AP varre a curva de confiança inteira
+    reference_detector = MotoDetector(model_path=fp32_path, confidence_threshold=0.01, imgsz=imgsz)
+    int8_detector = MotoDetector(model_path=int8_path, confidence_threshold=0.01,
+                                 precision='int8', imgsz=imgsz)
+
+    references, fp32_fps = _run(reference_detector, frames, confidence)
+    predictions, int8_fps = _run(int8_detector, frames, 0.01)
+    ap50 = average_precision(predictions, references)
+
+    return {
+        'frames': len(frames),
+        'reference_motos': int(sum(len(ref) for ref in references)),
+        'fp32_fps': fp32_fps,
+        'int8_fps': int8_fps,
+        'speedup': int8_fps / fp32_fps if fp32_fps > 0 else None,
+        'fp32_size_mb': os.path.getsize(fp32_path) / 1e6,
+        'int8_size_mb': os.path.getsize(int8_path) / 1e6,
+        'moto_ap50_int8': ap50,
+        'moto_map50_drop': (1.0 - ap50) if ap50 is not None else None,
+    }
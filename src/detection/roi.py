@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+ROI - Regiões de interesse do pátio
+Recorta apenas as áreas das vagas (polígonos) para a inferência, dividindo
+regiões grandes em tiles, e devolve as caixas em coordenadas do frame
+inteiro, unificadas por NMS.
+
+Formato do arquivo de configuração (JSON), uma entrada por fonte de vídeo
+(caminho completo ou só o nome do arquivo; "default" vale para as demais):
+
+    {
+      "sample_video.mp4": {
+        "tile_size": 640,
+        "overlap": 0.2,
+        "regions": [
+          {"name": "Vagas A", "polygon": [[0, 300], [1280, 300], [1280, 720], [0, 720]]}
+        ]
+      }
+    }
+"""
+
+import json
+import os
+
+import numpy as np
+
+from .detection_array import DETECTION_DTYPE, empty_detections
+
+
+def nms(boxes, scores, iou_threshold=0.5):
+    """Non-maximum suppression guloso; devolve os índices mantidos"""
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    boxes = np.asarray(boxes, dtype=np.float32)
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = np.maximum(0, x2 - x1) * np.maximum(0, y2 - y1)
+    order = np.argsort(scores)[::-1]
+
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = np.maximum(0, np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]))
+        h = np.maximum(0, np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]))
+        inter = w * h
+        iou = inter / np.maximum(areas[i] + areas[rest] - inter, 1e-6)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+class RegionOfInterest:
+    """Polígono de uma zona do pátio, em coordenadas do frame inteiro"""
+
+    def __init__(self, name, polygon):
+        self.name = name
+        self.polygon = np.asarray(polygon, dtype=np.float32).reshape(-1, 2)
+        if len(self.polygon) < 3:
+            raise ValueError(f"ROI '{name}' precisa de pelo menos 3 vértices")
+
+    def bounds(self, frame_shape, margin=0):
+        """Retângulo envolvente (x1, y1, x2, y2) limitado ao frame"""
+        height, width = frame_shape[:2]
+        x1, y1 = (np.floor(self.polygon.min(axis=0)) - margin).astype(int).tolist()
+        x2, y2 = (np.ceil(self.polygon.max(axis=0)) + margin).astype(int).tolist()
+        return max(0, x1), max(0, y1), min(width, x2), min(height, y2)
+
+    def contains(self, points):
+        """Máscara booleana: pontos (N, 2) dentro do polígono (ray casting)"""
+        points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        px, py = points[:, 0:1], points[:, 1:2]
+        vx, vy = self.polygon[:, 0], self.polygon[:, 1]
+        nx, ny = np.roll(vx, -1), np.roll(vy, -1)
+
+        crosses = (vy > py) != (ny > py)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_cross = (nx - vx) * (py - vy) / (ny - vy) + vx
+        inside = crosses & (px < x_cross)
+        return np.count_nonzero(inside, axis=1) % 2 == 1
+
+
+class RoiConfig:
+    """
+    Conjunto de ROIs de uma fonte de vídeo.
+
+    - tile_size: lado máximo de cada recorte enviado ao modelo
+    - overlap: sobreposição entre tiles vizinhos (fração do tile)
+    - iou_threshold: IoU para unificar caixas repetidas entre tiles
+    - margin: folga (pixels) em volta do retângulo de cada região
+    """
+
+    def __init__(self, regions, tile_size=640, overlap=0.2, iou_threshold=0.5, margin=16):
+        self.regions = list(regions)
+        self.tile_size = int(tile_size)
+        self.overlap = float(overlap)
+        self.iou_threshold = float(iou_threshold)
+        self.margin = int(margin)
+        self._windows_cache = {}
+
+    @classmethod
+    def from_dict(cls, data):
+        regions = [
+            RegionOfInterest(region.get('name', f'roi_{i}'), region['polygon'])
+            for i, region in enumerate(data.get('regions', []))
+        ]
+        options = {k: data[k] for k in ('tile_size', 'overlap', 'iou_threshold', 'margin') if k in data}
+        return cls(regions, **options)
+
+    @classmethod
+    def load(cls, path, source):
+        """Carrega a configuração da fonte `source` (None se não houver ROI)"""
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+
+        source = str(source)
+        for key in (source, os.path.basename(source), 'default'):
+            if key in config:
+                return cls.from_dict(config[key])
+        return None
+
+    # ---------- recortes ----------
+
+    def _tile_starts(self, start, end):
+        length = end - start
+        if length <= self.tile_size:
+            return [start]
+        stride = max(1, int(self.tile_size * (1.0 - self.overlap)))
+        starts = list(range(start, end - self.tile_size, stride))
+        starts.append(end - self.tile_size)  # último tile encosta na borda
+        return starts
+
+    def windows(self, frame_shape):
+        """Janelas (x1, y1, x2, y2) a inferir; fixas para cada resolução"""
+        key = tuple(frame_shape[:2])
+        if key not in self._windows_cache:
+            windows = []
+            for region in self.regions:
+                x1, y1, x2, y2 = region.bounds(frame_shape, self.margin)
+                if x2 <= x1 or y2 <= y1:
+                    continue
+                for ty in self._tile_starts(y1, y2):
+                    for tx in self._tile_starts(x1, x2):
+                        windows.append((tx, ty, min(x2, tx + self.tile_size), min(y2, ty + self.tile_size)))
+            self._windows_cache[key] = windows
+        return self._windows_cache[key]
+
+    def crops(self, frame):
+        """Recortes do frame (views, sem cópia) e seus deslocamentos (x, y)"""
+        return [
+            (frame[y1:y2, x1:x2], (x1, y1))
+            for x1, y1, x2, y2 in self.windows(frame.shape)
+        ]
+
+    # ---------- junção ----------
+
+    def merge(self, detections, offsets):
+        """
+        Junta as detecções de cada recorte: desloca para o frame inteiro,
+        descarta caixas com centro fora das ROIs e aplica NMS por classe.
+        """
+        parts = []
+        for dets, (ox, oy) in zip(detections, offsets):
+            if len(dets) == 0:
+                continue
+            dets = dets.copy()
+            dets['x1'] += ox
+            dets['x2'] += ox
+            dets['y1'] += oy
+            dets['y2'] += oy
+            parts.append(dets)
+        if not parts:
+            return empty_detections()
+
+        merged = np.concatenate(parts).astype(DETECTION_DTYPE, copy=False)
+
+        centers = np.stack([
+            (merged['x1'] + merged['x2']) / 2.0,
+            (merged['y1'] + merged['y2']) / 2.0,
+        ], axis=1)
+        inside = np.zeros(len(merged), dtype=bool)
+        for region in self.regions:
+            inside |= region.contains(centers)
+        merged = merged[inside]
+        if len(merged) == 0:
+            return merged
+
+        # NMS por classe: desloca as caixas de cada classe para não se sobreporem
+        boxes = np.stack([merged['x1'], merged['y1'], merged['x2'], merged['y2']], axis=1).astype(np.float32)
+        span = float(boxes.max()) + 1.0
+        boxes += merged['class'].astype(np.float32)[:, None] * span
+        keep = nms(boxes, merged['conf'], self.iou_threshold)
+        return merged[np.sort(keep)]
@@ -1,92 +1,356 @@
+from collections import deque
+
 import numpy as np
 from filterpy.kalman import KalmanFilter
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+try:
+    from .detection_array import box_iou, paired_box_iou
+except ImportError:  # executado como script (python yolov8_tracking_sort.py)
+    from detection_array import box_iou, paired_box_iou
+
+# Modelo do filtro (o mesmo de KalmanBoxTracker): estado [x1, y1, x2, y2, vx1, vy1, vx2]
+F = np.array([[1, 0, 0, 0, 1, 0, 0],
+              [0, 1, 0, 0, 0, 1, 0],
+              [0, 0, 1, 0, 0, 0, 1],
+              [0, 0, 0, 1, 0, 0, 0],
+              [0, 0, 0, 0, 1, 0, 0],
+              [0, 0, 0, 0, 0, 1, 0],
+              [0, 0, 0, 0, 0, 0, 1]], dtype=float)
+H = np.eye(4, 7)
+R = np.diag([1., 1., 10., 10.])
+Q = np.diag([1., 1., 1., 1., 0.01, 0.01, 0.0001])
+P0 = np.diag([10., 10., 10., 10., 1e4, 1e4, 1e4])
+_I7 = np.eye(7)
+
+_COUNTERS = ('ids', 'time_since_update', 'hits', 'hit_streak', 'age')
+
+class KalmanBoxBatch:
+    """
+    Pool de filtros de Kalman: cada rastro é uma linha de arrays
+    pré-alocados, x (cap, 7), P (cap, 7, 7) e contadores (cap,).
+    predict/update são operações NumPy únicas sobre as linhas ativas, com as
+    mesmas equações de KalmanBoxTracker (filterpy, atualização de Joseph).
+
+    Linhas de rastros removidos voltam para a free list e são reaproveitadas;
+    o pool só dobra de tamanho quando enche. `active` guarda as linhas em uso
+    na ordem de criação, e os índices de predict/update/keep são posições
+    nessa ordem.
+
+    - capacity: linhas alocadas no início
+    - history: 0 desliga o histórico; k > 0 guarda as últimas k predições
+      desde a última correção de cada rastro (ring buffer (cap, k, 4))
+    """
+    count = 0
+
+    def __init__(self, capacity=64, history=0):
+        self.history_size = history
+        self.active = np.zeros(0, dtype=np.int64)
+        self._allocate(max(int(capacity), 1))
+
+    def _allocate(self, capacity):
+        old = getattr(self, 'capacity', 0)
+        self.capacity = capacity
+        self.x = self._grow(getattr(self, 'x', None), (capacity, 7), np.float64)
+        self.P = self._grow(getattr(self, 'P', None), (capacity, 7, 7), np.float64)
+        for name in _COUNTERS:
+            setattr(self, name, self._grow(getattr(self, name, None), (capacity,), np.int64))
+        if self.history_size:
+            self.history = self._grow(getattr(self, 'history', None), (capacity, self.history_size, 4), np.float64)
+            self.history_count = self._grow(getattr(self, 'history_count', None), (capacity,), np.int64)
+        # Free list como pilha (topo no fim): as linhas mais baixas saem primeiro
+        free = np.empty(capacity, dtype=np.int64)
+        new_rows = np.arange(capacity - 1, old - 1, -1, dtype=np.int64)
+        free[:len(new_rows)] = new_rows
+        n_free = len(new_rows)
+        if old:
+            free[n_free:n_free + self._n_free] = self._free[:self._n_free]
+            n_free += self._n_free
+        self._free, self._n_free = free, n_free
+
+    @staticmethod
+    def _grow(array, shape, dtype):
+        grown = np.zeros(shape, dtype=dtype)
+        if array is not None:
+            grown[:len(array)] = array
+        return grown
+
+    def __len__(self):
+        return len(self.active)
+
+    def add(self, bboxes):
+        """Cria um rastro por bbox (M, >=4) em linhas livres, no fim de `active`"""
+        m = len(bboxes)
+        if m > self._n_free:
+            self._allocate(max(self.capacity * 2, len(self.active) + m))
+        rows = self._free[self._n_free - m:self._n_free][::-1].copy()
+        self._n_free -= m
+        self.x[rows] = 0.0
+        self.x[rows, :4] = bboxes[:, :4]
+        self.P[rows] = P0
+        self.ids[rows] = np.arange(KalmanBoxBatch.count, KalmanBoxBatch.count + m)
+        KalmanBoxBatch.count += m
+        for name in _COUNTERS[1:]:
+            getattr(self, name)[rows] = 0
+        if self.history_size:
+            self.history_count[rows] = 0
+        self.active = np.concatenate((self.active, rows))
+
+    def keep(self, mask):
+        """Mantém só os rastros com mask verdadeiro; as demais linhas voltam para a free list"""
+        released = self.active[~mask]
+        self._free[self._n_free:self._n_free + len(released)] = released[::-1]
+        self._n_free += len(released)
+        self.active = self.active[mask]
+
+    def predict(self):
+        """Prediz todos os rastros; devolve as bboxes previstas (N, 4)"""
+        rows = self.active
+        x = self.x[rows] @ F.T
+        self.x[rows] = x
+        self.P[rows] = F @ self.P[rows] @ F.T + Q
+        self.age[rows] += 1
+        self.hit_streak[rows[self.time_since_update[rows] > 0]] = 0
+        self.time_since_update[rows] += 1
+        if self.history_size:
+            count = self.history_count[rows]
+            self.history[rows, count % self.history_size] = x[:, :4]
+            self.history_count[rows] = count + 1
+        return x[:, :4]
+
+    def update(self, idx, bboxes):
+        """Corrige os rastros nas posições `idx` (distintas) com as bboxes (k, >=4)"""
+        if len(idx) == 0:
+            return
+        rows = self.active[idx]
+        x = self.x[rows]
+        P = self.P[rows]
+        # H só seleciona as 4 primeiras componentes: P H^T e H P H^T são fatias de P
+        PHT = P[:, :, :4]
+        S = PHT[:, :4, :] + R
+        K = PHT @ np.linalg.inv(S)
+        y = bboxes[:, :4] - x[:, :4]
+        x = x + (K @ y[:, :, None])[:, :, 0]
+        I_KH = _I7 - K @ H
+        P = I_KH @ P @ I_KH.transpose(0, 2, 1) + K @ R @ K.transpose(0, 2, 1)
+        self.x[rows] = x
+        self.P[rows] = P
+        self.time_since_update[rows] = 0
+        self.hits[rows] += 1
+        self.hit_streak[rows] += 1
+        if self.history_size:
+            self.history_count[rows] = 0
+
+    def column(self, name):
+        """Contador (ids, time_since_update, hits, hit_streak, age) na ordem de `active`"""
+        return getattr(self, name)[self.active]
+
+    def get_state(self):
+        return self.x[self.active, :4]
+
+    def get_history(self, position):
+        """Predições desde a última correção do rastro, da mais antiga à mais recente (até `history`)"""
+        if not self.history_size:
+            return np.empty((0, 4))
+        row = self.active[position]
+        count = self.history_count[row]
+        slots = np.arange(max(0, count - self.history_size), count) % self.history_size
+        return self.history[row, slots].copy()
+
+    def nbytes(self):
+        arrays = [self.x, self.P, self.active, self._free] + [getattr(self, name) for name in _COUNTERS]
+        if self.history_size:
+            arrays += [self.history, self.history_count]
+        return sum(array.nbytes for array in arrays)
 
 class Sort:
-    def __init__(self, max_age=5, min_hits=3, iou_threshold=0.3):
+    def __init__(self, max_age=5, min_hits=3, iou_threshold=0.3, spatial_index=None, cell_size=None,
+                 capacity=64, history=0):
         self.max_age = max_age
         self.min_hits = min_hits
         self.iou_threshold = iou_threshold
-        self.trackers = []
+        # None: grade espacial só quando detecções x rastros > _DENSE_MAX_PAIRS
+        self.spatial_index = spatial_index
+        self.cell_size = cell_size
+        self.tracks = KalmanBoxBatch(capacity=capacity, history=history)
         self.frame_count = 0
 
-    def update(self, dets=np.empty((0, 5))):
+    def _step(self, dets):
+        """Predição, associação e correção; devolve a linha do pool de cada detecção"""
         self.frame_count += 1
-        trks = np.zeros((len(self.trackers), 5))
-        to_del = []
-        ret = []
-
-        for t, trk in enumerate(trks):
-            pos = self.trackers[t].predict()
-            pos = pos[:4].reshape(-1)  # garante vetor 1D com 4 elementos
-            trk[:] = [pos[0], pos[1], pos[2], pos[3], 0]
-            if np.any(np.isnan(pos)):
-                to_del.append(t)
-        trks = np.ma.compress_rows(np.ma.masked_invalid(trks))
-
-        for t in reversed(to_del):
-            self.trackers.pop(t)
-
-        matches, unmatched_dets, unmatched_trks = associate_detections_to_trackers(dets, trks, self.iou_threshold)
-
-        for m in matches:
-            self.trackers[m[1]].update(dets[m[0], :])
-
-        for i in unmatched_dets:
-            trk = KalmanBoxTracker(dets[i, :])
-            self.trackers.append(trk)
-
-        i = len(self.trackers)
-        for trk in reversed(self.trackers):
-            d = trk.get_state()
-            if trk.time_since_update < 1:
-                ret.append(np.concatenate((d[:4].reshape(-1), [trk.id + 1])).reshape(1, -1))
-            i -= 1
-            if trk.time_since_update > self.max_age:
-                self.trackers.pop(i)
-
-        if len(ret) > 0:
-            return np.concatenate(ret)
-        return np.empty((0, 5))
-
-def associate_detections_to_trackers(detections, trackers, iou_threshold=0.3):
-    from scipy.optimize import linear_sum_assignment
-    from scipy.spatial.distance import cdist
-
-    if len(trackers) == 0:
-        return np.empty((0, 2), dtype=int), np.arange(len(detections)), np.empty((0), dtype=int)
-
-    iou_matrix = 1 - cdist(detections[:, :4], trackers[:, :4])
-    matched_indices = linear_sum_assignment(iou_matrix)
-    matched_indices = np.array(list(zip(*matched_indices)))
-
-    unmatched_detections = []
-    for d in range(len(detections)):
-        if d not in matched_indices[:, 0]:
-            unmatched_detections.append(d)
-
-    unmatched_trackers = []
-    for t in range(len(trackers)):
-        if t not in matched_indices[:, 1]:
-            unmatched_trackers.append(t)
-
-    matches = []
-    for m in matched_indices:
-        if iou_matrix[m[0], m[1]] < iou_threshold:
-            unmatched_detections.append(m[0])
-            unmatched_trackers.append(m[1])
-        else:
-            matches.append(m.reshape(1, 2))
-
-    if len(matches) == 0:
-        matches = np.empty((0, 2), dtype=int)
+
+        # Predição de todos os rastros de uma vez; estados inválidos são descartados
+        trks = self.tracks.predict()
+        valid = ~np.any(np.isnan(trks), axis=1)
+        if not valid.all():
+            self.tracks.keep(valid)
+            trks = trks[valid]
+
+        matches, unmatched_dets, unmatched_trks = associate_detections_to_trackers(
+            dets, trks, self.iou_threshold, spatial_index=self.spatial_index, cell_size=self.cell_size)
+
+        det_rows = np.empty(len(dets), dtype=np.int64)
+        if len(matches):
+            self.tracks.update(matches[:, 1], dets[matches[:, 0]])
+            det_rows[matches[:, 0]] = self.tracks.active[matches[:, 1]]
+
+        if len(unmatched_dets):
+            self.tracks.add(dets[unmatched_dets])
+            det_rows[unmatched_dets] = self.tracks.active[-len(unmatched_dets):]
+        return det_rows
+
+    def _prune(self):
+        self.tracks.keep(self.tracks.column('time_since_update') <= self.max_age)
+
+    def update(self, dets=np.empty((0, 5))):
+        self._step(dets)
+
+        # Saída na ordem inversa de criação (como antes): [x1, y1, x2, y2, id]
+        rows = self.tracks.active[::-1]
+        rows = rows[self.tracks.time_since_update[rows] < 1]
+        ret = np.column_stack((self.tracks.x[rows, :4], self.tracks.ids[rows] + 1))
+
+        self._prune()
+        return ret
+
+    def assign(self, dets=np.empty((0, 5))):
+        """
+        Mesmo passo de update, mas devolve, na ordem de `dets`, o id do rastro
+        de cada detecção (como em update, a partir de 1) e quantas detecções
+        o rastro já tinha antes deste frame (0 = rastro criado agora).
+        """
+        rows = self._step(dets)
+        ids = self.tracks.ids[rows] + 1
+        hits = self.tracks.hits[rows].copy()
+        self._prune()
+        return ids, hits
+
+# Custo dos pares fora do gate nas subatribuições: maior que qualquer soma de
+# custos válidos (1 - IoU <= 1), então o Hungarian maximiza primeiro o número
+# de pares válidos e os pares fora do gate são descartados em seguida
+_GATE_COST = 1e6
+
+def assign_candidates(rows, cols, scores, n_rows, n_cols):
+    """
+    Atribuição de custo mínimo (1 - IoU) restrita aos pares candidatos
+    (rows[k], cols[k]) com IoU scores[k]. O grafo bipartido dos candidatos é
+    separado em componentes conexas: componentes 1x1 viram pares direto e as
+    demais são resolvidas com Hungarian em matrizes pequenas.
+    """
+    if len(rows) == 0:
+        return np.empty((0, 2), dtype=int)
+    graph = coo_matrix((np.ones(len(rows)), (rows, cols + n_rows)), shape=(n_rows + n_cols, n_rows + n_cols))
+    n_components, labels = connected_components(graph, directed=False)
+    pair_label = labels[rows]
+    row_count = np.bincount(labels[np.unique(rows)], minlength=n_components)
+    col_count = np.bincount(labels[n_rows + np.unique(cols)], minlength=n_components)
+    single = ((row_count == 1) & (col_count == 1))[pair_label]
+
+    matches = [np.column_stack((rows[single], cols[single]))]
+    rest = np.flatnonzero(~single)
+    if len(rest):
+        rest = rest[np.argsort(pair_label[rest], kind='stable')]
+        for group in np.split(rest, np.flatnonzero(np.diff(pair_label[rest])) + 1):
+            row_ids, r = np.unique(rows[group], return_inverse=True)
+            col_ids, c = np.unique(cols[group], return_inverse=True)
+            cost = np.full((len(row_ids), len(col_ids)), _GATE_COST)
+            cost[r, c] = 1.0 - scores[group]
+            ri, ci = linear_sum_assignment(cost)
+            ok = cost[ri, ci] < _GATE_COST
+            matches.append(np.column_stack((row_ids[ri[ok]], col_ids[ci[ok]])))
+    return np.concatenate(matches).astype(int)
+
+# Abaixo disso a matriz de IoU densa sai mais barata que a grade espacial
+_DENSE_MAX_PAIRS = 16384
+
+# Chave única da célula (ix, iy); cobre coordenadas de célula em +-2^20
+_CELL_OFFSET = 1 << 20
+_CELL_STRIDE = 1 << 21
+
+def grid_cells(boxes, cell_size):
+    """
+    Células da grade uniforme cobertas por cada caixa (N, >=4).
+    Devolve (índice da caixa, chave da célula), uma entrada por par.
+    """
+    x0 = np.floor(boxes[:, 0] / cell_size).astype(np.int64)
+    y0 = np.floor(boxes[:, 1] / cell_size).astype(np.int64)
+    nx = np.maximum(np.floor(boxes[:, 2] / cell_size).astype(np.int64) - x0 + 1, 1)
+    ny = np.maximum(np.floor(boxes[:, 3] / cell_size).astype(np.int64) - y0 + 1, 1)
+    counts = nx * ny
+    owner = np.repeat(np.arange(len(boxes)), counts)
+    local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    ix = x0[owner] + local % nx[owner]
+    iy = y0[owner] + local // nx[owner]
+    return owner, (ix + _CELL_OFFSET) * _CELL_STRIDE + (iy + _CELL_OFFSET)
+
+def grid_candidates(detections, trackers, cell_size=None):
+    """
+    Pares (detecção, rastro) que compartilham ao menos uma célula da grade
+    montada sobre as caixas previstas dos rastros. Caixas que se sobrepõem
+    sempre compartilham uma célula, então nenhum par com IoU > 0 fica de fora.
+    cell_size=None usa a mediana do maior lado das caixas dos rastros.
+    """
+    if cell_size is None:
+        sides = np.maximum(trackers[:, 2] - trackers[:, 0], trackers[:, 3] - trackers[:, 1])
+        cell_size = max(float(np.median(sides)), 1.0)
+    det_owner, det_keys = grid_cells(detections, cell_size)
+    trk_owner, trk_keys = grid_cells(trackers, cell_size)
+
+    order = np.argsort(trk_keys, kind='stable')
+    trk_keys, trk_owner = trk_keys[order], trk_owner[order]
+    lo = np.searchsorted(trk_keys, det_keys, side='left')
+    hits = np.searchsorted(trk_keys, det_keys, side='right') - lo
+
+    rows = np.repeat(det_owner, hits)
+    idx = np.repeat(lo - (np.cumsum(hits) - hits), hits) + np.arange(hits.sum())
+    cols = trk_owner[idx]
+    # Um par pode dividir várias células
+    pairs = np.unique(rows * len(trackers) + cols)
+    return pairs // len(trackers), pairs % len(trackers)
+
+def associate_detections_to_trackers(detections, trackers, iou_threshold=0.3, spatial_index=None, cell_size=None):
+    """
+    Associa detecções (N, >=4) a rastros previstos (M, >=4) por IoU.
+    Pares com IoU < iou_threshold são podados antes do Hungarian. Com
+    spatial_index, só os pares vizinhos na grade (grid_candidates) têm o IoU
+    calculado e os custos ficam esparsos (listas de pares); None escolhe
+    pela quantidade de pares (_DENSE_MAX_PAIRS).
+    Devolve (matches (K, 2) [det, trk], dets sem par, rastros sem par).
+    """
+    n_dets, n_trks = len(detections), len(trackers)
+    if n_dets == 0 or n_trks == 0:
+        return np.empty((0, 2), dtype=int), np.arange(n_dets), np.arange(n_trks)
+
+    if spatial_index is None:
+        spatial_index = n_dets * n_trks > _DENSE_MAX_PAIRS
+    if spatial_index and iou_threshold > 0:
+        rows, cols = grid_candidates(detections, trackers, cell_size)
+        scores = paired_box_iou(detections[rows, :4], trackers[cols, :4])
+        gate = scores >= iou_threshold
+        rows, cols, scores = rows[gate], cols[gate], scores[gate]
     else:
-        matches = np.concatenate(matches, axis=0)
+        iou = box_iou(detections[:, :4], trackers[:, :4])
+        rows, cols = np.nonzero(iou >= iou_threshold)
+        scores = iou[rows, cols]
+    matches = assign_candidates(rows, cols, scores, n_dets, n_trks)
 
-    return matches, np.array(unmatched_detections), np.array(unmatched_trackers)
+    det_matched = np.zeros(n_dets, dtype=bool)
+    trk_matched = np.zeros(n_trks, dtype=bool)
+    det_matched[matches[:, 0]] = True
+    trk_matched[matches[:, 1]] = True
+    return matches, np.flatnonzero(~det_matched), np.flatnonzero(~trk_matched)
 
 class KalmanBoxTracker:
+    """
+    Filtro por objeto (referência de KalmanBoxBatch e do benchmark).
+    history: 0 desliga o histórico; k > 0 guarda as últimas k predições
+    desde a última correção (deque limitado).
+    """
+    __slots__ = ('kf', 'time_since_update', 'id', 'history', 'hits', 'hit_streak', 'age')
     count = 0
-    def __init__(self, bbox):
+    def __init__(self, bbox, history=0):
         self.kf = KalmanFilter(dim_x=7, dim_z=4)
         self.kf.F = np.array([[1, 0, 0, 0, 1, 0, 0],
                               [0, 1, 0, 0, 0, 1, 0],
@@ -109,14 +373,15 @@ class KalmanBoxTracker:
         self.time_since_update = 0
         self.id = KalmanBoxTracker.count
         KalmanBoxTracker.count += 1
-        self.history = []
+        self.history = deque(maxlen=history) if history else None
         self.hits = 0
         self.hit_streak = 0
         self.age = 0
 
     def update(self, bbox):
         self.time_since_update = 0
-        self.history = []
+        if self.history is not None:
+            self.history.clear()
         self.hits += 1
         self.hit_streak += 1
         self.kf.update(bbox[:4].reshape((4, 1)))
@@ -127,7 +392,8 @@ class KalmanBoxTracker:
         if self.time_since_update > 0:
             self.hit_streak = 0
         self.time_since_update += 1
-        self.history.append(self.kf.x)
+        if self.history is not None:
+            self.history.append(self.kf.x[:4, 0].copy())
         return self.kf.x
 
     def get_state(self):
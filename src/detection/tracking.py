@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+MotoTracker - Etapa de rastreamento do pipeline de detecção
+Associa as detecções de cada frame a rastros SORT e preenche `track_id`
+no array de detecções. Motos únicas são contadas pelos rastros: um rastro
+conta uma vez, quando é confirmado (min_hits frames com detecção), em vez
+de guardar uma chave por caixa num set que cresce sem limite. O estado é
+o pool do Sort, limitado aos rastros vivos (max_age frames sem detecção).
+"""
+
+import numpy as np
+
+try:
+    from .detection_array import bboxes
+    from .sort import Sort
+except ImportError:  # executado como script (python moto_detection_enhanced.py)
+    from detection_array import bboxes
+    from sort import Sort
+
+# 'all': toda detecção vai para o banco/API; 'track': só a que confirma o rastro
+RECORD_POLICIES = ('all', 'track')
+
+
+class MotoTracker:
+    """
+    Rastreador de motos sobre o array de detecções.
+
+    - max_age: frames sem detecção antes de o rastro ser descartado
+    - min_hits: frames com detecção para o rastro contar como moto
+    - iou_threshold: IoU mínimo entre detecção e rastro previsto
+    """
+
+    def __init__(self, max_age=30, min_hits=3, iou_threshold=0.3):
+        self.max_age = max_age
+        self.min_hits = max(1, int(min_hits))
+        self.iou_threshold = iou_threshold
+        self.reset()
+
+    def reset(self):
+        """Descarta os rastros e zera a contagem (nova fonte de vídeo)"""
+        self.sort = Sort(max_age=self.max_age, min_hits=self.min_hits, iou_threshold=self.iou_threshold)
+        self.unique_count = 0
+
+    def update(self, dets):
+        """
+        Rastreia as detecções de um frame (chamar em todo frame, mesmo sem
+        detecções, para envelhecer os rastros). Devolve uma cópia com
+        `track_id` preenchido e a máscara das detecções que confirmaram
+        um rastro neste frame.
+        """
+        boxes = np.column_stack((bboxes(dets), dets['conf'])).astype(np.float64)
+        ids, hits = self.sort.assign(boxes)
+        tracked = dets.copy()
+        tracked['track_id'] = ids
+        # hits + 1 = frames com detecção, contando este; cada rastro passa por min_hits uma vez
+        confirmed = hits + 1 == self.min_hits
+        self.unique_count += int(confirmed.sum())
+        return tracked, confirmed
+
+    @property
+    def active_tracks(self):
+        return len(self.sort.tracks)
@@ -1,11 +1,13 @@
 import cv2
-from ultralytics import YOLO
+from model_registry import get_model
 from sort import Sort
+from frame_source import FrameSource
+from motion_gate import MotionGate
+from publisher import DetectionPublisher
 import numpy as np
 import argparse
 import csv
 import time
-import requests
 
 
 def main():
@@ -15,11 +17,18 @@ def main():
     parser.add_argument("--no-display", action="store_true", help="Desabilita a exibição do vídeo")
     parser.add_argument("--max-frames", type=int, default=None, help="Número máximo de frames a serem processados")
     parser.add_argument("--backend-url", default="http://localhost:5000/detections", help="URL do backend para envio dos eventos")
+    parser.add_argument("--motion-threshold", type=float, default=None, help="Fração mínima de pixels alterados para rodar o modelo (desligado por padrão)")
+    parser.add_argument("--frame-policy", choices=("block", "drop_oldest"), default="block", help="Fila de decodificação cheia: esperar ou descartar o frame mais antigo")
     args = parser.parse_args()
 
-    model = YOLO('yolov8n.pt')
-    cap = cv2.VideoCapture(args.video)
+    model = get_model('yolov8n.pt')
+    # Decodificação em thread própria, sobreposta à inferência
+    cap = FrameSource(args.video, policy=args.frame_policy, max_frames=args.max_frames).start()
     tracker = Sort()
+    gate = MotionGate(threshold=args.motion_threshold) if args.motion_threshold is not None else None
+    tracks = np.empty((0, 5))
+    # Eventos saem em lote por uma única thread, fora do laço de inferência
+    publisher = DetectionPublisher(url=args.backend_url, batch_url=f"{args.backend_url}/batch").start()
 
     frame_num = 0
     track_ids = set()
@@ -32,28 +41,28 @@ def main():
         writer = csv.writer(csv_file)
         writer.writerow(['frame', 'track_id', 'x1', 'y1', 'x2', 'y2'])
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
+    for packet in cap:
+        frame = packet.frame
         frame_num += 1
 
-        results = model(frame)
-        detections = results[0].boxes
-
-        dets = []
-        for box in detections:
-            cls = int(box.cls.item())
-            if cls == 3:  # classe 3 = "motorbike" em COCO
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-                conf = box.conf.item()
-                dets.append([x1, y1, x2, y2, conf])
-
-        dets_np = np.array(dets)
-        if len(dets_np) == 0:
-            tracks = np.empty((0, 5))
-        else:
-            tracks = tracker.update(dets_np)
+        # Sem movimento: reaproveita detecções e predições SORT do frame anterior
+        if gate is None or gate.check(frame):
+            results = model(frame)
+            detections = results[0].boxes
+
+            dets = []
+            for box in detections:
+                cls = int(box.cls.item())
+                if cls == 3:  # classe 3 = "motorbike" em COCO
+                    x1, y1, x2, y2 = box.xyxy[0].tolist()
+                    conf = box.conf.item()
+                    dets.append([x1, y1, x2, y2, conf])
+
+            dets_np = np.array(dets)
+            if len(dets_np) == 0:
+                tracks = np.empty((0, 5))
+            else:
+                tracks = tracker.update(dets_np)
 
         for track in tracks:
             if len(track) == 5:
@@ -65,23 +74,19 @@ def main():
                 cv2.putText(frame, f'ID {int(track_id)}', (x1, y1 - 10),
                             cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 0), 2)
 
-                # Enviar evento ao backend (não bloqueante com timeout curto)
-                try:
-                    elapsed = time.time() - start_time
-                    fps = frame_num / elapsed if elapsed > 0 else 0
-                    payload = {
-                        'frame': frame_num,
-                        'track_id': int(track_id),
-                        'x1': int(x1),
-                        'y1': int(y1),
-                        'x2': int(x2),
-                        'y2': int(y2),
-                        'fps': float(fps),
-                        'count': len(track_ids),
-                    }
-                    requests.post(args.backend_url, json=payload, timeout=0.2)
-                except Exception:
-                    pass
+                # Enviar evento ao backend (só enfileira)
+                elapsed = time.time() - start_time
+                fps = frame_num / elapsed if elapsed > 0 else 0
+                publisher.publish({
+                    'frame': frame_num,
+                    'track_id': int(track_id),
+                    'x1': int(x1),
+                    'y1': int(y1),
+                    'x2': int(x2),
+                    'y2': int(y2),
+                    'fps': float(fps),
+                    'count': len(track_ids),
+                })
 
         if not args.no_display:
             cv2.imshow("FleetZone - Rastreamento YOLOv8 + SORT", frame)
@@ -92,6 +97,7 @@ def main():
             break
 
     cap.release()
+    publisher.stop()
     if not args.no_display:
         cv2.destroyAllWindows()
     if csv_file:
@@ -100,6 +106,11 @@ def main():
     fps = frame_num / elapsed if elapsed > 0 else 0
     print(f"Processadas {frame_num} frames em {elapsed:.2f}s ({fps:.2f} FPS)")
     print(f"IDs únicos rastreados: {len(track_ids)}")
+    sent = publisher.stats()
+    print(f"Eventos enviados: {sent['published']} em {sent['batches']} lote(s) | descartados: {sent['dropped']}")
+    if gate is not None:
+        stats = gate.stats()
+        print(f"Frames inferidos: {stats['frames_inferred']} | reaproveitados (sem movimento): {stats['frames_gated']}")
 
 
 if __name__ == "__main__":
@@ -131,7 +131,7 @@ class IoTDeviceSimulator:
             data = sensor.generate_data()
             response = requests.post(f"{self.api_url}/iot/sensor", 
                                   json=data, timeout=2)
-            if response.status_code == 201:
+            if response.status_code in (201, 202):
                 print(f"📡 Sensor {sensor.sensor_id}: Moto {'detectada' if data['is_active'] else 'não detectada'}")
         except requests.exceptions.RequestException:
             pass  # Falha silenciosa
@@ -142,7 +142,7 @@ class IoTDeviceSimulator:
             data = actuator.generate_data()
             response = requests.post(f"{self.api_url}/iot/actuator", 
                                   json=data, timeout=2)
-            if response.status_code == 201:
+            if response.status_code in (201, 202):
                 print(f"🔧 Atuador {actuator.actuator_id}: {data['status']}")
         except requests.exceptions.RequestException:
             pass  # Falha silenciosa
@@ -8,6 +8,10 @@ import sqlite3
 from datetime import datetime
 import os
 
+import numpy as np
+
+from ..detection.detection_array import detection_rows
+
 
 def _default_db_path():
     """
@@ -60,6 +64,7 @@ class DatabaseManager:
                 x2 INTEGER,
                 y2 INTEGER,
                 area INTEGER,
+                track_id INTEGER,
                 fps REAL,
                 total_detections INTEGER,
                 unique_motos INTEGER,
@@ -79,10 +84,16 @@ class DatabaseManager:
             )
         """)
 
+        # Bancos anteriores ao rastreamento: acrescenta a coluna track_id
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(detections)")}
+        if "track_id" not in columns:
+            cursor.execute("ALTER TABLE detections ADD COLUMN track_id INTEGER")
+
         # Índices simples para consultas comuns
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_det_created_at ON detections(created_at)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_det_frame ON detections(frame)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_det_classname ON detections(class_name)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_det_track_id ON detections(track_id)")
 
         conn.commit()
         conn.close()
@@ -92,38 +103,44 @@ class DatabaseManager:
     def save_detection(
         self,
         frame_num: int,
-        detections: list[dict],
+        detections: list[dict] | np.ndarray,
         fps: float,
         total_detections: int = 0,
         unique_motos: int = 0,
         detection_rate: float = 0.0,
     ):
-        """Salva UMA OU MAIS detecções no banco (lista de dicts do detector)"""
-        if not detections:
+        """
+        Salva UMA OU MAIS detecções no banco. Aceita o array de detecções
+        do detector (detection_array) ou a lista de dicts antiga.
+        """
+        if len(detections) == 0:
             return
 
         now_iso = datetime.now().isoformat(timespec="seconds")
-        rows = []
-        for det in detections:
-            x1, y1, x2, y2 = det["bbox"]
-            rows.append(
-                (
-                    now_iso,
-                    frame_num,
-                    det.get("class"),
-                    det.get("class_name"),
-                    float(det.get("confidence", 0.0)),
-                    int(x1),
-                    int(y1),
-                    int(x2),
-                    int(y2),
-                    int(det.get("area", (x2 - x1) * (y2 - y1))),
-                    float(fps),
-                    int(total_detections),
-                    int(unique_motos),
-                    float(detection_rate),
+        suffix = (float(fps), int(total_detections), int(unique_motos), float(detection_rate))
+
+        if isinstance(detections, np.ndarray):
+            rows = detection_rows(detections, now_iso, int(frame_num), suffix=suffix)
+        else:
+            rows = []
+            for det in detections:
+                x1, y1, x2, y2 = det["bbox"]
+                rows.append(
+                    (
+                        now_iso,
+                        frame_num,
+                        det.get("class"),
+                        det.get("class_name"),
+                        float(det.get("confidence", 0.0)),
+                        int(x1),
+                        int(y1),
+                        int(x2),
+                        int(y2),
+                        int(det.get("area", (x2 - x1) * (y2 - y1))),
+                        det.get("track_id"),
+                    )
+                    + suffix
                 )
-            )
 
         conn = self._connect()
         cursor = conn.cursor()
@@ -131,9 +148,9 @@ class DatabaseManager:
             """
             INSERT INTO detections (
                 created_at, frame, class, class_name, confidence,
-                x1, y1, x2, y2, area, fps, total_detections, unique_motos, detection_rate
+                x1, y1, x2, y2, area, track_id, fps, total_detections, unique_motos, detection_rate
             )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
             rows,
         )